@@ -0,0 +1,9 @@
+"""
+Benchmarks da API.
+
+    python -m benchmarks.micro --sizes 1000,100000,1000000
+    python -m benchmarks.load --rows 100000 --requests 200
+    python -m benchmarks.compare benchmarks/results/a.json benchmarks/results/b.json
+
+Os resultados são gravados em JSON (padrão: benchmarks/results/) para comparar execuções.
+"""
@@ -0,0 +1,73 @@
+"""Medição de tempo e gravação dos resultados em JSON."""
+import os
+import sys
+import json
+import time
+import platform
+import datetime
+import subprocess
+
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def measure(fn, min_time: float = 0.5, min_repeat: int = 3, max_repeat: int = 1000) -> dict:
+    """
+    Executa `fn` repetidamente (pelo menos `min_repeat` vezes e até somar
+    `min_time` segundos) e resume os tempos em milissegundos.
+    """
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_repeat and (len(timings) < min_repeat or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return summarize(timings)
+
+
+def summarize(timings_ms) -> dict:
+    values = np.asarray(timings_ms, dtype=float)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "n": int(len(values)),
+        "min_ms": round(float(values.min()), 4),
+        "mean_ms": round(float(values.mean()), 4),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "max_ms": round(float(values.max()), 4),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(kind: str, **extra) -> dict:
+    return {
+        "kind": kind,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        **extra,
+    }
+
+
+def save_results(report: dict, output: str = None) -> str:
+    """Grava o relatório em `output` (ou em benchmarks/results/<tipo>-<data>.json)."""
+    if output is None:
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{report['meta']['kind']}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, ensure_ascii=False)
+    return output
@@ -0,0 +1,60 @@
+"""
+Compara dois relatórios JSON do mesmo tipo (micro ou load).
+
+    python -m benchmarks.compare base.json novo.json [--metric p50_ms] [--threshold 1.1]
+
+Mostra a razão novo/base por caso e sai com código 1 se algum caso ficar
+acima do limite (útil em CI).
+"""
+import sys
+import json
+import argparse
+
+
+def _flatten(report: dict) -> dict:
+    """{caso: métricas} — micro tem um nível a mais (tamanho do catálogo)."""
+    flat = {}
+    for key, value in report["results"].items():
+        if report["meta"]["kind"] == "micro":
+            for name, metrics in value.items():
+                flat[f"{key}/{name}"] = metrics
+        else:
+            flat[key] = value
+    return flat
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare", description="Compara dois relatórios")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--metric", default="p50_ms", help="Métrica comparada (ex.: p50_ms, p95_ms, p99_ms)")
+    parser.add_argument("--threshold", type=float, default=None, help="Razão máxima aceita (ex.: 1.1)")
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as fh:
+        base = json.load(fh)
+    with open(args.new, encoding="utf-8") as fh:
+        new = json.load(fh)
+    if base["meta"]["kind"] != new["meta"]["kind"]:
+        parser.error("relatórios de tipos diferentes")
+
+    base_flat, new_flat = _flatten(base), _flatten(new)
+    regressions = []
+    print(f"{'caso':<48} {'base':>12} {'novo':>12} {'razão':>8}")
+    for name in sorted(set(base_flat) & set(new_flat)):
+        old, cur = base_flat[name].get(args.metric), new_flat[name].get(args.metric)
+        if old is None or cur is None:
+            continue
+        ratio = cur / old if old else float("inf")
+        flag = ""
+        if args.threshold is not None and ratio > args.threshold:
+            regressions.append(name)
+            flag = "  <-- regressão"
+        print(f"{name:<48} {old:>12.3f} {cur:>12.3f} {ratio:>8.2f}{flag}")
+    for name in sorted(set(base_flat) ^ set(new_flat)):
+        print(f"{name:<48} (presente em apenas um relatório)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
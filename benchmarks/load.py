@@ -0,0 +1,161 @@
+"""
+Driver de carga em processo (Flask test client), por endpoint.
+
+    python -m benchmarks.load [--rows 100000 | --csv data/dados-books.csv]
+                              [--requests 200] [--concurrency 4] [--endpoints books_page,search_title]
+
+Reporta p50/p95/p99, média, requisições por segundo, bytes e status por
+endpoint. O tempo inclui o consumo do corpo inteiro (respostas em streaming).
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+from collections import Counter
+
+from src import create_app
+from src.columnar import write_catalog
+
+from .common import metadata, save_results, summarize
+from .synthetic import write_synthetic_csv
+
+SEARCH_TERMS = ["light", "the", "love", "mystery", "a", "ster", "night city"]
+CATEGORY_TERMS = ["fic", "poetry", "myst", "science", "travel"]
+
+
+def endpoints(rows: int) -> dict:
+    """Nome → função (rng) que gera o caminho da requisição."""
+    return {
+        "health": lambda rng: "/api/v1/health",
+        "books_all": lambda rng: "/api/v1/books",
+        "books_page": lambda rng: "/api/v1/books?limit=50",
+        "get_book": lambda rng: f"/api/v1/books/{rng.randrange(rows)}",
+        "search_title": lambda rng: f"/api/v1/books/search?title={rng.choice(SEARCH_TERMS)}&limit=100",
+        "search_category": lambda rng: f"/api/v1/books/search?category={rng.choice(CATEGORY_TERMS)}&limit=100",
+        "search_fulltext": lambda rng: f"/api/v1/books/search?q={rng.choice(SEARCH_TERMS)}&limit=20",
+        "price_range": lambda rng: (lambda low: f"/api/v1/books/price-range?min={low}&max={low + 2}&limit=100")(
+            rng.randrange(10, 58)
+        ),
+        "books_query": lambda rng: (
+            f"/api/v1/books/query?rating_min={rng.randrange(1, 6)}&price_max={rng.randrange(15, 60)}"
+            "&sort=-rating,price&facets=category&limit=50"
+        ),
+        "books_similar": lambda rng: f"/api/v1/books/{rng.randrange(rows)}/similar?limit=10",
+        "top_rated": lambda rng: "/api/v1/books/top-rated?limit=100",
+        "categories": lambda rng: "/api/v1/categories",
+        "stats_overview": lambda rng: "/api/v1/stats/overview",
+        "stats_by_category": lambda rng: "/api/v1/stats/categories",
+    }
+
+
+def _login(client) -> dict:
+    resp = client.post("/api/v1/auth/login", json={"username": "admin", "password": "secret"})
+    return {"Authorization": f"Bearer {resp.get_json()['token']}"}
+
+
+def run_endpoint(app, make_path, requests: int, concurrency: int, warmup: int, seed: int) -> dict:
+    """Dispara `requests` requisições em `concurrency` threads e resume latências."""
+    headers = _login(app.test_client())
+    warm = app.test_client()
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        warm.get(make_path(rng), headers=headers).get_data()
+
+    timings, statuses, sizes = [], Counter(), []
+    lock = threading.Lock()
+    per_thread = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def worker(index: int, count: int):
+        client = app.test_client()
+        local_rng = random.Random(seed + index + 1)
+        local = []
+        for _ in range(count):
+            path = make_path(local_rng)
+            t0 = time.perf_counter()
+            resp = client.get(path, headers=headers)
+            body = resp.get_data()
+            local.append(((time.perf_counter() - t0) * 1000, resp.status_code, len(body)))
+        with lock:
+            for elapsed, status, size in local:
+                timings.append(elapsed)
+                statuses[status] += 1
+                sizes.append(size)
+
+    threads = [threading.Thread(target=worker, args=(i, n)) for i, n in enumerate(per_thread) if n]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    result = summarize(timings)
+    result.update({
+        "rps": round(len(timings) / wall, 2) if wall else None,
+        "wall_s": round(wall, 4),
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+        "mean_bytes": int(sum(sizes) / len(sizes)) if sizes else 0,
+    })
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description="Carga em processo por endpoint")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--rows", type=int, help="Usa um catálogo sintético com N linhas")
+    source.add_argument("--csv", help="CSV do catálogo (padrão: BOOKS_CSV_PATH)")
+    parser.add_argument("--columnar", action="store_true", help="Carrega o catálogo pelo formato colunar")
+    parser.add_argument("--requests", type=int, default=200, help="Requisições medidas por endpoint")
+    parser.add_argument("--warmup", type=int, default=10, help="Requisições de aquecimento por endpoint")
+    parser.add_argument("--concurrency", type=int, default=1, help="Threads simultâneas")
+    parser.add_argument("--endpoints", help="Subconjunto de endpoints (separados por vírgula)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    workdir = tempfile.mkdtemp(prefix="books-load-")
+    if args.rows:
+        csv_path = write_synthetic_csv(args.rows, workdir, seed=args.seed)
+    else:
+        csv_path = args.csv or app.config["BOOKS_CSV_PATH"]
+    catalog_path = None
+    if args.columnar:
+        import pandas as pd
+
+        catalog_path = os.path.join(workdir, "books.catalog")
+        write_catalog(pd.read_csv(csv_path), catalog_path)
+    app.config.update(BOOKS_CSV_PATH=csv_path, BOOKS_CATALOG_PATH=catalog_path)
+
+    with app.app_context():
+        from src.catalog import get_catalog_store
+
+        rows = len(get_catalog_store(app).snapshot())
+    available = endpoints(rows)
+    names = args.endpoints.split(",") if args.endpoints else list(available)
+    unknown = [n for n in names if n not in available]
+    if unknown:
+        parser.error(f"endpoints desconhecidos: {', '.join(unknown)} (disponíveis: {', '.join(available)})")
+
+    report = {
+        "meta": metadata("load", rows=rows, csv=csv_path, columnar=bool(catalog_path),
+                         requests=args.requests, concurrency=args.concurrency),
+        "results": {},
+    }
+    for index, name in enumerate(names):
+        result = run_endpoint(app, available[name], args.requests, args.concurrency, args.warmup, args.seed + index)
+        report["results"][name] = result
+        print(
+            f"  {name:<18} p50={result['p50_ms']:8.3f} ms  p95={result['p95_ms']:8.3f} ms  "
+            f"p99={result['p99_ms']:8.3f} ms  rps={result['rps']:9.1f}  status={result['status']}",
+            file=sys.stderr,
+        )
+    print(save_results(report, args.output))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Micro-benchmarks das funções de consulta sobre catálogos sintéticos.
+
+    python -m benchmarks.micro [--sizes 1000,100000,1000000] [--output arquivo.json]
+
+Para cada tamanho mede a carga (CSV e colunar), a construção dos índices e
+agregados (a frio, um snapshot novo por repetição) e as consultas (a quente).
+"""
+import os
+import sys
+import argparse
+import datetime
+import tempfile
+
+import pandas as pd
+from werkzeug.datastructures import MultiDict
+
+from src import create_app
+from src.catalog import CatalogSnapshot, FileSignature
+from src.columnar import read_catalog, write_catalog
+from src.search import field_index, search_rows
+from src.indexes import PriceIndex, price_index, top_rated_rows
+from src.queries import QueryIndex, run_query, select_rows
+from src.similarity import similarity_index
+from src.fulltext import FullTextIndex
+from src.aggregates import CatalogAggregates, catalog_aggregates
+from src.responses import catalog_body, encode_json
+
+from .common import measure, metadata, save_results
+from .synthetic import write_synthetic_csv
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+
+
+def make_snapshot(df: pd.DataFrame) -> CatalogSnapshot:
+    return CatalogSnapshot(
+        df=df,
+        version=1,
+        signature=FileSignature(path="<synthetic>", mtime_ns=0, size=0),
+        loaded_at=datetime.datetime.now(datetime.timezone.utc),
+        load_seconds=0.0,
+    )
+
+
+def bench_size(rows: int, workdir: str, min_time: float) -> dict:
+    csv_path = write_synthetic_csv(rows, workdir)
+    catalog_path = os.path.join(workdir, f"books-{rows}.catalog")
+    df = pd.read_csv(csv_path)
+    write_catalog(df, catalog_path)
+    snap = make_snapshot(df)
+    # Aquece os derivados usados pelas consultas
+    field_index(snap, "title"), field_index(snap, "category"), price_index(snap), top_rated_rows(snap)
+    run_query(snap, MultiDict())
+    similarity_index(snap).similar(len(df) // 2, 10)
+    fulltext = FullTextIndex()
+    fulltext.sync(snap)
+    sample = df.iloc[: min(len(df), 50)].to_dict(orient="records")
+
+    cold = min(min_time, 0.1)
+    cases = {
+        # Carga
+        "load.read_csv": (lambda: pd.read_csv(csv_path), cold),
+        "load.read_catalog": (lambda: read_catalog(catalog_path), cold),
+        # Construção (a frio)
+        "build.title_index": (lambda: field_index(make_snapshot(df), "title"), cold),
+        "build.price_index": (lambda: PriceIndex(df), cold),
+        "build.aggregates": (lambda: CatalogAggregates.from_frame(df), cold),
+        "build.query_index": (lambda: QueryIndex(make_snapshot(df)), cold),
+        "build.similarity_index": (lambda: similarity_index(make_snapshot(df)), cold),
+        "build.fulltext_index": (lambda: FullTextIndex().sync(make_snapshot(df)), cold),
+        # Consultas (a quente) — as mesmas dos endpoints
+        "search.title_word": (lambda: search_rows(snap, title="light"), min_time),
+        "search.title_substring": (lambda: search_rows(snap, title="ster"), min_time),
+        "search.title_short": (lambda: search_rows(snap, title="a"), min_time),
+        "search.title_and_category": (lambda: search_rows(snap, title="the", category="myst"), min_time),
+        "price_range.narrow": (lambda: price_index(snap).query(10, 11), min_time),
+        "price_range.wide": (lambda: price_index(snap).query(10, 50), min_time),
+        "price_range.category_rating": (lambda: price_index(snap).query(10, 50, category="poetry", rating=3), min_time),
+        "select_rows.combined": (
+            lambda: select_rows(snap, MultiDict({"title": "love", "min": "20", "max": "40", "rating": "5"})),
+            min_time,
+        ),
+        "query.filter_sort_facets": (
+            lambda: run_query(snap, MultiDict({
+                "category": "Fiction", "rating_min": "4", "price_max": "30",
+                "sort": "price", "facets": "category,rating", "limit": "50",
+            })),
+            min_time,
+        ),
+        "query.sort_all_by_title": (lambda: run_query(snap, MultiDict({"sort": "title", "limit": "50"})), min_time),
+        "similar.lookup": (lambda: similarity_index(snap).similar(len(df) // 2, 10), min_time),
+        "fulltext.search": (lambda: fulltext.search("light love", 20), min_time),
+        "top_rated.rows": (lambda: top_rated_rows(snap), min_time),
+        "stats.overview": (lambda: catalog_aggregates(snap).overview(), min_time),
+        "stats.categories": (lambda: catalog_aggregates(snap).categories(), min_time),
+        "get_book.iloc": (lambda: df.iloc[len(df) // 2].to_dict(), min_time),
+        "serialize.page_50": (lambda: encode_json(sample), min_time),
+        "serialize.all_books": (lambda: catalog_body(make_snapshot(df), "books"), cold),
+    }
+    results = {}
+    for name, (fn, budget) in cases.items():
+        results[name] = measure(fn, min_time=budget)
+        print(f"  {rows:>9} {name:<32} p50={results[name]['p50_ms']:.3f} ms", file=sys.stderr)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.micro", description="Micro-benchmarks das consultas")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Tamanhos dos catálogos sintéticos (separados por vírgula)")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Tempo mínimo (s) por caso a quente")
+    parser.add_argument("--workdir", help="Diretório para os catálogos gerados (padrão: temporário)")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    workdir = args.workdir or tempfile.mkdtemp(prefix="books-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    app = create_app()
+    report = {"meta": metadata("micro", sizes=sizes), "results": {}}
+    with app.app_context():
+        for rows in sizes:
+            report["results"][str(rows)] = bench_size(rows, workdir, args.min_time)
+    print(save_results(report, args.output))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
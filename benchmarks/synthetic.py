@@ -0,0 +1,55 @@
+"""Catálogos sintéticos com o mesmo esquema de `data/dados-books.csv`."""
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.crawler import FINAL_COLS
+
+CATEGORIES = [
+    "Academic", "Add a comment", "Adult Fiction", "Art", "Autobiography", "Biography",
+    "Business", "Childrens", "Christian", "Christian Fiction", "Classics", "Contemporary",
+    "Crime", "Cultural", "Default", "Erotica", "Fantasy", "Fiction", "Food and Drink",
+    "Health", "Historical", "Historical Fiction", "History", "Horror", "Humor", "Music",
+    "Mystery", "New Adult", "Nonfiction", "Novels", "Paranormal", "Parenting",
+    "Philosophy", "Poetry", "Politics", "Psychology", "Religion", "Romance", "Science",
+    "Science Fiction", "Self Help", "Sequential Art", "Short Stories", "Spirituality",
+    "Sports and Games", "Suspense", "Thriller", "Travel", "Womens Fiction", "Young Adult",
+]
+WORDS = (
+    "the a of and in to light attic velvet soumission sharp objects sapiens brief history "
+    "humankind requiem red dirty little secrets coming woman black maria starving hearts "
+    "shakespeare sonnets set me free scott pilgrim precious little life boys boat nine "
+    "americans epic quest olympic gold marriage origins mesaerion best science fiction "
+    "stories olio mystery garden night city love war dark world house girl man time"
+).split()
+BASE_URL = "https://books.toscrape.com/"
+
+
+def synthetic_catalog(rows: int, seed: int = 42) -> pd.DataFrame:
+    """Gera `rows` livros com distribuições próximas às do catálogo real."""
+    rng = np.random.default_rng(seed)
+    words = np.array(WORDS, dtype=object)
+    lengths = rng.integers(1, 7, size=rows)
+    picks = rng.integers(0, len(words), size=int(lengths.sum()))
+    bounds = np.concatenate(([0], np.cumsum(lengths)))
+    titles = [" ".join(words[picks[bounds[i]:bounds[i + 1]]]).title() for i in range(rows)]
+    slugs = [f"{t.lower().replace(' ', '-')}_{i}" for i, t in enumerate(titles)]
+    hashes = rng.integers(0, 16 ** 8, size=rows)
+    return pd.DataFrame({
+        "title": titles,
+        "price": np.round(rng.uniform(10, 60, size=rows), 2),
+        "rating": rng.integers(1, 6, size=rows),
+        "availability": "In stock",
+        "category": rng.choice(np.array(CATEGORIES, dtype=object), size=rows),
+        "image": [f"{BASE_URL}media/cache/{h:08x}.jpg" for h in hashes],
+        "detail_url": [f"{BASE_URL}catalogue/{s}/index.html" for s in slugs],
+    })[FINAL_COLS]
+
+
+def write_synthetic_csv(rows: int, directory: str, seed: int = 42) -> str:
+    """Grava (uma vez) o catálogo sintético em `directory` e retorna o caminho do CSV."""
+    path = os.path.join(directory, f"books-{rows}.csv")
+    if not os.path.exists(path):
+        synthetic_catalog(rows, seed).to_csv(path, index=False)
+    return path
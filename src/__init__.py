@@ -3,13 +3,53 @@ from .config import Config
 from flask import Flask
 
 def create_app():
+    from .responses import CatalogJSONProvider
+
     app = Flask(__name__)
+    app.json = CatalogJSONProvider(app)
     
     # Carregar configurações no app.config para uso global
     app.config["BOOKS_CSV_PATH"] = Config.BOOKS_CSV_PATH
+    app.config["BOOKS_CATALOG_PATH"] = Config.BOOKS_CATALOG_PATH
+    app.config["BOOKS_MAX_IDS"] = Config.BOOKS_MAX_IDS
+    app.config["CATALOG_CHECK_INTERVAL"] = Config.CATALOG_CHECK_INTERVAL
+    app.config["ENRICHMENT_TTL_SECONDS"] = Config.ENRICHMENT_TTL_SECONDS
+    app.config["ENRICHMENT_NEGATIVE_TTL_SECONDS"] = Config.ENRICHMENT_NEGATIVE_TTL_SECONDS
+    app.config["ENRICHMENT_CACHE_SIZE"] = Config.ENRICHMENT_CACHE_SIZE
+    app.config["ENRICHMENT_TIMEOUT"] = Config.ENRICHMENT_TIMEOUT
+    app.config["ENRICHMENT_POOL_SIZE"] = Config.ENRICHMENT_POOL_SIZE
+    app.config["ENRICHMENT_BATCH_WORKERS"] = Config.ENRICHMENT_BATCH_WORKERS
+    app.config["ENRICHMENT_PER_HOST"] = Config.ENRICHMENT_PER_HOST
+    app.config["ENRICHMENT_BATCH_MAX_IDS"] = Config.ENRICHMENT_BATCH_MAX_IDS
+    app.config["ENRICHMENT_STORE_PATH"] = Config.ENRICHMENT_STORE_PATH
+    app.config["ENRICHMENT_STORE_MAX_AGE_SECONDS"] = Config.ENRICHMENT_STORE_MAX_AGE_SECONDS
+    app.config["ENRICHMENT_WARMUP_ON_START"] = Config.ENRICHMENT_WARMUP_ON_START
+    app.config["ENRICHMENT_WARMUP_WORKERS"] = Config.ENRICHMENT_WARMUP_WORKERS
+    app.config["COMPRESSION_ENCODINGS"] = Config.COMPRESSION_ENCODINGS
+    app.config["COMPRESSION_MIN_BYTES"] = Config.COMPRESSION_MIN_BYTES
+    app.config["ML_HASH_FEATURES"] = Config.ML_HASH_FEATURES
+    app.config["ML_MODEL_PATH"] = Config.ML_MODEL_PATH
+    app.config["ML_BATCH_MAX_SIZE"] = Config.ML_BATCH_MAX_SIZE
+    app.config["ML_BATCH_MAX_WAIT_MS"] = Config.ML_BATCH_MAX_WAIT_MS
+    app.config["ML_PREDICT_MAX_ROWS"] = Config.ML_PREDICT_MAX_ROWS
+    app.config["ML_PREDICT_TIMEOUT_SECONDS"] = Config.ML_PREDICT_TIMEOUT_SECONDS
+    app.config["SIMILAR_TOP_K"] = Config.SIMILAR_TOP_K
+    app.config["SIMILAR_MAX_TERMS"] = Config.SIMILAR_MAX_TERMS
+    app.config["SIMILAR_PRECOMPUTE_MAX_ROWS"] = Config.SIMILAR_PRECOMPUTE_MAX_ROWS
+    app.config["FULLTEXT_MAX_RESULTS"] = Config.FULLTEXT_MAX_RESULTS
+    app.config["FULLTEXT_SYNC_SECONDS"] = Config.FULLTEXT_SYNC_SECONDS
+    app.config["FULLTEXT_WARMUP_ON_START"] = Config.FULLTEXT_WARMUP_ON_START
+    app.config["ASGI_THREADS"] = Config.ASGI_THREADS
     app.config["JWT_SECRET"] = Config.JWT_SECRET
     app.config["JWT_ALGORITHM"] = Config.JWT_ALGORITHM
     app.config["JWT_EXP_DELTA_SECONDS"] = Config.JWT_EXP_DELTA_SECONDS
+    app.config["JWT_CACHE_SIZE"] = Config.JWT_CACHE_SIZE
+    app.config["PROFILING_ENABLED"] = Config.PROFILING_ENABLED
+    app.config["PROFILING_HEADER"] = Config.PROFILING_HEADER
+    app.config["PROFILING_ADMINS"] = Config.PROFILING_ADMINS
+    app.config["PROFILING_SAMPLE_RATE"] = Config.PROFILING_SAMPLE_RATE
+    app.config["PROFILING_INTERVAL"] = Config.PROFILING_INTERVAL
+    app.config["PROFILING_MAX_PROFILES"] = Config.PROFILING_MAX_PROFILES
 
     swagger_config = {
         "headers": [],
@@ -50,6 +90,20 @@ def create_app():
 
     Swagger(app, config=swagger_config, template=swagger_template)
 
+    # Profiling por dentro das métricas: a rota medida já vem do before_request
+    from .profiling import init_profiling
+    init_profiling(app)
+
+    from .metrics import init_metrics
+    init_metrics(app)
+
     from . import main
     main.register_routes(app)
+
+    if app.config["ENRICHMENT_WARMUP_ON_START"]:
+        from .enrichment import start_warm_up
+        start_warm_up(app)
+    if app.config["FULLTEXT_WARMUP_ON_START"]:
+        from . import fulltext
+        fulltext.start_warm_up(app)
     return app
\ No newline at end of file
@@ -0,0 +1,299 @@
+import math
+import logging
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+import pandas as pd
+
+from .catalog import CatalogSnapshot
+
+logger = logging.getLogger("app")
+
+# Acima desta fração de linhas alteradas, reconstruir é mais barato que aplicar o delta
+MAX_DELTA_FRACTION = 0.2
+PERCENTILES = (0.25, 0.5, 0.75, 0.9)
+# Colunas que entram nos agregados: só mudanças nelas contam para o delta
+DELTA_COLUMNS = ["price", "rating", "category"]
+
+
+class QuantileSketch:
+    """
+    Sketch de quantis com erro relativo limitado (estilo DDSketch).
+
+    Valores caem em buckets logarítmicos; o sketch é mesclável (soma de
+    contagens) e aceita remoções, o que permite manutenção por delta.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, counts: dict = None, zero_count: int = 0):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.counts = dict(counts or {})
+        self.zero_count = zero_count
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.counts.values())
+
+    def copy(self) -> "QuantileSketch":
+        return QuantileSketch(self.relative_accuracy, self.counts, self.zero_count)
+
+    def add(self, values: np.ndarray, sign: int = 1) -> None:
+        """Adiciona (sign=1) ou remove (sign=-1) um lote de valores."""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        positive = values[values > 0]
+        self.zero_count += sign * int(len(values) - len(positive))
+        if not len(positive):
+            return
+        keys = np.ceil(np.log(positive) / self._log_gamma).astype(np.int64)
+        for key, n in zip(*np.unique(keys, return_counts=True)):
+            total = self.counts.get(int(key), 0) + sign * int(n)
+            if total > 0:
+                self.counts[int(key)] = total
+            else:
+                self.counts.pop(int(key), None)
+
+    def merge(self, other: "QuantileSketch", sign: int = 1) -> None:
+        self.zero_count += sign * other.zero_count
+        for key, n in other.counts.items():
+            total = self.counts.get(key, 0) + sign * n
+            if total > 0:
+                self.counts[key] = total
+            else:
+                self.counts.pop(key, None)
+
+    def quantile(self, q: float):
+        n = self.count
+        if n <= 0:
+            return None
+        rank = q * (n - 1)
+        running = self.zero_count
+        if running > rank:
+            return 0.0
+        for key in sorted(self.counts):
+            running += self.counts[key]
+            if running > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.counts) / (self.gamma + 1)
+
+
+@dataclass
+class GroupStats:
+    """Agregados de um grupo de livros (uma categoria ou o catálogo inteiro)."""
+    rows: int = 0
+    price_count: int = 0
+    price_sum: float = 0.0
+    price_min: float = math.nan
+    price_max: float = math.nan
+    ratings: dict = field(default_factory=dict)
+    sketch: QuantileSketch = field(default_factory=QuantileSketch)
+    # min/max desatualizados após remoção do valor extremo (recalcular)
+    stale_extremes: bool = False
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "GroupStats":
+        return cls.from_arrays(_prices(df), _ratings(df))
+
+    @classmethod
+    def from_arrays(cls, prices: np.ndarray, ratings: np.ndarray) -> "GroupStats":
+        """Preços e ratings em float (NaN = ausente), um valor por livro."""
+        rows = len(prices)
+        prices = prices[~np.isnan(prices)]
+        keys, counts = np.unique(ratings[~np.isnan(ratings)].astype(np.int64), return_counts=True)
+        sketch = QuantileSketch()
+        sketch.add(prices)
+        return cls(
+            rows=rows,
+            price_count=len(prices),
+            price_sum=float(prices.sum()),
+            price_min=float(prices.min()) if len(prices) else math.nan,
+            price_max=float(prices.max()) if len(prices) else math.nan,
+            ratings={int(k): int(n) for k, n in zip(keys, counts)},
+            sketch=sketch,
+        )
+
+    def combined(self, other: "GroupStats", sign: int = 1) -> "GroupStats":
+        """Novo GroupStats com `other` somado (sign=1) ou subtraído (sign=-1)."""
+        ratings = dict(self.ratings)
+        for key, n in other.ratings.items():
+            total = ratings.get(key, 0) + sign * n
+            if total > 0:
+                ratings[key] = total
+            else:
+                ratings.pop(key, None)
+        sketch = self.sketch.copy()
+        sketch.merge(other.sketch, sign)
+        result = replace(
+            self,
+            rows=self.rows + sign * other.rows,
+            price_count=self.price_count + sign * other.price_count,
+            price_sum=self.price_sum + sign * other.price_sum,
+            ratings=ratings,
+            sketch=sketch,
+        )
+        if sign > 0:
+            result.price_min = float(np.nanmin([self.price_min, other.price_min]))
+            result.price_max = float(np.nanmax([self.price_max, other.price_max]))
+        elif other.price_count and (other.price_min <= self.price_min or other.price_max >= self.price_max):
+            result.stale_extremes = True
+        return result
+
+    @property
+    def price_mean(self) -> float:
+        return self.price_sum / self.price_count if self.price_count else math.nan
+
+    def percentiles(self) -> dict:
+        result = {}
+        for q in PERCENTILES:
+            value = self.sketch.quantile(q)
+            result[f"p{int(q * 100)}"] = round(value, 2) if value is not None else None
+        return result
+
+
+def _round(value: float):
+    return float(np.round(value, 2))
+
+
+def _prices(df: pd.DataFrame) -> np.ndarray:
+    return df["price"].to_numpy(dtype=float, na_value=np.nan)
+
+
+def _ratings(df: pd.DataFrame) -> np.ndarray:
+    return df["rating"].to_numpy(dtype=float, na_value=np.nan)
+
+
+def _by_category(df: pd.DataFrame) -> dict:
+    # Um sort dos códigos em vez de groupby: o custo por grupo fica em numpy puro
+    codes, categories = pd.factorize(df["category"])
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(categories) + 1))
+    prices, ratings = _prices(df)[order], _ratings(df)[order]
+    return {
+        categories[i]: GroupStats.from_arrays(prices[start:end], ratings[start:end])
+        for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:]))
+    }
+
+
+def _with_extremes(stats: GroupStats, prices: np.ndarray) -> GroupStats:
+    """`stats` com min/max recalculados a partir dos preços atuais do grupo."""
+    prices = prices[~np.isnan(prices)]
+    return replace(
+        stats,
+        price_min=float(prices.min()) if len(prices) else math.nan,
+        price_max=float(prices.max()) if len(prices) else math.nan,
+        stale_extremes=False,
+    )
+
+
+class RowDigest:
+    """
+    Chave (`detail_url`) e hash das colunas agregadas de cada linha de um
+    frame: acha as linhas alteradas entre snapshots sem comparar célula a célula.
+    """
+
+    def __init__(self, df: pd.DataFrame, key: str = "detail_url"):
+        self.keys = df[key].to_numpy(dtype=object)
+        self.hashes = pd.util.hash_pandas_object(df[DELTA_COLUMNS], index=False).to_numpy()
+
+    def diff(self, new: "RowDigest"):
+        """
+        (linhas removidas deste, linhas adicionadas em `new`), em posições.
+        Alterações contam como remoção + adição.
+
+        Só casa linhas na mesma posição: retorna None se as chaves da parte
+        comum não forem as mesmas, na mesma ordem. Casar por chave exige um
+        hash table das URLs, que custa tanto quanto recalcular os agregados;
+        releituras do site e livros novos no fim mantêm as posições.
+        """
+        common = min(len(self.keys), len(new.keys))
+        if not (self.keys[:common] == new.keys[:common]).all():
+            return None
+        changed = np.flatnonzero(self.hashes[:common] != new.hashes[:common])
+        removed = np.concatenate([changed, np.arange(common, len(self.keys))])
+        added = np.concatenate([changed, np.arange(common, len(new.keys))])
+        return removed, added
+
+
+def row_digest(snapshot: CatalogSnapshot):
+    """RowDigest do snapshot (None se faltar a chave ou alguma coluna agregada)."""
+    if not {"detail_url", *DELTA_COLUMNS} <= set(snapshot.df.columns):
+        return None
+    return snapshot.derive("row_digest", lambda snap: RowDigest(snap.df))
+
+
+class CatalogAggregates:
+    """Agregados globais e por categoria de um snapshot."""
+
+    def __init__(self, overall: GroupStats, by_category: dict):
+        self.overall = overall
+        self.by_category = by_category
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "CatalogAggregates":
+        return cls(GroupStats.from_frame(df), _by_category(df))
+
+    def apply_delta(self, removed: pd.DataFrame, added: pd.DataFrame, df: pd.DataFrame) -> "CatalogAggregates":
+        """Novos agregados a partir deste + delta; `df` é o frame novo (recalcula extremos)."""
+        overall = self.overall.combined(GroupStats.from_frame(removed), -1)
+        overall = overall.combined(GroupStats.from_frame(added), 1)
+        by_category = dict(self.by_category)
+        for category, stats in _by_category(removed).items():
+            by_category[category] = by_category[category].combined(stats, -1)
+        for category, stats in _by_category(added).items():
+            current = by_category.get(category)
+            by_category[category] = current.combined(stats, 1) if current else stats
+        for category in list(by_category):
+            stats = by_category[category]
+            if stats.rows <= 0:
+                del by_category[category]
+            elif stats.stale_extremes:
+                mask = (df["category"] == category).to_numpy(dtype=bool, na_value=False)
+                by_category[category] = _with_extremes(stats, _prices(df)[mask])
+        if overall.stale_extremes:
+            overall = _with_extremes(overall, _prices(df))
+        return CatalogAggregates(overall, by_category)
+
+    def overview(self) -> dict:
+        stats = self.overall
+        return {
+            "total_books": stats.rows,
+            "average_price": _round(stats.price_mean),
+            "rating_distribution": dict(sorted(stats.ratings.items())),
+            "price_percentiles": stats.percentiles(),
+        }
+
+    def categories(self) -> list:
+        return [
+            {
+                "category": category,
+                "total_books": stats.price_count,
+                "avg_price": _round(stats.price_mean),
+                "min_price": _round(stats.price_min),
+                "max_price": _round(stats.price_max),
+            }
+            for category, stats in sorted(self.by_category.items())
+        ]
+
+
+def _build(snapshot: CatalogSnapshot) -> CatalogAggregates:
+    df = snapshot.df
+    limit = MAX_DELTA_FRACTION * max(len(df), 1)
+    previous = snapshot.previous
+    base = previous.peek_derived("aggregates") if previous is not None else None
+    # O delta só compensa com poucas linhas alteradas: a variação do tamanho já
+    # é um piso para o número de mudanças, e dispensa o hash das linhas
+    if base is not None and abs(len(df) - len(previous)) <= limit:
+        old, new = row_digest(previous), row_digest(snapshot)
+        delta = old.diff(new) if old is not None and new is not None else None
+        if delta is not None:
+            removed, added = delta
+            if len(removed) + len(added) <= limit:
+                logger.info(f"Agregados atualizados por delta: -{len(removed)} +{len(added)} linhas")
+                return base.apply_delta(previous.df.iloc[removed], df.iloc[added], df)
+    return CatalogAggregates.from_frame(df)
+
+
+def catalog_aggregates(snapshot: CatalogSnapshot) -> CatalogAggregates:
+    """Agregados do snapshot (por delta do snapshot anterior quando possível)."""
+    return snapshot.derive("aggregates", _build)
@@ -0,0 +1,444 @@
+"""
+Modo de execução assíncrono (ASGI).
+
+Uso:
+    uvicorn --factory src.asgi:create_asgi_app --workers 2 --port 5000
+    python -m src.asgi
+
+- As rotas de enriquecimento (scrape-book, scrape-books) rodam como corrotinas:
+  o download é feito com httpx assíncrono e não ocupa threads enquanto espera
+  a rede, então milhares de requisições lentas cabem em poucos workers.
+- As demais rotas (consultas, estatísticas, exportação, Swagger) são as mesmas
+  do app Flask e rodam num pool de threads, fora do event loop.
+- O cache de enriquecimento é o mesmo do modo WSGI (`EnrichmentEngine.cache`),
+  assim como o store persistente (SQLite), lido e gravado no pool de threads.
+- As rotas assíncronas entram nas mesmas métricas (/metrics) e no mesmo
+  profiling sob demanda das rotas Flask; o trabalho de CPU delas (JWT,
+  busca no catálogo) roda no pool de threads, que é o que o profiler amostra.
+"""
+import os
+import re
+import sys
+import json
+import asyncio
+import logging
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+from urllib.parse import urlsplit
+
+import httpx
+
+from . import create_app
+from .catalog import get_catalog_store
+from .indexes import book_ids
+from .metrics import RequestMetrics, span, tracking
+from .profiling import get_profiler
+from .responses import InvalidParameter
+from .enrichment import batch_line, get_enrichment_engine, parse_batch_ids, resolve_batch
+from .utilidades import UNAVAILABLE_DETAILS, authenticate, parse_book_details
+
+logger = logging.getLogger("app")
+
+# Corpo de requisição acima disto vai para disco antes de chegar ao Flask
+MAX_SPOOLED_BODY = 1024 * 1024
+
+# Perfil da requisição assíncrona em andamento (None se ela não é perfilada)
+_recording = contextvars.ContextVar("asgi_recording", default=None)
+
+
+class AsyncEnrichment:
+    """
+    Versão em corrotinas do EnrichmentEngine: mesmo cache, TTLs e limite por
+    host, com fetch via httpx e single-flight por `asyncio.Task`.
+    """
+
+    def __init__(self, engine, client: httpx.AsyncClient, executor: ThreadPoolExecutor):
+        self.engine = engine
+        self.client = client
+        self.executor = executor
+        self._inflight = {}
+        self._host_slots = {}
+
+    def _host_slot(self, detail_url: str) -> asyncio.Semaphore:
+        host = urlsplit(detail_url).netloc
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.engine.per_host)
+        return slot
+
+    async def _fetch(self, detail_url: str):
+        """Retorna (detalhes, sucesso)."""
+        try:
+            async with self._host_slot(detail_url):
+                resp = await self.client.get(detail_url)
+            resp.raise_for_status()
+            # Parsing do HTML é CPU: roda no pool para não travar o event loop
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, parse_book_details, resp.text), True
+        except Exception as e:
+            logger.warning(f"Falha ao fazer scraping de {detail_url}: {e}")
+            return dict(UNAVAILABLE_DETAILS), False
+
+    async def _load(self, detail_url: str, fallback: dict = None) -> dict:
+        details, ok = await self._fetch(detail_url)
+        if ok:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.engine.save, detail_url, details)
+        elif fallback is not None:
+            details = fallback
+        self.engine.cache.set(detail_url, details, self.engine.ttl if ok else self.engine.negative_ttl)
+        return details
+
+    def _start_load(self, detail_url: str, fallback: dict = None) -> asyncio.Future:
+        task = self._inflight.get(detail_url)
+        if task is None:
+            task = self._inflight[detail_url] = asyncio.ensure_future(self._load(detail_url, fallback))
+            task.add_done_callback(lambda _: self._inflight.pop(detail_url, None))
+        return task
+
+    async def get(self, detail_url: str) -> dict:
+        cached = self.engine.cache.get(detail_url, None)
+        if cached is not None:
+            return dict(cached)
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(self.executor, self.engine.stored, detail_url)
+        if entry is not None:
+            details, fetched_at = entry
+            self.engine.cache.set(detail_url, details, self.engine.ttl)
+            if self.engine.is_stale(fetched_at):
+                # Atualização em background; a resposta usa a versão guardada
+                self._start_load(detail_url, details)
+            return dict(details)
+        # shield: um cliente que desconecta não cancela o fetch compartilhado
+        return dict(await asyncio.shield(self._start_load(detail_url)))
+
+
+def _sampled(recording, fn, *args):
+    with recording.sampling():
+        return fn(*args)
+
+
+def _wsgi_environ(scope, body) -> dict:
+    """Environ WSGI equivalente ao escopo HTTP do ASGI."""
+    script_name = scope.get("root_path", "").encode("utf-8").decode("latin-1")
+    path_info = scope["path"].encode("utf-8").decode("latin-1")
+    if script_name and path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": script_name,
+        "PATH_INFO": path_info,
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = f"HTTP_{name}"
+        value = value.decode("latin-1")
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+def _headers(scope) -> dict:
+    return {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+
+
+class AsyncBooksApp:
+    """
+    Aplicação ASGI: rotas de I/O em corrotinas, o resto delegado ao app Flask
+    (WSGI) executado em `ThreadPoolExecutor`.
+    """
+
+    def __init__(self, flask_app, threads: int = 32):
+        self.flask_app = flask_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="asgi")
+        self._enrichment = None
+        # (método, padrão, regra Flask equivalente — rótulo das métricas, rota)
+        self.routes = [
+            ("GET", re.compile(r"/api/v1/scrape-book/([^/]+)"), "/api/v1/scrape-book/<book_id>", self.scrape_book),
+            ("POST", re.compile(r"/api/v1/scrape-books"), "/api/v1/scrape-books", self.scrape_books),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            raise ValueError(f"Tipo de conexão não suportado: {scope['type']}")
+        for method, pattern, rule, handler in self.routes:
+            match = pattern.fullmatch(scope["path"])
+            if match and scope["method"] == method:
+                return await self._instrumented(rule, handler, scope, receive, send, *match.groups())
+        return await self._call_wsgi(scope, receive, send)
+
+    # ----- Instrumentação das rotas assíncronas -----
+    async def _instrumented(self, rule, handler, scope, receive, send, *args):
+        """
+        Executa a rota com as mesmas métricas e o mesmo profiling sob demanda
+        que os middlewares WSGI aplicam às rotas Flask.
+        """
+        req = RequestMetrics(scope["method"])
+        req.route = rule
+
+        async def metered_send(message):
+            if message["type"] == "http.response.start":
+                req.status = str(message["status"])
+            elif message["type"] == "http.response.body":
+                req.size += len(message.get("body", b""))
+            await send(message)
+
+        profiler = get_profiler(self.flask_app)
+        environ = recording = None
+        if profiler is not None:
+            environ = _wsgi_environ(scope, None)
+            # A seleção pode decodificar o JWT do header: fora do event loop
+            recording = await self._in_thread(profiler.begin, environ)
+        token = _recording.set(recording)
+        try:
+            with tracking(req):
+                await handler(scope, receive, metered_send, *args)
+        finally:
+            _recording.reset(token)
+            self.flask_app.extensions["metrics"].record(req)
+            if recording is not None:
+                profiler.finish(environ, recording, req.status, rule)
+
+    async def _in_thread(self, fn, *args):
+        """
+        Roda `fn` no pool de threads, fora do event loop. Em requisições
+        perfiladas, a thread do pool é amostrada enquanto `fn` executa.
+        """
+        recording = _recording.get()
+        if recording is not None:
+            fn = functools.partial(_sampled, recording, fn)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    # ----- Ciclo de vida -----
+    @property
+    def enrichment(self) -> AsyncEnrichment:
+        if self._enrichment is None:
+            engine = get_enrichment_engine(self.flask_app)
+            client = httpx.AsyncClient(
+                timeout=engine.timeout,
+                limits=httpx.Limits(max_connections=self.flask_app.config.get("ENRICHMENT_POOL_SIZE", 20)),
+                follow_redirects=True,
+            )
+            self._enrichment = AsyncEnrichment(engine, client, self.executor)
+        return self._enrichment
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                loop = asyncio.get_running_loop()
+                try:
+                    # Carga inicial do catálogo fora do event loop
+                    await loop.run_in_executor(self.executor, get_catalog_store(self.flask_app).snapshot)
+                except FileNotFoundError as e:
+                    logger.warning(str(e))
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._enrichment is not None:
+                    await self._enrichment.client.aclose()
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # ----- Ponte WSGI -----
+    async def _call_wsgi(self, scope, receive, send):
+        body = SpooledTemporaryFile(max_size=MAX_SPOOLED_BODY)
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.write(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body.seek(0)
+        loop = asyncio.get_running_loop()
+
+        def send_sync(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        try:
+            await loop.run_in_executor(self.executor, self._run_wsgi, _wsgi_environ(scope, body), send_sync)
+        finally:
+            body.close()
+
+    def _run_wsgi(self, environ, send_sync) -> None:
+        """Executa o app Flask numa thread do pool, repassando o corpo em partes."""
+        state = {"start": None, "sent": False}
+
+        def write(data: bytes):
+            if not state["sent"]:
+                send_sync(state["start"])
+                state["sent"] = True
+            if data:
+                send_sync({"type": "http.response.body", "body": data, "more_body": True})
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and state["sent"]:
+                raise exc_info[1].with_traceback(exc_info[2])
+            state["start"] = {
+                "type": "http.response.start",
+                "status": int(status.split(" ", 1)[0]),
+                "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+            }
+            return write
+
+        result = self.flask_app(environ, start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    write(chunk)
+            write(b"")
+            send_sync({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            close = getattr(result, "close", None)
+            if close is not None:
+                close()
+
+    # ----- Respostas -----
+    def _dumps(self, obj) -> bytes:
+        return self.flask_app.json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    async def _send_json(self, send, status: int, obj) -> None:
+        body = self._dumps(obj) + b"\n"
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def _authenticate(self, scope):
+        """Mensagem de erro do JWT, ou None (decodifica o token: chamar via `_in_thread`)."""
+        with self.flask_app.app_context():
+            _, error = authenticate(_headers(scope).get("authorization", ""))
+        return error
+
+    def _find_book(self, book_id: str):
+        """Livro do catálogo com o `id` estável, ou None (chamar via `_in_thread`)."""
+        snapshot = get_catalog_store(self.flask_app).snapshot()
+        index = book_ids(snapshot)
+        row = index.row_of(book_id)
+        if row < 0:
+            return None
+        return {"id": index.id_of(row), **snapshot.df.iloc[row].to_dict()}
+
+    def _resolve_batch(self, ids):
+        return resolve_batch(get_catalog_store(self.flask_app).snapshot(), ids)
+
+    async def _read_json(self, receive):
+        chunks, more_body = [], True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        try:
+            return json.loads(b"".join(chunks) or b"null")
+        except ValueError:
+            return None
+
+    # ----- Rotas assíncronas (mesmo contrato das rotas Flask) -----
+    async def scrape_book(self, scope, receive, send, book_id: str):
+        with span("auth"):
+            error = await self._in_thread(self._authenticate, scope)
+        if error:
+            return await self._send_json(send, 401, {"error": error})
+        try:
+            with span("query"):
+                book = await self._in_thread(self._find_book, book_id)
+            if book is None:
+                return await self._send_json(send, 404, {"error": "Livro não encontrado"})
+            detail_url = book.get("detail_url")
+            if not detail_url:
+                return await self._send_json(send, 500, {"error": "URL de detalhes ausente"})
+            book.update(await self.enrichment.get(detail_url))
+            return await self._send_json(send, 200, book)
+        except FileNotFoundError as e:
+            return await self._send_json(send, 500, {"error": str(e)})
+        except Exception:
+            logger.exception("Erro ao buscar livro por ID")
+            return await self._send_json(send, 500, {"error": "Falha ao buscar livro"})
+
+    async def scrape_books(self, scope, receive, send):
+        with span("auth"):
+            error = await self._in_thread(self._authenticate, scope)
+        if error:
+            return await self._send_json(send, 401, {"error": error})
+        content_type = _headers(scope).get("content-type", "").split(";")[0].strip()
+        data = await self._read_json(receive)
+        if content_type != "application/json" and not content_type.endswith("+json"):
+            data = None
+        try:
+            ids = parse_batch_ids(data or {}, self.flask_app.config.get("ENRICHMENT_BATCH_MAX_IDS", 500))
+            with span("query"):
+                books, failed = await self._in_thread(self._resolve_batch, ids)
+        except InvalidParameter as e:
+            return await self._send_json(send, 400, {"error": str(e)})
+        except FileNotFoundError as e:
+            return await self._send_json(send, 500, {"error": str(e)})
+        except Exception:
+            logger.exception("Erro no enriquecimento em lote")
+            return await self._send_json(send, 500, {"error": "Falha ao enriquecer livros"})
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/x-ndjson")],
+        })
+        pending = {
+            asyncio.ensure_future(self.enrichment.get(book["detail_url"])): book_id
+            for book_id, book in books.items()
+        }
+        try:
+            for item in failed:
+                await send({"type": "http.response.body", "body": self._dumps(item) + b"\n", "more_body": True})
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                lines = []
+                for task in done:
+                    book_id = pending.pop(task)
+                    error = task.exception()
+                    details = task.result() if error is None else None
+                    lines.append(self._dumps(batch_line(book_id, books[book_id], details, error)) + b"\n")
+                await send({"type": "http.response.body", "body": b"".join(lines), "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+def create_asgi_app() -> AsyncBooksApp:
+    """Fábrica do app ASGI (mesmas rotas e Swagger do `create_app`)."""
+    flask_app = create_app()
+    return AsyncBooksApp(flask_app, threads=flask_app.config.get("ASGI_THREADS", 32))
+
+
+# Executar como módulo: python -m src.asgi
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "src.asgi:create_asgi_app",
+        factory=True,
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "5000")),
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+    )
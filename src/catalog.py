@@ -0,0 +1,257 @@
+"""
+Snapshot do catálogo em memória e arquivo colunar.
+
+Uso (gera o arquivo colunar a partir do CSV):
+    python -m src.catalog build [--csv data/dados-books.csv] [--output data/dados-books.catalog]
+"""
+import os
+import sys
+import time
+import hashlib
+import logging
+import argparse
+import datetime
+import threading
+from dataclasses import dataclass
+
+import pandas as pd
+
+from .columnar import read_catalog, write_catalog
+
+logger = logging.getLogger("app")
+
+
+@dataclass(frozen=True)
+class FileSignature:
+    """Identifica uma versão do arquivo em disco por mtime e tamanho."""
+    path: str
+    mtime_ns: int
+    size: int
+
+    @classmethod
+    def of(cls, path: str) -> "FileSignature":
+        st = os.stat(path)
+        return cls(path=path, mtime_ns=st.st_mtime_ns, size=st.st_size)
+
+
+class CatalogSnapshot:
+    """
+    Versão imutável do catálogo carregada em memória.
+
+    O DataFrame é compartilhado por todas as requisições e NÃO deve ser
+    alterado pelos handlers (filtros que geram novos frames são ok).
+    Estruturas derivadas (índices, corpos serializados etc.) são calculadas
+    uma única vez por snapshot via `derive`.
+    """
+
+    def __init__(self, df: pd.DataFrame, version: int, signature: FileSignature,
+                 loaded_at: datetime.datetime, load_seconds: float):
+        self.df = df
+        self.version = version
+        self.signature = signature
+        self.loaded_at = loaded_at
+        self.load_seconds = load_seconds
+        # Snapshot anterior (um nível só), para atualizações incrementais de derivados
+        self.previous = None
+        self._derived = {}
+        self._derived_lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    @property
+    def etag(self) -> str:
+        """Versão dos dados para validação HTTP (mtime + tamanho do arquivo; igual entre workers)."""
+        raw = f"{self.signature.mtime_ns}:{self.signature.size}".encode("ascii")
+        return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+    @property
+    def last_modified(self) -> datetime.datetime:
+        """mtime do arquivo carregado, em segundos (precisão do header Last-Modified)."""
+        seconds = self.signature.mtime_ns // 1_000_000_000
+        return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc)
+
+    def derive(self, key, builder):
+        """Retorna (memoizado) o resultado de `builder(snapshot)` para a chave."""
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = builder(self)
+            return self._derived[key]
+
+    def peek_derived(self, key):
+        """Derivado já calculado para a chave, sem construir (ou None)."""
+        return self._derived.get(key)
+
+
+class CatalogStore:
+    """
+    Mantém o snapshot atual do catálogo para todo o processo.
+
+    - A primeira carga é síncrona; as seguintes acontecem em background.
+    - Mudanças são detectadas por mtime/tamanho do arquivo, verificados no
+      máximo a cada `check_interval` segundos.
+    - A troca de snapshot é uma atribuição de referência: cada requisição
+      enxerga um snapshot completo (o antigo ou o novo), nunca um parcial.
+    - Se existir o arquivo colunar (`catalog_path`) e ele não for mais antigo
+      que o CSV, ele é usado no lugar do CSV (carga via memmap, sem parsing).
+    """
+
+    def __init__(self, csv_path: str, check_interval: float = 2.0, catalog_path: str = None):
+        self.csv_path = csv_path
+        self.catalog_path = catalog_path
+        self._stale_warned = None
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._load_lock = threading.Lock()
+        self._reload_thread = None
+        self._next_check = 0.0
+
+    # ----- Leitura -----
+    def snapshot(self) -> CatalogSnapshot:
+        snap = self._snapshot
+        if snap is None:
+            return self._load_initial()
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self._check_for_changes(snap)
+        return snap
+
+    def peek(self):
+        """Snapshot atual sem disparar carga nem verificação (pode ser None)."""
+        return self._snapshot
+
+    # ----- Carga -----
+    def _source(self):
+        """(caminho, leitor) do arquivo a carregar: colunar se atualizado, senão CSV."""
+        if self.catalog_path and os.path.exists(self.catalog_path):
+            try:
+                catalog_mtime = os.stat(self.catalog_path).st_mtime_ns
+                stale = catalog_mtime < os.stat(self.csv_path).st_mtime_ns
+            except OSError:
+                stale = False
+            if not stale:
+                return self.catalog_path, read_catalog
+            if self._stale_warned != catalog_mtime:
+                self._stale_warned = catalog_mtime
+                logger.warning(f"Arquivo colunar mais antigo que o CSV; usando {self.csv_path}")
+        return self.csv_path, pd.read_csv
+
+    def _read(self, version: int) -> CatalogSnapshot:
+        path, reader = self._source()
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Arquivo CSV não encontrado em: {path}")
+        signature = FileSignature.of(path)
+        started = time.perf_counter()
+        df = reader(path)
+        elapsed = time.perf_counter() - started
+        # Se o arquivo mudou durante a leitura, o frame pode estar incompleto
+        if FileSignature.of(path) != signature:
+            raise RuntimeError(f"Arquivo alterado durante a leitura: {path}")
+        return CatalogSnapshot(
+            df=df,
+            version=version,
+            signature=signature,
+            loaded_at=datetime.datetime.now(datetime.timezone.utc),
+            load_seconds=elapsed,
+        )
+
+    def _load_initial(self) -> CatalogSnapshot:
+        with self._load_lock:
+            if self._snapshot is None:
+                self._snapshot = self._read(version=1)
+                self._next_check = time.monotonic() + self.check_interval
+                logger.info(f"Catálogo carregado: {len(self._snapshot)} registros")
+            return self._snapshot
+
+    def _check_for_changes(self, snap: CatalogSnapshot) -> None:
+        try:
+            current = FileSignature.of(self._source()[0])
+        except OSError:
+            logger.warning(f"Arquivo do catálogo indisponível; mantendo versão {snap.version}")
+            return
+        if current == snap.signature:
+            return
+        with self._load_lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return
+            self._reload_thread = threading.Thread(
+                target=self._reload, name="catalog-reload", daemon=True
+            )
+            self._reload_thread.start()
+
+    def _reload(self) -> None:
+        previous = self._snapshot
+        version = previous.version + 1 if previous else 1
+        try:
+            snap = self._read(version=version)
+        except Exception:
+            logger.exception("Falha ao recarregar o catálogo; mantendo snapshot anterior")
+            return
+        if previous is not None:
+            previous.previous = None
+            snap.previous = previous
+        self._snapshot = snap
+        logger.info(f"Catálogo recarregado: versão {snap.version}, {len(snap)} registros")
+
+    def refresh(self) -> CatalogSnapshot:
+        """Força uma recarga síncrona (útil após um novo scraping)."""
+        with self._load_lock:
+            self._reload()
+        return self.snapshot()
+
+
+_STORE_LOCK = threading.Lock()
+
+
+def get_catalog_store(app) -> CatalogStore:
+    """Retorna (criando se preciso) o CatalogStore associado ao app Flask."""
+    store = app.extensions.get("catalog")
+    if store is None:
+        with _STORE_LOCK:
+            store = app.extensions.get("catalog")
+            if store is None:
+                store = CatalogStore(
+                    app.config.get("BOOKS_CSV_PATH", "./data/dados-books.csv"),
+                    check_interval=app.config.get("CATALOG_CHECK_INTERVAL", 2.0),
+                    catalog_path=app.config.get("BOOKS_CATALOG_PATH"),
+                )
+                app.extensions["catalog"] = store
+    return store
+
+
+def build(csv_path: str, output: str) -> pd.DataFrame:
+    """Converte o CSV do catálogo para o formato colunar."""
+    df = pd.read_csv(csv_path)
+    write_catalog(df, output)
+    return df
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.catalog", description="Ferramentas do catálogo")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_cmd = commands.add_parser("build", help="Gera o arquivo colunar a partir do CSV")
+    build_cmd.add_argument("--csv", default=None, help="CSV de entrada (padrão: BOOKS_CSV_PATH)")
+    build_cmd.add_argument("--output", default=None, help="Arquivo de saída (padrão: BOOKS_CATALOG_PATH)")
+    args = parser.parse_args(argv)
+
+    from .config import Config
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    csv_path = args.csv or Config.BOOKS_CSV_PATH
+    output = args.output or Config.BOOKS_CATALOG_PATH
+    started = time.perf_counter()
+    df = build(csv_path, output)
+    logger.info(
+        f"Catálogo colunar gravado em {output}: {len(df)} registros, "
+        f"{os.path.getsize(output)} bytes, {time.perf_counter() - started:.2f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Formato colunar compacto do catálogo (arquivo único, mapeado em memória).
+
+Layout:
+    MAGIC (8 bytes) | tamanho do cabeçalho (uint64 LE) | cabeçalho JSON | buffers
+
+Cada buffer começa alinhado a 64 bytes. O cabeçalho descreve as colunas:
+  - float64: `values`
+  - int8 (nulável, vira `Int8`): `values` + `valid` (só se houver nulos)
+  - dictionary (vira `category`): `codes` (int8/int16/int32, -1 = nulo) + `dictionary`
+  - string: `offsets` (int32/int64, n+1) + `data` (UTF-8) + `valid`
+
+Buffers numéricos e códigos de dicionário são views de um único `np.memmap`,
+então workers de um mesmo host compartilham as mesmas páginas físicas e a
+carga não passa por parsing de texto.
+"""
+import os
+import json
+import struct
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"BKCAT\x00\x01\x00"
+ALIGNMENT = 64
+EXTENSION = ".catalog"
+
+# Codificação por coluna; colunas não listadas viram float64 (numéricas) ou string
+DICTIONARY_COLUMNS = ("category", "availability")
+INT8_COLUMNS = ("rating",)
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _codes_dtype(n_categories: int):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _encode_column(name: str, series: pd.Series):
+    """Retorna (descrição da coluna, {nome do buffer: ndarray})."""
+    valid = series.notna().to_numpy()
+    has_nulls = not valid.all()
+    if name in DICTIONARY_COLUMNS:
+        codes, uniques = pd.factorize(series, sort=True)
+        column = {"name": name, "type": "dictionary", "dictionary": [str(v) for v in uniques]}
+        return column, {"codes": codes.astype(_codes_dtype(len(uniques)))}
+    if name in INT8_COLUMNS:
+        values = pd.to_numeric(series, errors="coerce")
+        buffers = {"values": values.fillna(0).to_numpy().astype(np.int8)}
+        if has_nulls:
+            buffers["valid"] = valid
+        return {"name": name, "type": "int8"}, buffers
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return {"name": name, "type": "float64"}, {"values": series.to_numpy(dtype=np.float64, na_value=np.nan)}
+    encoded = [str(v).encode("utf-8") if ok else b"" for v, ok in zip(series.tolist(), valid)]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    if offsets[-1] <= np.iinfo(np.int32).max:
+        offsets = offsets.astype(np.int32)
+    buffers = {"offsets": offsets, "data": np.frombuffer(b"".join(encoded), dtype=np.uint8)}
+    if has_nulls:
+        buffers["valid"] = valid
+    return {"name": name, "type": "string"}, buffers
+
+
+def write_catalog(df: pd.DataFrame, path: str) -> None:
+    """Grava `df` no formato colunar, de forma atômica (temporário + os.replace)."""
+    columns, payload = [], []
+    offset = 0
+    for name in df.columns:
+        column, buffers = _encode_column(str(name), df[name])
+        column["buffers"] = {}
+        for key, array in buffers.items():
+            array = np.ascontiguousarray(array)
+            column["buffers"][key] = {"offset": offset, "dtype": array.dtype.str, "length": len(array)}
+            payload.append((offset, array))
+            offset = _align(offset + array.nbytes)
+        columns.append(column)
+    header = json.dumps({"rows": len(df), "columns": columns}, ensure_ascii=False).encode("utf-8")
+    # Buffers começam após o cabeçalho, também alinhados
+    base = _align(len(MAGIC) + 8 + len(header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", suffix=os.path.basename(path), dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(MAGIC)
+            fh.write(struct.pack("<Q", len(header)))
+            fh.write(header)
+            for start, array in payload:
+                fh.seek(base + start)
+                fh.write(array.tobytes())
+            fh.truncate(base + offset)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _read_header(path: str):
+    with open(path, "rb") as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Arquivo não está no formato colunar do catálogo: {path}")
+        (size,) = struct.unpack("<Q", fh.read(8))
+        header = json.loads(fh.read(size).decode("utf-8"))
+    return header, _align(len(MAGIC) + 8 + size)
+
+
+def _decode_strings(offsets: np.ndarray, data: np.ndarray, valid) -> np.ndarray:
+    raw = data.tobytes()
+    bounds = offsets.tolist()
+    values = np.empty(len(offsets) - 1, dtype=object)
+    values[:] = [raw[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(len(values))]
+    if valid is not None:
+        values[~valid] = np.nan
+    return values
+
+
+def read_catalog(path: str) -> pd.DataFrame:
+    """Carrega o arquivo colunar como DataFrame apoiado em memmap (somente leitura)."""
+    header, base = _read_header(path)
+    mm = np.memmap(path, dtype=np.uint8, mode="r")
+
+    def buffer(spec):
+        dtype = np.dtype(spec["dtype"])
+        start = base + spec["offset"]
+        return mm[start:start + spec["length"] * dtype.itemsize].view(dtype)
+
+    data = {}
+    for column in header["columns"]:
+        buffers = {key: buffer(spec) for key, spec in column["buffers"].items()}
+        valid = buffers.get("valid")
+        kind = column["type"]
+        if kind == "float64":
+            data[column["name"]] = buffers["values"]
+        elif kind == "int8":
+            mask = ~valid if valid is not None else np.zeros(header["rows"], dtype=bool)
+            data[column["name"]] = pd.arrays.IntegerArray(buffers["values"], mask)
+        elif kind == "dictionary":
+            data[column["name"]] = pd.Categorical.from_codes(buffers["codes"], categories=column["dictionary"])
+        elif kind == "string":
+            data[column["name"]] = _decode_strings(buffers["offsets"], buffers["data"], valid)
+        else:
+            raise ValueError(f"Tipo de coluna desconhecido no catálogo: {kind}")
+    return pd.DataFrame(data, copy=False)
@@ -0,0 +1,67 @@
+"""
+Compressão (Content-Encoding) dos corpos pré-serializados.
+
+gzip vem da biblioteca padrão; br e zstd dependem dos pacotes opcionais
+`brotli` e `zstandard` e só são oferecidos quando instalados. Como cada corpo
+é comprimido uma única vez por snapshot, os níveis são altos.
+"""
+import gzip
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+ZSTD_LEVEL = 12
+
+# Sufixo do ETag de cada representação comprimida
+ETAG_SUFFIXES = {"gzip": "-gz", "br": "-br", "zstd": "-zst"}
+
+
+def _gzip(body: bytes) -> bytes:
+    # mtime=0: mesma entrada, mesmos bytes (ETag estável entre workers)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    # ZstdCompressor não é thread-safe; um compressor por chamada
+    return lambda body: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+
+
+CODECS = {name: codec for name, codec in (
+    ("zstd", _zstd()),
+    ("br", _brotli()),
+    ("gzip", _gzip),
+) if codec is not None}
+
+
+def parse_encodings(value: str) -> tuple:
+    """Lista de encodings configurada (ordem de preferência), só com os disponíveis."""
+    names = (name.strip().lower() for name in value.split(","))
+    return tuple(name for name in names if name in CODECS)
+
+
+def negotiate_encoding(accept_encodings, offered: tuple):
+    """
+    Melhor encoding de `offered` aceito pelo cliente (maior q; empate segue a
+    ordem de `offered`), ou None para enviar sem compressão.
+    """
+    best, best_quality = None, 0
+    for name in offered:
+        quality = accept_encodings[name]
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    return CODECS[encoding](body)
@@ -9,10 +9,78 @@ class Config:
     JWT_SECRET = os.getenv("JWT_SECRET", "MEUSEGREDOAQUI")
     JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
     JWT_EXP_DELTA_SECONDS = int(os.getenv("JWT_EXP_DELTA_SECONDS", "3600"))
+    # Tokens verificados mantidos em cache (0 desativa)
+    JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
 
     # Caminho do CSV (padrão no projeto)
     BOOKS_CSV_PATH = os.getenv("BOOKS_CSV_PATH", "./data/dados-books.csv")
 
+    # Arquivo colunar (python -m src.catalog build); preferido ao CSV quando existe
+    BOOKS_CATALOG_PATH = os.getenv("BOOKS_CATALOG_PATH", "./data/dados-books.catalog")
+
+    # Máximo de ids por multi-get (/api/v1/books?ids=)
+    BOOKS_MAX_IDS = int(os.getenv("BOOKS_MAX_IDS", "1000"))
+
+    # Intervalo (s) entre verificações de mudança no arquivo do catálogo
+    CATALOG_CHECK_INTERVAL = float(os.getenv("CATALOG_CHECK_INTERVAL", "2"))
+
+    # Enriquecimento via scraping (cache, timeout e pool de conexões)
+    ENRICHMENT_TTL_SECONDS = float(os.getenv("ENRICHMENT_TTL_SECONDS", "3600"))
+    ENRICHMENT_NEGATIVE_TTL_SECONDS = float(os.getenv("ENRICHMENT_NEGATIVE_TTL_SECONDS", "60"))
+    ENRICHMENT_CACHE_SIZE = int(os.getenv("ENRICHMENT_CACHE_SIZE", "4096"))
+    ENRICHMENT_TIMEOUT = float(os.getenv("ENRICHMENT_TIMEOUT", "10"))
+    ENRICHMENT_POOL_SIZE = int(os.getenv("ENRICHMENT_POOL_SIZE", "20"))
+    ENRICHMENT_BATCH_WORKERS = int(os.getenv("ENRICHMENT_BATCH_WORKERS", "16"))
+    ENRICHMENT_PER_HOST = int(os.getenv("ENRICHMENT_PER_HOST", "4"))
+    ENRICHMENT_BATCH_MAX_IDS = int(os.getenv("ENRICHMENT_BATCH_MAX_IDS", "500"))
+    # Store persistente (SQLite) do enriquecimento; vazio desativa
+    ENRICHMENT_STORE_PATH = os.getenv("ENRICHMENT_STORE_PATH", "./data/enrichment.sqlite3")
+    # Entradas mais velhas que isto são servidas e atualizadas em background
+    ENRICHMENT_STORE_MAX_AGE_SECONDS = float(os.getenv("ENRICHMENT_STORE_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+    # Aquecimento do store com o catálogo inteiro ao iniciar (python -m src.enrichment warm faz o mesmo)
+    ENRICHMENT_WARMUP_ON_START = os.getenv("ENRICHMENT_WARMUP_ON_START", "false").lower() in ("1", "true", "yes")
+    ENRICHMENT_WARMUP_WORKERS = int(os.getenv("ENRICHMENT_WARMUP_WORKERS", "4"))
+
+    # Compressão dos corpos pré-serializados (ordem de preferência; vazio desativa)
+    COMPRESSION_ENCODINGS = os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip")
+    COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+    # /api/v1/ml/features: colunas do hashing trick das palavras do título
+    ML_HASH_FEATURES = int(os.getenv("ML_HASH_FEATURES", "32"))
+
+    # /api/v1/ml/predict: artefato do modelo (.npz linear ou pickle) e micro-lotes
+    ML_MODEL_PATH = os.getenv("ML_MODEL_PATH", "./models/model.npz")
+    ML_BATCH_MAX_SIZE = int(os.getenv("ML_BATCH_MAX_SIZE", "256"))
+    ML_BATCH_MAX_WAIT_MS = float(os.getenv("ML_BATCH_MAX_WAIT_MS", "2"))
+    ML_PREDICT_MAX_ROWS = int(os.getenv("ML_PREDICT_MAX_ROWS", "1000"))
+    # Tempo máximo (s) de espera pela predição de um lote
+    ML_PREDICT_TIMEOUT_SECONDS = float(os.getenv("ML_PREDICT_TIMEOUT_SECONDS", "30"))
+
+    # /api/v1/books/<id>/similar: vizinhos guardados por livro, vocabulário do TF-IDF
+    # dos títulos e tamanho máximo do catálogo com a tabela de vizinhos pré-calculada
+    SIMILAR_TOP_K = int(os.getenv("SIMILAR_TOP_K", "20"))
+    SIMILAR_MAX_TERMS = int(os.getenv("SIMILAR_MAX_TERMS", "1024"))
+    SIMILAR_PRECOMPUTE_MAX_ROWS = int(os.getenv("SIMILAR_PRECOMPUTE_MAX_ROWS", "20000"))
+
+    # /api/v1/books/search?q=: máximo de resultados e intervalo mínimo entre as
+    # leituras do store de enriquecimento que atualizam o índice textual
+    FULLTEXT_MAX_RESULTS = int(os.getenv("FULLTEXT_MAX_RESULTS", "100"))
+    FULLTEXT_SYNC_SECONDS = float(os.getenv("FULLTEXT_SYNC_SECONDS", "2"))
+    FULLTEXT_WARMUP_ON_START = os.getenv("FULLTEXT_WARMUP_ON_START", "true").lower() in ("1", "true", "yes")
+
+    # Modo ASGI (src/asgi.py): threads para as rotas síncronas do Flask
+    ASGI_THREADS = int(os.getenv("ASGI_THREADS", "32"))
+
+    # Profiling sob demanda (src/profiling.py); desativado por padrão
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+    PROFILING_HEADER = os.getenv("PROFILING_HEADER", "X-Profile")
+    # Usuários (separados por vírgula) cujo header ativa o profiling e que podem baixar perfis
+    PROFILING_ADMINS = os.getenv("PROFILING_ADMINS", os.getenv("TEST_USERNAME", "admin"))
+    # Fração das demais requisições perfilada por amostragem (0 = só com o header)
+    PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+    PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", "0.001"))
+    PROFILING_MAX_PROFILES = int(os.getenv("PROFILING_MAX_PROFILES", "20"))
+
     # Swagger (apenas metadados; a config completa é passada no __init__.py)
     SWAGGER = {
         "title": os.getenv("SWAGGER_TITLE", "Catálogo API Scrape Books"),
@@ -0,0 +1,460 @@
+"""
+Crawler do catálogo books.toscrape.com → CSV/Parquet.
+
+Uso:
+    python -m src.crawler --output data/dados-books.csv [--output data/dados-books.parquet]
+                          [--output data/dados-books.catalog]
+
+- Páginas do catálogo e das categorias são baixadas em paralelo (pool limitado).
+- A categoria vem das páginas de listagem por categoria (sem abrir cada livro).
+- O progresso é salvo em um checkpoint; uma execução interrompida continua de onde parou.
+- A saída é gravada de forma atômica (arquivo temporário + rename).
+- Com --incremental, páginas são revalidadas (ETag/Last-Modified + hash do
+  conteúdo) e só os livros de páginas alteradas são aplicados ao dataset.
+"""
+import os
+import re
+import sys
+import json
+import hashlib
+import math
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+from urllib.request import url2pathname
+
+import requests
+import pandas as pd
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from . import columnar
+
+logger = logging.getLogger("app")
+
+BASE_URL = "https://books.toscrape.com/"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) "
+                  "AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/122.0.0.0 Safari/537.36"
+}
+FINAL_COLS = ["title", "price", "rating", "availability", "category", "image", "detail_url"]
+RATINGS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5}
+
+
+# --- HTTP ---------------------------------------------------------------------
+
+def make_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@dataclass
+class Page:
+    status: int
+    text: str = None
+    etag: str = None
+    last_modified: str = None
+
+
+def fetch_page(session: requests.Session, url: str, validators: dict = None,
+               retries: int = 3, backoff: float = 0.5) -> Page:
+    """
+    GET com retry e backoff exponencial com jitter. Aceita file:// (cópia local do site).
+    Com `validators` (etag/last_modified da execução anterior) a requisição é
+    condicional e pode retornar status 304 sem corpo.
+    """
+    if url.startswith("file://"):
+        path = url2pathname(urlsplit(url).path)
+        if path.endswith(os.sep):
+            path = os.path.join(path, "index.html")
+        with open(path, encoding="utf-8") as fh:
+            return Page(200, fh.read())
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    for attempt in range(retries):
+        try:
+            r = session.get(url, headers=headers, timeout=20)
+            if r.status_code == 304:
+                return Page(
+                    304,
+                    etag=r.headers.get("ETag", validators.get("etag")),
+                    last_modified=r.headers.get("Last-Modified", validators.get("last_modified")),
+                )
+            r.raise_for_status()
+            return Page(200, r.text, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        except requests.RequestException:
+            if attempt == retries - 1:
+                raise
+            time.sleep(backoff * 2 ** attempt * (1 + random.random()))
+
+
+# --- Parsing ------------------------------------------------------------------
+
+def parse_rating_to_int(tag):
+    """Converte o rating em texto (classe CSS) para inteiro 1-5."""
+    if not tag:
+        return None
+    for name in (c.lower() for c in tag.get("class", [])):
+        if name in RATINGS:
+            return RATINGS[name]
+    return None
+
+
+def clean_price_to_float(price_text: str) -> float:
+    """Extrai número do preço (ex.: '£51.77' → 51.77); NaN se não encontrar."""
+    if not price_text:
+        return math.nan
+    m = re.search(r"(\d+(?:\.\d+)?)", price_text.replace(",", "."))
+    return float(m.group(1)) if m else math.nan
+
+
+def parse_listing(soup: BeautifulSoup, page_url: str) -> list:
+    """Livros de uma página de listagem (<article class="product_pod">)."""
+    rows = []
+    for book in soup.select("article.product_pod"):
+        h3 = book.find("h3")
+        a = h3.find("a") if h3 else None
+        detail_href = a.get("href") if a else None
+        price_tag = book.select_one(".price_color")
+        availability_tag = book.select_one(".availability")
+        img_tag = book.find("img")
+        img_src = img_tag.get("src") if img_tag else None
+        rows.append({
+            "title": a.get("title", "").strip() if a else None,
+            "price": clean_price_to_float(price_tag.get_text(strip=True) if price_tag else None),
+            "rating": parse_rating_to_int(book.select_one("p.star-rating")),
+            "availability": availability_tag.get_text(" ", strip=True) if availability_tag else None,
+            "image": urljoin(page_url, img_src) if img_src else None,
+            "detail_url": urljoin(page_url, detail_href) if detail_href else None,
+        })
+    return rows
+
+
+def page_count(soup: BeautifulSoup) -> int:
+    """Total de páginas a partir do texto "Page 1 of N" (1 se não houver paginação)."""
+    current = soup.select_one("li.current")
+    m = re.search(r"of\s+(\d+)", current.get_text(" ", strip=True)) if current else None
+    return int(m.group(1)) if m else 1
+
+
+def category_links(soup: BeautifulSoup, page_url: str) -> dict:
+    """Categoria -> URL da primeira página, a partir do menu lateral."""
+    return {
+        a.get_text(strip=True): urljoin(page_url, a.get("href"))
+        for a in soup.select(".side_categories ul li ul li a")
+    }
+
+
+# --- Checkpoint / escrita atômica ----------------------------------------------
+
+def write_atomic(path: str, write) -> None:
+    """Grava via `write(tmp_path)` num temporário do mesmo diretório e troca com os.replace."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", suffix=os.path.basename(path), dir=directory)
+    os.close(fd)
+    try:
+        write(tmp)
+        with open(tmp, "rb") as fh:
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def write_dataset(df: pd.DataFrame, path: str) -> None:
+    """CSV, Parquet ou colunar (.catalog) conforme a extensão, sempre de forma atômica."""
+    if path.endswith(columnar.EXTENSION):
+        columnar.write_catalog(df, path)
+    elif path.endswith(".parquet"):
+        write_atomic(path, lambda tmp: df.to_parquet(tmp, index=False))
+    else:
+        write_atomic(path, lambda tmp: df.to_csv(tmp, index=False))
+
+
+class Checkpoint:
+    """
+    Estado do crawl em JSON, salvo atomicamente. Cada página baixada vira uma
+    entrada com o conteúdo interpretado e os validadores HTTP:
+      - home: categorias do menu lateral
+      - pages: linhas de cada página do catálogo
+      - categories: livros (detail_url) de cada página de categoria
+    O mesmo formato serve de checkpoint (retomada) e de estado da execução
+    anterior (modo incremental).
+
+    O arquivo é regravado a cada `save_every` páginas ou `save_interval`
+    segundos (o que vier antes) e em `flush()`; a serialização e a escrita
+    acontecem sob o mesmo lock, então uma versão antiga nunca substitui uma
+    mais nova.
+    """
+
+    KINDS = ("home", "pages", "categories")
+
+    def __init__(self, path: str = None, save_every: int = 50, save_interval: float = 5.0):
+        self.path = path
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self.data = {kind: {} for kind in self.KINDS}
+        self._pending = 0
+        self._saved_at = time.monotonic()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                loaded = json.load(fh)
+            for kind in self.KINDS:
+                self.data[kind] = loaded.get(kind, {})
+            logger.info(f"Estado carregado de {path}: {len(self.data['pages'])} páginas, "
+                        f"{len(self.data['categories'])} páginas de categoria")
+
+    def get(self, kind: str, url: str):
+        return self.data[kind].get(url)
+
+    def _write(self, path: str) -> None:
+        payload = json.dumps(self.data)
+
+        def write(tmp):
+            with open(tmp, "w", encoding="utf-8") as fh:
+                fh.write(payload)
+        write_atomic(path, write)
+
+    def save_as(self, path: str) -> None:
+        with self._lock:
+            self._write(path)
+
+    def record(self, kind: str, url: str, entry: dict) -> None:
+        with self._lock:
+            self.data[kind][url] = entry
+            self._pending += 1
+            due = self._pending >= self.save_every or time.monotonic() - self._saved_at >= self.save_interval
+            if self.path and due:
+                self._flush()
+
+    def _flush(self) -> None:
+        self._write(self.path)
+        self._pending = 0
+        self._saved_at = time.monotonic()
+
+    def flush(self) -> None:
+        """Grava as páginas registradas desde o último salvamento."""
+        with self._lock:
+            if self.path and self._pending:
+                self._flush()
+
+    def discard(self) -> None:
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# --- Pipeline -----------------------------------------------------------------
+
+def _parse_home(soup: BeautifulSoup, url: str) -> dict:
+    return {"categories": category_links(soup, url)}
+
+
+def _parse_catalogue(soup: BeautifulSoup, url: str) -> dict:
+    return {"rows": parse_listing(soup, url), "pages": page_count(soup)}
+
+
+def _category_parser(category: str):
+    def parse(soup: BeautifulSoup, url: str) -> dict:
+        books = [row["detail_url"] for row in parse_listing(soup, url)]
+        return {"category": category, "books": books, "pages": page_count(soup)}
+    return parse
+
+
+class Crawler:
+    """
+    Percorre o catálogo e as listagens por categoria.
+
+    `checkpoint` guarda o progresso desta execução; `previous` é o estado da
+    execução anterior: suas páginas são revalidadas com requisições
+    condicionais (ETag/Last-Modified) e só são interpretadas de novo se o
+    conteúdo mudou (hash diferente).
+    """
+
+    def __init__(self, base_url: str = BASE_URL, workers: int = 8, checkpoint: Checkpoint = None,
+                 previous: Checkpoint = None, session: requests.Session = None):
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.workers = workers
+        self.checkpoint = checkpoint or Checkpoint()
+        self.previous = previous or Checkpoint()
+        self.session = session or make_session(workers)
+        self.stats = Counter()
+        self.changed_urls = set()
+
+    def _load(self, kind: str, url: str, parse) -> dict:
+        entry = self.checkpoint.get(kind, url)
+        if entry is not None:
+            return entry
+        previous = self.previous.get(kind, url)
+        page = fetch_page(self.session, url, previous)
+        validators = {"etag": page.etag, "last_modified": page.last_modified}
+        if page.status == 304:
+            self.stats["not_modified"] += 1
+            entry = {**previous, **validators, "changed": False}
+        else:
+            digest = hashlib.sha256(page.text.encode("utf-8")).hexdigest()
+            if previous is not None and previous.get("hash") == digest:
+                self.stats["unchanged"] += 1
+                entry = {**previous, **validators, "changed": False}
+            else:
+                self.stats["parsed"] += 1
+                parsed = parse(BeautifulSoup(page.text, "html.parser"), url)
+                entry = {**parsed, **validators, "hash": digest, "changed": True}
+        self.checkpoint.record(kind, url, entry)
+        return entry
+
+    def _catalogue_page(self, url: str) -> dict:
+        return self._load("pages", url, _parse_catalogue)
+
+    def _category_pages(self, item) -> list:
+        """Entradas de todas as páginas de uma categoria (a primeira informa o total)."""
+        category, first_url = item
+        parse = _category_parser(category)
+        first = self._load("categories", first_url, parse)
+        rest = [urljoin(first_url, f"page-{n}.html") for n in range(2, (first["pages"] or 1) + 1)]
+        return [first] + [self._load("categories", url, parse) for url in rest]
+
+    def crawl(self) -> pd.DataFrame:
+        try:
+            return self._crawl()
+        finally:
+            # Interrompido ou não, o que já foi baixado fica no checkpoint
+            self.checkpoint.flush()
+
+    def _crawl(self) -> pd.DataFrame:
+        categories = self._load("home", self.base_url, _parse_home)["categories"]
+        first_url = urljoin(self.base_url, "catalogue/page-1.html")
+        first = self._catalogue_page(first_url)
+        pages = [first_url] + [
+            urljoin(first_url, f"page-{n}.html") for n in range(2, (first["pages"] or 1) + 1)
+        ]
+        logger.info(f"{len(pages)} páginas de catálogo, {len(categories)} categorias")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            page_entries = list(pool.map(self._catalogue_page, pages))
+            category_entries = [e for entries in pool.map(self._category_pages, categories.items())
+                                for e in entries]
+
+        category_of = {}
+        for entry in category_entries:
+            for detail_url in entry["books"]:
+                category_of[detail_url] = entry["category"]
+        rows = [dict(row) for entry in page_entries for row in entry["rows"]]
+        for row in rows:
+            row["category"] = category_of.get(row["detail_url"])
+
+        # Livros afetados por páginas que mudaram desde a execução anterior
+        self.changed_urls = {row["detail_url"] for e in page_entries if e["changed"] for row in e["rows"]}
+        self.changed_urls.update(u for e in category_entries if e["changed"] for u in e["books"])
+        logger.info(f"Total de livros coletados: {len(rows)} "
+                    f"(páginas: {self.stats['parsed']} interpretadas, "
+                    f"{self.stats['not_modified'] + self.stats['unchanged']} inalteradas)")
+        return pd.DataFrame(rows, columns=FINAL_COLS)
+
+
+def coerce_types(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["price"] = pd.to_numeric(df["price"], errors="coerce")
+    df["rating"] = pd.to_numeric(df["rating"], errors="coerce").astype("Int64")
+    return df
+
+
+def clean(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """Limpezas finais e validações (as mesmas do notebook de scraping)."""
+    df = df_raw.copy()
+    for col in ["title", "availability", "category", "image", "detail_url"]:
+        df[col] = df[col].astype(str).str.strip().replace({"None": pd.NA})
+    df = coerce_types(df)
+    df.loc[~df["rating"].between(1, 5, inclusive="both"), "rating"] = pd.NA
+    df = df.drop_duplicates(subset=["detail_url"], keep="first")
+    return df[FINAL_COLS]
+
+
+def read_dataset(path: str) -> pd.DataFrame:
+    if path.endswith(columnar.EXTENSION):
+        df = columnar.read_catalog(path).astype({"category": object, "availability": object})
+    elif path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    return coerce_types(df)[FINAL_COLS].reset_index(drop=True)
+
+
+def merge_changes(existing: pd.DataFrame, crawled: pd.DataFrame, changed_urls: set) -> pd.DataFrame:
+    """
+    Aplica ao dataset existente apenas as linhas afetadas (por detail_url):
+    atualiza as alteradas, acrescenta as novas no final e remove as que
+    sumiram do site. A ordem das linhas existentes é preservada.
+    """
+    current = crawled.set_index("detail_url")
+    merged = existing[existing["detail_url"].isin(current.index)].set_index("detail_url")
+    update = merged.index.intersection(pd.Index(list(changed_urls)))
+    cols = [c for c in FINAL_COLS if c != "detail_url"]
+    merged.loc[update, cols] = current.loc[update, cols]
+    added = current.index.difference(merged.index)
+    merged = pd.concat([merged, current.loc[added]])
+    return merged.reset_index()[FINAL_COLS]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.crawler", description="Crawler do catálogo de livros")
+    parser.add_argument("--base-url", default=BASE_URL, help="URL raiz do site (aceita file:// para cópia local)")
+    parser.add_argument("--output", action="append", help="Arquivo de saída .csv, .parquet ou .catalog (pode repetir)")
+    parser.add_argument("--workers", type=int, default=8, help="Requisições simultâneas")
+    parser.add_argument("--checkpoint", help="Arquivo de checkpoint (padrão: <primeira saída>.checkpoint.json)")
+    parser.add_argument("--state", help="Estado da última execução (padrão: <primeira saída>.state.json)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Revalida páginas com o estado anterior e aplica só as mudanças")
+    parser.add_argument("--fresh", action="store_true", help="Ignora checkpoint existente")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    outputs = args.output or ["./data/dados-books.csv"]
+    checkpoint_path = args.checkpoint or outputs[0] + ".checkpoint.json"
+    state_path = args.state or outputs[0] + ".state.json"
+    if args.fresh and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    checkpoint = Checkpoint(checkpoint_path)
+    previous = Checkpoint(state_path) if args.incremental else None
+    crawler = Crawler(args.base_url, workers=args.workers, checkpoint=checkpoint, previous=previous)
+    df = clean(crawler.crawl())
+
+    if args.incremental and os.path.exists(outputs[0]):
+        existing = read_dataset(outputs[0])
+        df = merge_changes(existing, df, crawler.changed_urls)
+        if df.equals(existing):
+            logger.info("Nenhuma mudança no catálogo; arquivos mantidos")
+            outputs = [path for path in outputs if not os.path.exists(path)]
+        else:
+            logger.info(f"{len(crawler.changed_urls)} livros afetados por páginas alteradas")
+
+    for path in outputs:
+        write_dataset(df, path)
+        logger.info(f"Gravado: {path} ({len(df)} livros)")
+    checkpoint.save_as(state_path)
+    checkpoint.discard()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
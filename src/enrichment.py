@@ -0,0 +1,390 @@
+import sys
+import time
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .catalog import get_catalog_store
+from .enrichment_store import EnrichmentStore
+from .indexes import book_ids
+from .responses import InvalidParameter
+from .utilidades import UNAVAILABLE_DETAILS, fetch_book_details
+
+logger = logging.getLogger("app")
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Cache LRU com expiração por entrada (thread-safe)."""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key, default=_MISSING):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+def make_session(pool_size: int = 20) -> requests.Session:
+    """Sessão HTTP com pool de conexões keep-alive reaproveitadas entre chamadas."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class EnrichmentEngine:
+    """
+    Enriquecimento de livros (descrição e reviews) com:
+      - cache por `detail_url` com TTL e LRU (resultados negativos com TTL próprio)
+      - sessão HTTP com pool de conexões
+      - single-flight: chamadas simultâneas para a mesma URL compartilham um fetch
+      - limite de requisições simultâneas por host e pool de threads para lotes
+      - store persistente opcional (SQLite): consultado quando o cache não tem
+        a URL; entradas mais velhas que `max_age` são servidas e atualizadas
+        em background
+    """
+
+    def __init__(self, ttl: float = 3600, negative_ttl: float = 60, maxsize: int = 4096,
+                 timeout: float = 10, pool_size: int = 20, session=None,
+                 batch_workers: int = 16, per_host: int = 4,
+                 store: EnrichmentStore = None, max_age: float = 7 * 24 * 3600):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.session = session or make_session(pool_size)
+        self.cache = TTLCache(maxsize)
+        self.batch_workers = batch_workers
+        self.per_host = per_host
+        self.store = store
+        self.max_age = max_age
+        self._inflight = {}
+        self._host_slots = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _host_slot(self, detail_url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(detail_url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def _fetch(self, detail_url: str):
+        """Retorna (detalhes, sucesso)."""
+        try:
+            with self._host_slot(detail_url):
+                return fetch_book_details(detail_url, session=self.session, timeout=self.timeout), True
+        except Exception as e:
+            logger.warning(f"Falha ao fazer scraping de {detail_url}: {e}")
+            return dict(UNAVAILABLE_DETAILS), False
+
+    def stored(self, detail_url: str):
+        """(detalhes, fetched_at) do store, ou None (sem store ou erro de leitura)."""
+        if self.store is None:
+            return None
+        try:
+            return self.store.get(detail_url)
+        except Exception as e:
+            logger.warning(f"Falha ao ler o store de enriquecimento: {e}")
+            return None
+
+    def save(self, detail_url: str, details: dict) -> None:
+        if self.store is None:
+            return
+        try:
+            self.store.put(detail_url, details)
+        except Exception as e:
+            logger.warning(f"Falha ao gravar o store de enriquecimento: {e}")
+
+    def is_stale(self, fetched_at: float) -> bool:
+        return time.time() - fetched_at > self.max_age
+
+    def get(self, detail_url: str) -> dict:
+        cached = self.cache.get(detail_url)
+        if cached is not _MISSING:
+            return dict(cached)
+        entry = self.stored(detail_url)
+        if entry is not None:
+            details, fetched_at = entry
+            self.cache.set(detail_url, details, self.ttl)
+            if self.is_stale(fetched_at):
+                self.refresh(detail_url, details)
+            return dict(details)
+        return dict(self._load(detail_url))
+
+    def refresh(self, detail_url: str, fallback: dict) -> None:
+        """Atualiza a URL em background (se já não houver download em andamento)."""
+        with self._lock:
+            if detail_url in self._inflight:
+                return
+            # Registra antes de enfileirar: leituras concorrentes não enfileiram outro download
+            call = self._inflight[detail_url] = Future()
+        try:
+            self.executor.submit(self._run, detail_url, call, fallback)
+        except BaseException as e:
+            self._finish(detail_url, call, exception=e)
+            raise
+
+    def _load(self, detail_url: str, fallback: dict = None) -> dict:
+        """
+        Download com single-flight; grava no cache e, se bem sucedido, no store.
+        Em caso de falha, `fallback` (a versão já conhecida) segue sendo servida.
+        """
+        with self._lock:
+            call = self._inflight.get(detail_url)
+            leader = call is None
+            if leader:
+                call = self._inflight[detail_url] = Future()
+        if not leader:
+            return call.result()
+        return self._run(detail_url, call, fallback)
+
+    def _run(self, detail_url: str, call: Future, fallback: dict = None) -> dict:
+        """Executa o download de `call`, já registrado em `_inflight`."""
+        try:
+            details, ok = self._fetch(detail_url)
+            if ok:
+                self.save(detail_url, details)
+            elif fallback is not None:
+                details = fallback
+            self.cache.set(detail_url, details, self.ttl if ok else self.negative_ttl)
+        except BaseException as e:
+            self._finish(detail_url, call, exception=e)
+            raise
+        self._finish(detail_url, call, result=details)
+        return details
+
+    def _finish(self, detail_url: str, call: Future, result=None, exception=None) -> None:
+        with self._lock:
+            self._inflight.pop(detail_url, None)
+        if exception is not None:
+            call.set_exception(exception)
+        else:
+            call.set_result(result)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.batch_workers, thread_name_prefix="enrichment"
+                )
+            return self._executor
+
+    def get_many(self, items):
+        """
+        Enriquece vários livros em paralelo. `items` é um iterável de
+        (chave, detail_url); gera (chave, detalhes, erro) na ordem de conclusão.
+        """
+        futures = {self.executor.submit(self.get, url): key for key, url in items}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                yield key, future.result(), None
+            except Exception as e:
+                yield key, None, e
+
+    def warm_up(self, detail_urls, workers: int = 4, chunk_size: int = 256, stop: threading.Event = None) -> dict:
+        """
+        Pré-enriquece no store as URLs ausentes ou vencidas, com no máximo
+        `workers` downloads simultâneos (e o limite por host). Grava em lotes;
+        retorna as contagens do trabalho feito.
+        """
+        if self.store is None:
+            raise RuntimeError("Store de enriquecimento desativado (ENRICHMENT_STORE_PATH)")
+        known = self.store.fetched_at()
+        now = time.time()
+        pending = [
+            url for url in dict.fromkeys(detail_urls)
+            if url and (url not in known or now - known[url] > self.max_age)
+        ]
+        stats = {"total": len(pending), "fetched": 0, "failed": 0}
+        logger.info(f"Aquecimento do enriquecimento: {len(pending)} URLs ausentes ou vencidas")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="enrichment-warmup") as pool:
+            for start in range(0, len(pending), chunk_size):
+                if stop is not None and stop.is_set():
+                    break
+                chunk = pending[start:start + chunk_size]
+                results = list(pool.map(self._fetch, chunk))
+                self.store.put_many((url, details) for url, (details, ok) in zip(chunk, results) if ok)
+                fetched = sum(ok for _, ok in results)
+                stats["fetched"] += fetched
+                stats["failed"] += len(chunk) - fetched
+                logger.info(
+                    f"Aquecimento: {start + len(chunk)}/{len(pending)} URLs "
+                    f"({stats['failed']} falhas, {time.perf_counter() - started:.1f}s)"
+                )
+        return stats
+
+
+def catalog_urls(snapshot) -> list:
+    return snapshot.df["detail_url"].dropna().astype(str).unique().tolist()
+
+
+def parse_batch_ids(data, max_ids: int) -> list:
+    """
+    Valida o corpo `{"ids": [...]}` do enriquecimento em lote (ids sem repetição).
+    Aceita ids estáveis (slug) e os ids numéricos antigos (posição da linha).
+    """
+    ids = data.get("ids") if isinstance(data, dict) else None
+    valid = isinstance(ids, list) and ids and all(
+        (isinstance(i, int) and not isinstance(i, bool)) or (isinstance(i, str) and i) for i in ids
+    )
+    if not valid:
+        raise InvalidParameter("Informe 'ids' como lista de ids (slug ou inteiro)")
+    if len(ids) > max_ids:
+        raise InvalidParameter(f"Máximo de {max_ids} ids por requisição")
+    return list(dict.fromkeys(ids))
+
+
+def resolve_batch(snapshot, ids):
+    """
+    Separa os livros enriquecíveis ({id: livro}) dos ids com erro
+    (já no formato das linhas NDJSON de resposta).
+    """
+    df = snapshot.df
+    index = book_ids(snapshot)
+    rows = index.resolve(ids)
+    books, failed = {}, []
+    for book_id, row in zip(ids, rows.tolist()):
+        if row < 0:
+            failed.append({"id": book_id, "status": "error", "error": "Livro não encontrado"})
+            continue
+        book = {"id": index.id_of(row), **df.iloc[row].to_dict()}
+        if not book.get("detail_url"):
+            failed.append({"id": book_id, "status": "error", "error": "URL de detalhes ausente"})
+            continue
+        books[book_id] = book
+    return books, failed
+
+
+def batch_line(book_id, book: dict, details, error) -> dict:
+    """Linha NDJSON do resultado de um livro do lote."""
+    if error is not None:
+        logger.warning(f"Falha ao enriquecer livro {book_id}: {error}")
+        return {"id": book_id, "status": "error", "error": "Falha no scraping"}
+    return {"id": book_id, "status": "ok", "book": {**book, **details}}
+
+
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_enrichment_engine(app) -> EnrichmentEngine:
+    """Retorna (criando se preciso) o EnrichmentEngine associado ao app Flask."""
+    engine = app.extensions.get("enrichment")
+    if engine is None:
+        with _ENGINE_LOCK:
+            engine = app.extensions.get("enrichment")
+            if engine is None:
+                engine = EnrichmentEngine(
+                    ttl=app.config.get("ENRICHMENT_TTL_SECONDS", 3600),
+                    negative_ttl=app.config.get("ENRICHMENT_NEGATIVE_TTL_SECONDS", 60),
+                    maxsize=app.config.get("ENRICHMENT_CACHE_SIZE", 4096),
+                    timeout=app.config.get("ENRICHMENT_TIMEOUT", 10),
+                    pool_size=app.config.get("ENRICHMENT_POOL_SIZE", 20),
+                    batch_workers=app.config.get("ENRICHMENT_BATCH_WORKERS", 16),
+                    per_host=app.config.get("ENRICHMENT_PER_HOST", 4),
+                    store=_open_store(app.config.get("ENRICHMENT_STORE_PATH", "")),
+                    max_age=app.config.get("ENRICHMENT_STORE_MAX_AGE_SECONDS", 7 * 24 * 3600),
+                )
+                app.extensions["enrichment"] = engine
+    return engine
+
+
+def _open_store(path: str):
+    if not path:
+        return None
+    try:
+        return EnrichmentStore(path)
+    except Exception as e:
+        logger.warning(f"Store de enriquecimento indisponível ({path}): {e}")
+        return None
+
+
+def start_warm_up(app) -> threading.Thread:
+    """Aquece o store com o catálogo inteiro numa thread em background."""
+
+    def run():
+        try:
+            engine = get_enrichment_engine(app)
+            if engine.store is None:
+                return
+            snapshot = get_catalog_store(app).snapshot()
+            stats = engine.warm_up(catalog_urls(snapshot), workers=app.config.get("ENRICHMENT_WARMUP_WORKERS", 4))
+            logger.info(f"Aquecimento do enriquecimento concluído: {stats}")
+        except Exception:
+            logger.exception("Falha no aquecimento do enriquecimento")
+
+    thread = threading.Thread(target=run, name="enrichment-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.enrichment", description="Enriquecimento dos livros")
+    commands = parser.add_subparsers(dest="command", required=True)
+    warm_cmd = commands.add_parser("warm", help="Enriquece o catálogo inteiro no store local (SQLite)")
+    warm_cmd.add_argument("--workers", type=int, default=None, help="Downloads simultâneos")
+    warm_cmd.add_argument("--max-age", type=float, default=None,
+                          help="Idade máxima (s) das entradas mantidas (padrão: ENRICHMENT_STORE_MAX_AGE_SECONDS)")
+    args = parser.parse_args(argv)
+
+    from . import create_app
+    from .config import Config
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    # O aquecimento roda aqui, em primeiro plano
+    Config.ENRICHMENT_WARMUP_ON_START = False
+    app = create_app()
+    engine = get_enrichment_engine(app)
+    if engine.store is None:
+        logger.error("Store de enriquecimento desativado (ENRICHMENT_STORE_PATH)")
+        return 1
+    if args.max_age is not None:
+        engine.max_age = args.max_age
+    snapshot = get_catalog_store(app).snapshot()
+    stats = engine.warm_up(
+        catalog_urls(snapshot), workers=args.workers or app.config.get("ENRICHMENT_WARMUP_WORKERS", 4)
+    )
+    logger.info(f"Store {engine.store.path}: {len(engine.store)} livros ({stats})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Armazenamento local (SQLite) do enriquecimento dos livros.
+
+Uma linha por `detail_url` com os detalhes extraídos (JSON), o instante do
+download (`fetched_at`, epoch em segundos) e `seq`, número de gravação
+crescente na ordem dos commits (quem acompanha o store lê só `seq` maior que
+o último visto; `fetched_at` não serve para isso, pois é medido antes da
+gravação). Só resultados de downloads bem
+sucedidos são gravados; o cache em memória do EnrichmentEngine continua na
+frente e o store é a fonte quando o cache não tem a URL (inclusive após
+reiniciar o processo ou sem acesso à rede).
+
+Cada thread usa a sua conexão; o banco fica em modo WAL, então leituras não
+esperam escritas e vários workers podem compartilhar o mesmo arquivo.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS enrichment (
+    detail_url TEXT PRIMARY KEY,
+    details TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    seq INTEGER NOT NULL DEFAULT 0
+)
+"""
+# Stores criados antes da coluna seq: as linhas existentes recebem o rowid
+MIGRATE_SEQ = """
+ALTER TABLE enrichment ADD COLUMN seq INTEGER NOT NULL DEFAULT 0;
+UPDATE enrichment SET seq = rowid;
+"""
+INDEXES = """
+DROP INDEX IF EXISTS enrichment_fetched_at;
+CREATE INDEX IF NOT EXISTS enrichment_seq ON enrichment (seq);
+"""
+# Escritas são serializadas pelo SQLite: MAX(seq) + 1 dentro da transação
+# segue a ordem dos commits
+UPSERT = """
+INSERT INTO enrichment (detail_url, details, fetched_at, seq)
+VALUES (?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM enrichment))
+ON CONFLICT(detail_url) DO UPDATE SET
+    details = excluded.details, fetched_at = excluded.fetched_at, seq = excluded.seq
+"""
+# Limite de variáveis por consulta do SQLite (versões antigas: 999)
+MAX_VARIABLES = 900
+
+
+class EnrichmentStore:
+    """Detalhes enriquecidos por `detail_url`, persistidos em SQLite."""
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(enrichment)")}
+            if "seq" not in columns:
+                conn.executescript(MIGRATE_SEQ)
+            conn.executescript(INDEXES)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM enrichment").fetchone()[0]
+
+    def get(self, detail_url: str):
+        """(detalhes, fetched_at) da URL, ou None."""
+        row = self._connection().execute(
+            "SELECT details, fetched_at FROM enrichment WHERE detail_url = ?", (detail_url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def get_many(self, detail_urls) -> dict:
+        """{url: (detalhes, fetched_at)} das URLs presentes no store."""
+        urls = list(dict.fromkeys(detail_urls))
+        found = {}
+        conn = self._connection()
+        for start in range(0, len(urls), MAX_VARIABLES):
+            part = urls[start:start + MAX_VARIABLES]
+            marks = ",".join("?" * len(part))
+            for url, details, fetched_at in conn.execute(
+                f"SELECT detail_url, details, fetched_at FROM enrichment WHERE detail_url IN ({marks})", part
+            ):
+                found[url] = (json.loads(details), fetched_at)
+        return found
+
+    def fetched_at(self) -> dict:
+        """{url: fetched_at} de todo o store (para escolher o que aquecer)."""
+        return dict(self._connection().execute("SELECT detail_url, fetched_at FROM enrichment"))
+
+    def changes_after(self, seq: int = 0) -> list:
+        """[(seq, url, detalhes, fetched_at)] gravados depois de `seq`, em ordem de gravação."""
+        rows = self._connection().execute(
+            "SELECT seq, detail_url, details, fetched_at FROM enrichment WHERE seq > ? ORDER BY seq", (seq,)
+        )
+        return [(number, url, json.loads(details), at) for number, url, details, at in rows]
+
+    def put(self, detail_url: str, details: dict, fetched_at: float = None) -> None:
+        self.put_many([(detail_url, details)], fetched_at)
+
+    def put_many(self, items, fetched_at: float = None) -> None:
+        """Grava vários (url, detalhes) numa transação."""
+        now = time.time() if fetched_at is None else fetched_at
+        rows = [(url, json.dumps(details, ensure_ascii=False), now) for url, details in items]
+        if not rows:
+            return
+        conn = self._connection()
+        with conn:
+            conn.executemany(UPSERT, rows)
+
+    def close(self) -> None:
+        """Fecha a conexão da thread atual."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,149 @@
+import io
+
+import numpy as np
+from flask import Response, current_app
+
+from .catalog import CatalogSnapshot
+from .metrics import span
+from .responses import prepare_body, send_prepared
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXTENSIONS = {"ndjson": "ndjson", "arrow": "arrows", "parquet": "parquet"}
+# Aliases aceitos no header Accept
+MIMETYPES = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+}
+
+
+class ExportUnavailable(RuntimeError):
+    """Formato pedido não pode ser gerado (ex.: pyarrow ausente)."""
+
+
+def negotiate_format(fmt: str, accept) -> str:
+    """
+    Escolhe o formato: parâmetro `format` tem prioridade; depois o header Accept.
+    Retorna None se nada for aceitável; NDJSON é o padrão.
+    """
+    if fmt:
+        fmt = fmt.strip().lower()
+        return fmt if fmt in FORMATS else None
+    if not accept:
+        return "ndjson"
+    best = accept.best_match(list(MIMETYPES), default=None)
+    if best:
+        return MIMETYPES[best]
+    wildcard = any(value in ("*/*", "application/*") for value, _ in accept)
+    return "ndjson" if accept.accept_json or wildcard else None
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise ExportUnavailable("Exportação Arrow/Parquet requer o pacote 'pyarrow'")
+    return pyarrow
+
+
+def arrow_table(snapshot: CatalogSnapshot):
+    """Tabela Arrow do catálogo inteiro, convertida uma única vez por snapshot."""
+    pa = _require_pyarrow()
+    return snapshot.derive(
+        "arrow_table",
+        lambda snap: pa.Table.from_pandas(snap.df, preserve_index=False),
+    )
+
+
+def _select(table, rows: np.ndarray, n_rows: int, fields):
+    if len(rows) != n_rows:
+        table = table.take(rows)
+    if fields:
+        table = table.select(list(fields))
+    return table
+
+
+class _ChunkSink(io.RawIOBase):
+    """Arquivo em memória que entrega os bytes escritos aos poucos."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def _stream_ndjson(df, rows, fields, dumps, chunk_size=1000):
+    for start in range(0, len(rows), chunk_size):
+        with span("serialize"):
+            part = df.iloc[rows[start:start + chunk_size]]
+            if fields:
+                part = part[list(fields)]
+            lines = "\n".join(dumps(rec, separators=(",", ":")) for rec in part.to_dict(orient="records"))
+        yield (lines + "\n").encode("utf-8")
+
+
+def _stream_arrow(table, batch_size=10_000):
+    pa = _require_pyarrow()
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=batch_size):
+            with span("serialize"):
+                writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _parquet_bytes(table) -> bytes:
+    pa = _require_pyarrow()
+    sink = pa.BufferOutputStream()
+    with span("serialize"):
+        pa.parquet.write_table(table, sink, compression="zstd")
+    return sink.getvalue().to_pybytes()
+
+
+def _ndjson_body(snapshot: CatalogSnapshot):
+    rows = np.arange(len(snapshot))
+    body = b"".join(_stream_ndjson(snapshot.df, rows, None, current_app.json.dumps))
+    return prepare_body(body, FORMATS["ndjson"], snapshot.last_modified)
+
+
+def export_response(snapshot: CatalogSnapshot, rows: np.ndarray, fmt: str, fields=None) -> Response:
+    """
+    Gera a resposta de exportação das linhas `rows` no formato `fmt`.
+    O NDJSON do catálogo inteiro é montado uma vez por snapshot (e pode ser
+    comprimido); exportações filtradas são geradas em streaming.
+    """
+    full = len(rows) == len(snapshot) and not fields
+    if fmt == "ndjson" and full:
+        resp = send_prepared(snapshot.derive(("body", "ndjson"), _ndjson_body))
+    else:
+        if fmt == "ndjson":
+            body = _stream_ndjson(snapshot.df, rows, fields, current_app.json.dumps)
+        else:
+            table = _select(arrow_table(snapshot), rows, len(snapshot), fields)
+            if fmt == "arrow":
+                body = _stream_arrow(table)
+            elif full:
+                body = snapshot.derive("parquet_body", lambda snap: _parquet_bytes(table))
+            else:
+                body = _parquet_bytes(table)
+        resp = Response(body, mimetype=FORMATS[fmt])
+    resp.headers["Content-Disposition"] = f"attachment; filename=books.{EXTENSIONS[fmt]}"
+    resp.headers["X-Total-Count"] = str(len(rows))
+    return resp
@@ -0,0 +1,287 @@
+"""
+Matriz de features numéricas do catálogo para consumidores de ML.
+
+Calculada uma única vez por snapshot (e por codificação de categoria), na
+ordem das linhas do catálogo. Colunas, em ordem:
+
+    price          z-score do preço (ausente = 0)
+    price_missing  1 quando o preço está ausente
+    rating         rating normalizado para [0, 1] ((r - min) / (max - min))
+    rating_missing 1 quando o rating está ausente
+    in_stock       1 quando availability contém "in stock"
+    title_chars    tamanho do título (caracteres)
+    title_words    número de palavras do título
+    category       one-hot (uma coluna por categoria) ou ordinal (código, -1 = ausente)
+    title_hash     hashing trick das palavras do título (crc32, com sinal, norma L2)
+
+Formatos: NPY denso (float32), Arrow IPC (uma coluna por feature) ou NPZ
+esparso COO (chaves row/col/data/shape/format, legível por
+`scipy.sparse.load_npz`).
+"""
+import io
+import json
+import zlib
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .catalog import CatalogSnapshot
+from .export import _require_pyarrow
+from .responses import InvalidParameter, prepare_body
+from .search import TOKEN_RE, normalize
+
+FEATURE_FORMATS = {
+    "npy": ("application/x-npy", "npy"),
+    "npz": ("application/x-npz", "npz"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+CATEGORY_ENCODINGS = ("onehot", "ordinal")
+SCHEMA_VERSION = 1
+
+
+class FeatureMismatch(RuntimeError):
+    """O layout de features de um modelo não pode ser casado com o do catálogo atual."""
+
+
+@dataclass(frozen=True)
+class FeatureSet:
+    """Matriz em COO (linhas/colunas/valores sem duplicatas) + schema."""
+    shape: tuple
+    row: np.ndarray
+    col: np.ndarray
+    data: np.ndarray
+    columns: list
+    schema: dict
+
+    def dense(self) -> np.ndarray:
+        matrix = np.zeros(self.shape, dtype=np.float32)
+        matrix[self.row, self.col] = self.data
+        return matrix
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        """Submatriz densa (float32) das linhas `rows`, na ordem pedida."""
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = np.searchsorted(self.row, rows, side="left")
+        lengths = np.searchsorted(self.row, rows, side="right") - starts
+        positions = _ranges(starts, lengths)
+        matrix = np.zeros((len(rows), self.shape[1]), dtype=np.float32)
+        matrix[np.repeat(np.arange(len(rows)), lengths), self.col[positions]] = self.data[positions]
+        return matrix
+
+    def take_columns(self, rows: np.ndarray, columns, categories=None) -> np.ndarray:
+        """
+        Como `take`, mas no layout `columns` (o de um modelo treinado sobre
+        outro snapshot). Colunas one-hot de categorias que o catálogo não tem
+        mais ficam zeradas e as de categorias novas são descartadas; na
+        codificação ordinal, `categories` (valores do treino) remapeia os
+        códigos. Levanta FeatureMismatch se faltar qualquer outra coluna.
+        """
+        columns = list(columns)
+        matrix = self.take(rows)
+        category = next((g for g in self.schema["features"] if g["name"] == "category"), None)
+        if columns != self.columns:
+            index = {name: i for i, name in enumerate(self.columns)}
+            missing = [c for c in columns if c not in index and not c.startswith("category=")]
+            if missing:
+                raise FeatureMismatch(
+                    f"Colunas do modelo ausentes nas features do catálogo: {', '.join(missing[:5])}"
+                )
+            source = np.array([index.get(c, -1) for c in columns], dtype=np.int64)
+            aligned = np.zeros((len(matrix), len(columns)), dtype=np.float32)
+            aligned[:, source >= 0] = matrix[:, source[source >= 0]]
+            matrix = aligned
+        ordinal = category is not None and category["encoding"] == "ordinal" and "category" in columns
+        if ordinal and categories is not None and list(categories) != category["values"]:
+            position = {value: i for i, value in enumerate(categories)}
+            remap = np.array([position.get(v, -1) for v in category["values"]], dtype=np.float32)
+            codes = matrix[:, columns.index("category")]
+            present = codes >= 0
+            codes[present] = remap[codes[present].astype(np.int64)]
+        return matrix
+
+
+def _ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenação vetorizada de arange(start, start + length) para cada par."""
+    ends = np.cumsum(lengths)
+    total = int(ends[-1]) if len(ends) else 0
+    return np.arange(total) + np.repeat(starts - (ends - lengths), lengths)
+
+
+def _hash_tokens(tokens: pd.Series, size: int):
+    """
+    (linha, bucket, valor) do hashing trick sobre listas de tokens (uma por
+    linha de `tokens`); cada token distinto é hasheado uma única vez.
+    """
+    tokens = tokens.reset_index(drop=True).explode().dropna()
+    if tokens.empty:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    codes, uniques = pd.factorize(tokens)
+    digests = np.array([zlib.crc32(t.encode("utf-8")) for t in uniques], dtype=np.uint64)
+    buckets = (digests % size).astype(np.int64)[codes]
+    signs = np.where((digests >> np.uint64(31)) & np.uint64(1), -1.0, 1.0)[codes]
+    # Soma por (linha, bucket): repetições e colisões se acumulam
+    rows = tokens.index.to_numpy(dtype=np.int64)
+    keys, inverse = np.unique(rows * size + buckets, return_inverse=True)
+    values = np.bincount(inverse, weights=signs)
+    rows, buckets = keys // size, keys % size
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2))
+    norms[norms == 0] = 1.0
+    values = values / norms[rows]
+    keep = values != 0
+    return rows[keep], buckets[keep], values[keep].astype(np.float32)
+
+
+def expand_rows(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, codes: np.ndarray, n_uniques: int):
+    """
+    Replica as entradas COO calculadas por valor distinto para as linhas com aquele valor.
+    `rows` são os índices dos valores distintos (ordenados), `codes` o valor de cada
+    linha do catálogo (como em `pd.factorize`) e `n_uniques` o número de valores.
+    Retorna (linhas do catálogo, colunas, valores).
+    """
+    counts = np.bincount(rows, minlength=n_uniques)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    lengths = counts[codes]
+    positions = _ranges(starts[codes], lengths)
+    return np.repeat(np.arange(len(codes)), lengths), cols[positions], values[positions]
+
+
+def build_features(df: pd.DataFrame, category_encoding: str = "onehot", hash_size: int = 32) -> FeatureSet:
+    n = len(df)
+    frame = df.reset_index(drop=True)
+    dense, groups = [], []
+
+    price = frame["price"].to_numpy(dtype=float, na_value=np.nan)
+    mean = float(np.nanmean(price)) if n and not np.isnan(price).all() else 0.0
+    std = float(np.nanstd(price)) if n and not np.isnan(price).all() else 0.0
+    scale = std if std > 0 else 1.0
+    dense += [np.nan_to_num((price - mean) / scale), np.isnan(price)]
+    groups += [
+        {"name": "price", "size": 1, "transform": "zscore", "mean": mean, "std": scale},
+        {"name": "price_missing", "size": 1},
+    ]
+
+    rating = frame["rating"].to_numpy(dtype=float, na_value=np.nan)
+    valid = rating[~np.isnan(rating)]
+    low = float(valid.min()) if len(valid) else 0.0
+    high = float(valid.max()) if len(valid) else 1.0
+    span = high - low if high > low else 1.0
+    dense += [np.nan_to_num((rating - low) / span), np.isnan(rating)]
+    groups += [
+        {"name": "rating", "size": 1, "transform": "minmax", "min": low, "max": high},
+        {"name": "rating_missing", "size": 1},
+    ]
+
+    # Texto: o trabalho por string é feito só sobre os valores distintos
+    codes, uniques = pd.factorize(frame["availability"], use_na_sentinel=True)
+    in_stock = np.array([normalize(v).find("in stock") >= 0 for v in uniques] + [False])
+    dense.append(in_stock[codes])
+    groups.append({"name": "in_stock", "size": 1})
+
+    title_codes, titles = pd.factorize(frame["title"].astype(object).where(frame["title"].notna(), ""))
+    titles = pd.Series(titles, dtype=object)
+    tokens = titles.map(normalize).str.findall(TOKEN_RE.pattern)
+    dense += [
+        titles.str.len().to_numpy(dtype=float)[title_codes],
+        tokens.str.len().to_numpy(dtype=float)[title_codes],
+    ]
+    groups += [{"name": "title_chars", "size": 1}, {"name": "title_words", "size": 1}]
+
+    # Colunas densas -> COO
+    values = np.column_stack(dense).astype(np.float32) if n else np.empty((0, len(dense)), dtype=np.float32)
+    rows, cols = np.nonzero(values)
+    parts = [(rows, cols, values[rows, cols])]
+    columns = [g["name"] for g in groups]
+
+    codes, categories = pd.factorize(frame["category"], sort=True, use_na_sentinel=True)
+    categories = [str(c) for c in categories]
+    offset = len(columns)
+    if category_encoding == "onehot":
+        present = np.flatnonzero(codes >= 0)
+        parts.append((present, offset + codes[present], np.ones(len(present), dtype=np.float32)))
+        columns += [f"category={c}" for c in categories]
+        groups.append({"name": "category", "size": len(categories), "encoding": "onehot", "values": categories})
+    else:
+        nonzero = np.flatnonzero(codes != 0)
+        parts.append((nonzero, np.full(len(nonzero), offset), codes[nonzero].astype(np.float32)))
+        columns.append("category")
+        groups.append({"name": "category", "size": 1, "encoding": "ordinal", "values": categories, "missing": -1})
+
+    offset = len(columns)
+    hash_rows, buckets, hash_values = expand_rows(*_hash_tokens(tokens, hash_size), title_codes, len(titles))
+    parts.append((hash_rows, offset + buckets, hash_values))
+    columns += [f"title_hash_{i}" for i in range(hash_size)]
+    groups.append({"name": "title_hash", "size": hash_size, "transform": "hashing", "hash": "crc32",
+                   "signed": True, "norm": "l2"})
+
+    position = 0
+    for group in groups:
+        group["offset"] = position
+        position += group["size"]
+    row = np.concatenate([p[0] for p in parts]).astype(np.int64)
+    col = np.concatenate([p[1] for p in parts]).astype(np.int32)
+    data = np.concatenate([p[2] for p in parts]).astype(np.float32)
+    order = np.lexsort((col, row))
+    schema = {
+        "version": SCHEMA_VERSION,
+        "rows": n,
+        "columns": len(columns),
+        "dtype": "float32",
+        "row_order": "catalog",
+        "features": groups,
+    }
+    return FeatureSet(shape=(n, len(columns)), row=row[order], col=col[order], data=data[order],
+                      columns=columns, schema=schema)
+
+
+def feature_set(snapshot: CatalogSnapshot, category_encoding: str, hash_size: int) -> FeatureSet:
+    return snapshot.derive(
+        ("ml_features", category_encoding, hash_size),
+        lambda snap: build_features(snap.df, category_encoding, hash_size),
+    )
+
+
+def parse_feature_args(args):
+    """(formato, codificação de categoria) de /ml/features."""
+    fmt = args.get("format", "npy").lower()
+    if fmt not in FEATURE_FORMATS:
+        raise InvalidParameter(f"Formato inválido. Use: {', '.join(FEATURE_FORMATS)}")
+    encoding = args.get("encoding", "onehot").lower()
+    if encoding not in CATEGORY_ENCODINGS:
+        raise InvalidParameter(f"Codificação inválida. Use: {', '.join(CATEGORY_ENCODINGS)}")
+    return fmt, encoding
+
+
+def _encode(features: FeatureSet, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "npy":
+        np.save(buffer, features.dense(), allow_pickle=False)
+    elif fmt == "npz":
+        np.savez(
+            buffer,
+            row=features.row, col=features.col, data=features.data,
+            shape=np.array(features.shape, dtype=np.int64), format=np.array("coo"),
+            schema=np.array(json.dumps(features.schema)),
+        )
+    else:
+        pa = _require_pyarrow()
+        matrix = features.dense()
+        table = pa.table(
+            {name: matrix[:, i] for i, name in enumerate(features.columns)},
+            metadata={"schema": json.dumps(features.schema)},
+        )
+        with pa.ipc.new_stream(buffer, table.schema) as writer:
+            writer.write_table(table)
+    return buffer.getvalue()
+
+
+def feature_body(snapshot: CatalogSnapshot, fmt: str, category_encoding: str, hash_size: int):
+    """(PreparedBody, FeatureSet) no formato pedido, gerado uma vez por snapshot."""
+    features = feature_set(snapshot, category_encoding, hash_size)
+    mimetype = FEATURE_FORMATS[fmt][0]
+    body = snapshot.derive(
+        ("ml_features_body", fmt, category_encoding, hash_size),
+        lambda snap: prepare_body(_encode(features, fmt), mimetype, snap.last_modified),
+    )
+    return body, features
@@ -0,0 +1,458 @@
+"""
+Busca textual ranqueada (BM25) em título + descrição dos livros
+(/api/v1/books/search?q=).
+
+Os títulos vêm do snapshot do catálogo e as descrições do store de
+enriquecimento (SQLite), onde o scraping grava o que baixa (rotas, lotes e
+aquecimento, inclusive de outros processos). O índice é do processo e segue
+as duas fontes sem ser refeito:
+
+- a cada consulta, no máximo uma vez a cada `FULLTEXT_SYNC_SECONDS`, lê do
+  store só as linhas gravadas desde a última leitura (pelo `seq` do store);
+- quando o catálogo recarrega, compara os títulos por detail_url.
+
+A construção inicial (e a reconstrução quando o catálogo muda mais que
+`MAX_DELTA_FRACTION`) monta um índice à parte e o troca de uma vez; com
+`FULLTEXT_WARMUP_ON_START` ela roda em background quando a API inicia.
+
+Documentos novos ou alterados entram num segmento novo e imutável de
+postings (termo, documento, tf) ordenados por termo; a versão anterior do
+documento só é marcada como removida. Segmentos vizinhos de tamanho parecido
+são fundidos (descartando os removidos), então há O(log n) segmentos e cada
+termo da consulta custa uma busca binária por segmento.
+
+Pontuação BM25 (k1 = 1.2, b = 0.75) com os campos ponderados: cada
+ocorrência no título conta `TITLE_WEIGHT` vezes, também no tamanho do
+documento.
+"""
+import re
+import html
+import zlib
+import hashlib
+import logging
+import datetime
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from flask import current_app, request
+
+from .aggregates import MAX_DELTA_FRACTION
+from .catalog import CatalogSnapshot, get_catalog_store
+from .enrichment import get_enrichment_engine
+from .indexes import book_ids
+from .search import TOKEN_RE, normalize
+from .utilidades import UNAVAILABLE_DETAILS, current_snapshot
+
+logger = logging.getLogger("app")
+
+K1 = 1.2
+B = 0.75
+TITLE_WEIGHT = 2.0
+# Documentos por segmento na construção inicial (limita a memória dos tokens)
+BUILD_CHUNK = 20000
+SNIPPET_CHARS = 200
+# Descrições que não são texto do livro
+PLACEHOLDERS = {UNAVAILABLE_DETAILS["product_description"], "No description available"}
+
+# Tokenização em lote equivalente a TOKEN_RE (\w+): separadores ASCII viram
+# espaço numa só passada de bytes.translate, os não ASCII (aspas curvas,
+# travessões...) com um replace por caractere distinto; "\x01" separa os textos.
+_WORD_CHAR = re.compile(r"\w")
+_NON_ASCII = re.compile(r"[^\x00-\x7f]")
+_SEPARATOR = "\x01"
+_ASCII_TABLE = bytes(
+    c if c == ord(_SEPARATOR) or c >= 128 or _WORD_CHAR.match(chr(c)) else ord(" ") for c in range(256)
+)
+
+
+@dataclass(frozen=True)
+class Segment:
+    """Postings imutáveis, ordenados por (termo, documento)."""
+    terms: np.ndarray
+    docs: np.ndarray
+    tfs: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def postings(self, term: int):
+        lo = np.searchsorted(self.terms, term, side="left")
+        hi = np.searchsorted(self.terms, term, side="right")
+        return self.docs[lo:hi], self.tfs[lo:hi]
+
+
+@dataclass(frozen=True)
+class SearchHits:
+    """Melhores documentos de uma consulta, em ordem de score."""
+    terms: frozenset
+    urls: list
+    scores: np.ndarray
+    total: int
+
+
+def description_of(details) -> str:
+    """Texto da descrição nos detalhes enriquecidos ("" quando não há)."""
+    text = details.get("product_description") if isinstance(details, dict) else None
+    if not isinstance(text, str) or text in PLACEHOLDERS:
+        return ""
+    return text
+
+
+def query_terms(query: str) -> list:
+    return list(dict.fromkeys(TOKEN_RE.findall(normalize(query))))
+
+
+def _tokenize(texts):
+    """(tokens normalizados, posição do texto de cada token) de uma lista de textos."""
+    joined = f" {_SEPARATOR} ".join(normalize(t).replace(_SEPARATOR, " ") for t in texts)
+    joined = joined.encode("utf-8").translate(_ASCII_TABLE).decode("utf-8")
+    for ch in set(_NON_ASCII.findall(joined)):
+        if not _WORD_CHAR.match(ch):
+            joined = joined.replace(ch, " ")
+    words = np.array(joined.split(), dtype=object)
+    separators = words == _SEPARATOR
+    return words[~separators], np.cumsum(separators)[~separators]
+
+
+class FullTextIndex:
+    """Índice invertido por segmentos com pontuação BM25 (thread-safe)."""
+
+    def __init__(self, store=None, sync_seconds: float = 2.0):
+        self.store = store
+        self.sync_seconds = sync_seconds
+        self.vocabulary = {}
+        self.segments = []
+        self.urls = []           # documento -> detail_url
+        self.doc_of = {}         # detail_url -> documento vivo
+        self.lengths = np.zeros(0, dtype=np.float64)
+        self.live = np.zeros(0, dtype=bool)
+        self.n_docs = 0
+        self.live_docs = 0
+        self.total_length = 0.0
+        self.titles = {}         # detail_url -> título do catálogo
+        self.checksums = {}      # detail_url -> crc32 da descrição indexada
+        self.catalog_version = None
+        self.store_seq = 0       # maior seq lido do store
+        self.store_modified = None   # maior fetched_at lido do store
+        self._synced_at = 0.0
+        self._lock = threading.RLock()
+        # Uma reconstrução por vez (fora de _lock: as consultas seguem no índice atual)
+        self._build_lock = threading.Lock()
+
+    # --- atualização --------------------------------------------------
+
+    def sync(self, snapshot: CatalogSnapshot, force: bool = False) -> None:
+        """Traz o índice para o snapshot e para as gravações recentes do store."""
+        if self.catalog_version is None or snapshot.version > self.catalog_version:
+            self._sync_catalog(snapshot)
+        with self._lock:
+            now = time.monotonic()
+            if self.store is not None and (force or now - self._synced_at >= self.sync_seconds):
+                self._synced_at = now
+                self._sync_store()
+
+    def _read_store(self) -> dict:
+        """{url: descrição} gravadas desde a última leitura (avança a marca)."""
+        descriptions = {}
+        for seq, url, details, fetched_at in self.store.changes_after(self.store_seq):
+            descriptions[url] = description_of(details)
+            self.store_seq = seq
+            self.store_modified = max(self.store_modified or fetched_at, fetched_at)
+        return descriptions
+
+    def _sync_catalog(self, snapshot: CatalogSnapshot) -> None:
+        """
+        Aplica a versão do catálogo. Diferenças pequenas são aplicadas no
+        próprio índice; a construção inicial e diferenças grandes montam um
+        índice novo fora de `_lock` e o trocam de uma vez. Enquanto outra
+        thread reconstrói, as demais seguem com o índice atual (só a primeira
+        construção, sem índice algum, faz as consultas esperarem).
+        """
+        first = self.catalog_version is None
+        if not self._build_lock.acquire(blocking=first):
+            return
+        try:
+            if self.catalog_version is not None and snapshot.version <= self.catalog_version:
+                return
+            frame = snapshot.df[["detail_url", "title"]].dropna(subset=["detail_url"]).drop_duplicates("detail_url")
+            titles = dict(zip(frame["detail_url"], frame["title"].where(frame["title"].notna(), "")))
+            removed = [url for url in self.titles if url not in titles]
+            changed = [url for url, title in titles.items() if self.titles.get(url) != title]
+            if first or len(changed) + len(removed) > MAX_DELTA_FRACTION * max(len(titles), 1):
+                fresh = FullTextIndex(self.store, self.sync_seconds)
+                fresh._apply_catalog(snapshot.version, titles, [], list(titles))
+                with self._lock:
+                    self._adopt(fresh)
+            else:
+                with self._lock:
+                    self._apply_catalog(snapshot.version, titles, removed, changed)
+            logger.info(f"Índice textual: versão {snapshot.version} do catálogo, {self.live_docs} documentos "
+                        f"({len(changed)} novos/alterados, {len(removed)} removidos)")
+        finally:
+            self._build_lock.release()
+
+    def _apply_catalog(self, version: int, titles: dict, removed: list, changed: list) -> None:
+        descriptions = {}
+        if self.store is not None:
+            if self.catalog_version is None:
+                descriptions = self._read_store()
+                self._synced_at = time.monotonic()
+            elif changed:
+                descriptions = {url: description_of(details) for url, (details, _) in self.store.get_many(changed).items()}
+        self._remove(removed)
+        self.titles = titles
+        self._add([(url, titles[url], descriptions.get(url, "")) for url in changed])
+        self.catalog_version = version
+
+    def _adopt(self, fresh: "FullTextIndex") -> None:
+        """Assume o estado de um índice montado à parte (sob `_lock`)."""
+        for name, value in vars(fresh).items():
+            if name not in ("store", "sync_seconds", "_lock", "_build_lock"):
+                setattr(self, name, value)
+
+    def _sync_store(self) -> None:
+        batch = [
+            (url, self.titles[url], text)
+            for url, text in self._read_store().items()
+            if url in self.titles and self.checksums.get(url, 0) != zlib.crc32(text.encode("utf-8"))
+        ]
+        self._add(batch)
+
+    def _remove(self, urls) -> None:
+        for url in urls:
+            doc = self.doc_of.pop(url, None)
+            self.checksums.pop(url, None)
+            if doc is not None:
+                self.live[doc] = False
+                self.live_docs -= 1
+                self.total_length -= self.lengths[doc]
+
+    def _add(self, batch: list) -> None:
+        for start in range(0, len(batch), BUILD_CHUNK):
+            self._add_segment(batch[start:start + BUILD_CHUNK])
+
+    def _add_segment(self, batch: list) -> None:
+        if not batch:
+            return
+        urls, titles, descriptions = zip(*batch)
+        self._remove(urls)
+        n, base = len(batch), self.n_docs
+        title_tokens, title_docs = _tokenize(titles)
+        description_tokens, description_docs = _tokenize(descriptions)
+        local = np.concatenate([title_docs, description_docs]).astype(np.int64)
+        weights = np.concatenate([np.full(len(title_tokens), TITLE_WEIGHT), np.ones(len(description_tokens))])
+        # Ids globais só para os tokens distintos do lote
+        codes, uniques = pd.factorize(np.concatenate([title_tokens, description_tokens]))
+        vocabulary = self.vocabulary
+        ids = np.array([vocabulary.setdefault(t, len(vocabulary)) for t in uniques], dtype=np.int64)
+        # Soma por (termo, documento); a ordem das chaves já é a dos postings
+        keys, inverse = np.unique(ids[codes] * n + local, return_inverse=True)
+        tfs = np.bincount(inverse, weights=weights)
+        lengths = np.bincount(local, weights=weights, minlength=n)
+
+        if base + n > len(self.live):
+            capacity = max(base + n, 2 * len(self.live), 1024)
+            self.lengths = np.resize(self.lengths, capacity)
+            self.live = np.concatenate([self.live, np.zeros(capacity - len(self.live), dtype=bool)])
+        self.lengths[base:base + n] = lengths
+        self.live[base:base + n] = True
+        self.urls.extend(urls)
+        self.doc_of.update(zip(urls, range(base, base + n)))
+        self.checksums.update((url, zlib.crc32(text.encode("utf-8"))) for url, text in zip(urls, descriptions))
+        self.n_docs += n
+        self.live_docs += n
+        self.total_length += float(lengths.sum())
+        if len(keys):
+            self.segments.append(Segment(keys // n, base + keys % n, tfs.astype(np.float32)))
+            self._merge()
+
+    def _merge(self) -> None:
+        """Funde os últimos segmentos enquanto, somados, não forem bem menores que o anterior."""
+        segments = self.segments
+        first, size = len(segments) - 1, len(segments[-1])
+        while first > 0 and 2 * size >= len(segments[first - 1]):
+            first -= 1
+            size += len(segments[first])
+        if first == len(segments) - 1:
+            return
+        merged = segments[first:]
+        terms = np.concatenate([s.terms for s in merged])
+        docs = np.concatenate([s.docs for s in merged])
+        tfs = np.concatenate([s.tfs for s in merged])
+        keep = self.live[docs]
+        terms, docs, tfs = terms[keep], docs[keep], tfs[keep]
+        # Documentos dos segmentos mais novos são sempre maiores: basta ordenar por termo
+        order = np.argsort(terms, kind="stable")
+        self.segments = segments[:first] + [Segment(terms[order], docs[order], tfs[order])]
+
+    # --- consulta -----------------------------------------------------
+
+    def version(self):
+        """(token, last_modified) do conteúdo lido do store, para o ETag."""
+        with self._lock:
+            seq, modified, live_docs = self.store_seq, self.store_modified, self.live_docs
+        token = hashlib.blake2b(f"{seq}:{live_docs}".encode("ascii"), digest_size=4).hexdigest()
+        if modified is not None:
+            modified = datetime.datetime.fromtimestamp(int(modified), datetime.timezone.utc)
+        return token, modified
+
+    def search(self, query: str, limit: int) -> SearchHits:
+        terms = query_terms(query)
+        with self._lock:
+            ids = [self.vocabulary[t] for t in terms if t in self.vocabulary]
+            if not ids or not self.live_docs:
+                return SearchHits(frozenset(terms), [], np.empty(0, dtype=np.float32), 0)
+            scores = np.zeros(self.n_docs, dtype=np.float32)
+            average = self.total_length / self.live_docs
+            for term in ids:
+                parts = [segment.postings(term) for segment in self.segments]
+                docs = np.concatenate([p[0] for p in parts])
+                tfs = np.concatenate([p[1] for p in parts])
+                keep = self.live[docs]
+                docs, tfs = docs[keep], tfs[keep]
+                if not len(docs):
+                    continue
+                df = len(docs)
+                idf = np.log1p((self.live_docs - df + 0.5) / (df + 0.5))
+                norm = K1 * (1 - B + B * self.lengths[docs] / average)
+                scores[docs] += idf * tfs * (K1 + 1) / (tfs + norm)
+            hits = np.flatnonzero(scores)
+            total = len(hits)
+            if total > limit:
+                hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]]
+            hits = hits[np.lexsort((hits, -scores[hits]))]
+            urls = [self.urls[doc] for doc in hits.tolist()]
+        return SearchHits(frozenset(terms), urls, scores[hits], total)
+
+
+_FULLTEXT_LOCK = threading.Lock()
+
+
+def get_fulltext_index(app) -> FullTextIndex:
+    """Retorna (criando se preciso) o índice textual associado ao app Flask."""
+    index = app.extensions.get("fulltext")
+    if index is None:
+        with _FULLTEXT_LOCK:
+            index = app.extensions.get("fulltext")
+            if index is None:
+                index = FullTextIndex(
+                    store=get_enrichment_engine(app).store,
+                    sync_seconds=app.config.get("FULLTEXT_SYNC_SECONDS", 2.0),
+                )
+                app.extensions["fulltext"] = index
+    return index
+
+
+def start_warm_up(app) -> threading.Thread:
+    """Constrói o índice textual numa thread em background (fora do caminho das consultas)."""
+
+    def run():
+        try:
+            get_fulltext_index(app).sync(get_catalog_store(app).snapshot())
+        except Exception:
+            logger.exception("Falha ao construir o índice textual")
+
+    thread = threading.Thread(target=run, name="fulltext-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def fulltext_version():
+    """Parte do ETag de /books/search que depende do índice (só com `q`)."""
+    if not request.args.get("q", "").strip():
+        return None
+    index = get_fulltext_index(current_app)
+    index.sync(current_snapshot())
+    return index.version()
+
+
+# --- destaque ---------------------------------------------------------
+
+def _matches(text: str, terms) -> list:
+    return [m.span() for m in TOKEN_RE.finditer(text) if normalize(m.group()) in terms]
+
+
+def _mark(text: str, spans: list, start: int = 0, end: int = None) -> str:
+    end = len(text) if end is None else end
+    parts, position = [], start
+    for a, b in spans:
+        if a < start or b > end:
+            continue
+        parts += [html.escape(text[position:a]), "<em>", html.escape(text[a:b]), "</em>"]
+        position = b
+    parts.append(html.escape(text[position:end]))
+    return "".join(parts)
+
+
+def highlight(text: str, terms) -> str:
+    """Texto (escapado como HTML) com os termos da consulta entre <em>."""
+    return _mark(text, _matches(text, terms))
+
+
+def snippet(text: str, terms, width: int = SNIPPET_CHARS) -> str:
+    """Trecho de ~`width` caracteres com mais ocorrências dos termos, destacado."""
+    spans = _matches(text, terms)
+    if len(text) <= width:
+        return _mark(text, spans)
+    start, context = 0, width // 4
+    if spans:
+        starts = np.array([a for a, _ in spans])
+        counts = np.searchsorted(starts, starts + width - context, side="right") - np.arange(len(starts))
+        start = max(0, int(starts[int(np.argmax(counts))]) - context)
+    end = min(len(text), start + width)
+    start = max(0, end - width)
+    # Corta nas bordas de palavra
+    if start > 0:
+        space = text.find(" ", start, start + context)
+        start = space + 1 if space >= 0 else start
+    if end < len(text):
+        space = text.rfind(" ", start, end)
+        end = space if space > start else end
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(text) else ""
+    return prefix + _mark(text, spans, start, end) + suffix
+
+
+class UrlRows:
+    """detail_url -> linha do snapshot (URLs repetidas apontam para a primeira linha, como no índice)."""
+
+    def __init__(self, df: pd.DataFrame):
+        urls = df["detail_url"]
+        valid = (urls.notna() & ~urls.duplicated()).to_numpy(dtype=bool)
+        self.index = pd.Index(urls[valid], dtype=object)
+        self.rows = np.flatnonzero(valid)
+
+    def resolve(self, urls) -> np.ndarray:
+        """Linhas das URLs (-1 para as ausentes)."""
+        positions = self.index.get_indexer(pd.Index(list(urls), dtype=object))
+        rows = np.full(len(positions), -1, dtype=np.int64)
+        known = positions >= 0
+        rows[known] = self.rows[positions[known]]
+        return rows
+
+
+def search_payload(snapshot: CatalogSnapshot, hits: SearchHits, query: str, fields=None, store=None) -> dict:
+    """Corpo de /books/search?q=: livros do snapshot com score e trechos destacados."""
+    rows = snapshot.derive("detail_url_rows", lambda snap: UrlRows(snap.df)).resolve(hits.urls)
+    found = rows >= 0
+    rows, scores = rows[found], hits.scores[found]
+    urls = [url for url, ok in zip(hits.urls, found.tolist()) if ok]
+    stored = store.get_many(urls) if store is not None and urls else {}
+    part = snapshot.df.iloc[rows]
+    titles = part["title"].tolist()
+    if fields:
+        part = part[list(fields)]
+    index = book_ids(snapshot)
+    results = []
+    for row, score, url, title, record in zip(rows.tolist(), scores.tolist(), urls, titles,
+                                              part.to_dict(orient="records")):
+        text = description_of(stored[url][0]) if url in stored else ""
+        marked = {
+            "title": highlight(title if isinstance(title, str) else "", hits.terms),
+            "product_description": snippet(text, hits.terms) if text else None,
+        }
+        results.append({"id": index.id_of(row), "score": round(score, 6), "highlight": marked, **record})
+    return {"query": query, "total": hits.total, "results": results}
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+from .catalog import CatalogSnapshot
+from .search import normalize
+
+
+class SortedIndex:
+    """Permutação de linhas ordenada por um valor numérico (NaN ficam de fora)."""
+
+    def __init__(self, values: np.ndarray, rows: np.ndarray):
+        valid = ~np.isnan(values)
+        values, rows = values[valid], rows[valid]
+        order = np.argsort(values, kind="stable")
+        self.values = values[order]
+        self.rows = rows[order]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def bounds(self, low: float, high: float):
+        """Fatia [start, stop) com low <= valor <= high, via busca binária."""
+        start = np.searchsorted(self.values, low, side="left")
+        stop = np.searchsorted(self.values, high, side="right")
+        return start, max(start, stop)
+
+    def range(self, low: float, high: float) -> np.ndarray:
+        start, stop = self.bounds(low, high)
+        return self.rows[start:stop]
+
+
+def _group_rows(values) -> dict:
+    """valor -> posições (ordenadas) das linhas com aquele valor."""
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=True)
+    order = np.argsort(codes, kind="stable")
+    boundaries = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return {
+        uniques[i]: order[boundaries[i]:boundaries[i + 1]]
+        for i in range(len(uniques))
+    }
+
+
+class PriceIndex:
+    """
+    Índice de preço do snapshot:
+      - `all`: todas as linhas ordenadas por preço
+      - `by_category`: sub-índice por categoria (chave normalizada)
+      - `by_rating`: sub-índice por rating
+    Uma consulta de faixa custa O(log n + k).
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        prices = df["price"].to_numpy(dtype=float)
+        self.ratings = df["rating"].to_numpy(dtype=float, na_value=np.nan)
+        self.all = SortedIndex(prices, np.arange(len(df)))
+        categories = [normalize(c) if isinstance(c, str) else None for c in df["category"]]
+        self.by_category = {
+            key: SortedIndex(prices[rows], rows)
+            for key, rows in _group_rows(categories).items()
+        }
+        self.by_rating = {
+            int(key): SortedIndex(prices[rows], rows)
+            for key, rows in _group_rows(self.ratings).items()
+        }
+
+    def query(self, low: float, high: float, category: str = None, rating: int = None) -> np.ndarray:
+        """Posições das linhas na faixa, em ordem de linha (mesma ordem do CSV)."""
+        empty = np.empty(0, dtype=np.int64)
+        if category:
+            index = self.by_category.get(normalize(category))
+        elif rating is not None:
+            index = self.by_rating.get(rating)
+        else:
+            index = self.all
+        if index is None:
+            return empty
+        rows = index.range(low, high)
+        if category and rating is not None:
+            rows = rows[self.ratings[rows] == rating]
+        return np.sort(rows)
+
+
+def price_index(snapshot: CatalogSnapshot) -> PriceIndex:
+    return snapshot.derive("price_index", lambda snap: PriceIndex(snap.df))
+
+
+def top_rated_rows(snapshot: CatalogSnapshot) -> np.ndarray:
+    """Posições das linhas com o maior rating do catálogo."""
+    def build(snap):
+        ratings = snap.df["rating"]
+        return np.flatnonzero((ratings == ratings.max()).to_numpy(dtype=bool, na_value=False))
+    return snapshot.derive("top_rated_rows", build)
+
+
+# Slug do detail_url: ".../catalogue/a-light-in-the-attic_1000/index.html" -> "a-light-in-the-attic_1000"
+SLUG_PATTERN = r"/([^/]+)/(?:index\.html?)?$"
+LEGACY_ID_PATTERN = r"\d{1,18}"
+
+
+def slugs_from_urls(urls) -> np.ndarray:
+    """Slug de cada URL (None quando ausente ou fora do padrão)."""
+    slugs = pd.Series(urls, dtype=object).str.extract(SLUG_PATTERN, expand=False)
+    return slugs.astype(object).where(slugs.notna(), None).to_numpy(dtype=object)
+
+
+class BookIdIndex:
+    """
+    Ids estáveis dos livros (slug do detail_url) -> linha do snapshot.
+    O índice é um `pd.Index` (tabela hash): consulta O(1) por id e resolução
+    vetorizada de vários ids de uma vez. Slugs repetidos apontam para a
+    primeira linha. Ids numéricos continuam valendo como posição da linha
+    (compatibilidade com os ids antigos).
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.size = len(df)
+        self.ids = slugs_from_urls(df["detail_url"])
+        keys = pd.Index(self.ids, dtype=object)
+        valid = keys.notna() & ~keys.duplicated()
+        self.index = keys[valid]
+        self.rows = np.flatnonzero(valid)
+
+    def row_of(self, key: str, legacy: bool = True) -> int:
+        """Linha do id (slug ou, com `legacy`, posição antiga), ou -1."""
+        try:
+            return int(self.rows[self.index.get_loc(key)])
+        except KeyError:
+            pass
+        if legacy and key.isascii() and key.isdigit() and int(key) < self.size:
+            return int(key)
+        return -1
+
+    def resolve(self, keys) -> np.ndarray:
+        """Linhas de vários ids (-1 para os desconhecidos), em uma consulta vetorizada."""
+        keys = pd.Series(list(keys), dtype=object).astype(str)
+        positions = self.index.get_indexer(pd.Index(keys, dtype=object))
+        # Só indexa as posições encontradas: em catálogo vazio `self.rows[-1]` falharia
+        rows = np.full(len(positions), -1, dtype=np.int64)
+        found = positions >= 0
+        rows[found] = self.rows[positions[found]]
+        legacy = (rows < 0) & keys.str.fullmatch(LEGACY_ID_PATTERN).to_numpy(dtype=bool)
+        if legacy.any():
+            numbers = keys[legacy].astype(np.int64).to_numpy()
+            rows[legacy] = np.where(numbers < self.size, numbers, -1)
+        return rows
+
+    def id_of(self, row: int):
+        return self.ids[row]
+
+
+def book_ids(snapshot: CatalogSnapshot) -> BookIdIndex:
+    return snapshot.derive("book_ids", lambda snap: BookIdIndex(snap.df))
@@ -1,14 +1,36 @@
+import json
 import logging
-from flask import jsonify, request
-import pandas as pd
+from flask import Response, current_app, jsonify, request
+import numpy as np
 
 from .config import Config
 from .utilidades import (
     create_token,
     token_required,
-    scrape_book_details,
-    load_books_df,
+    current_snapshot,
 )
+from .responses import (
+    CursorExpired,
+    InvalidParameter,
+    catalog_body,
+    conditional_on_catalog,
+    parse_fields,
+    parse_page_args,
+    send_prepared,
+    send_rows,
+)
+from .search import search_rows
+from .indexes import book_ids, price_index, top_rated_rows
+from .queries import run_query, select_rows
+from .similarity import similarity_index
+from .fulltext import fulltext_version, get_fulltext_index, search_payload
+from .export import ExportUnavailable, export_response, negotiate_format
+from .aggregates import catalog_aggregates
+from .metrics import render_metrics, span
+from .profiling import get_profile_store, is_profiling_admin
+from .features import FEATURE_FORMATS, FeatureMismatch, feature_body, feature_set, parse_feature_args
+from .predict import PredictionTimeout, catalog_features, get_batcher, parse_predict_request
+from .enrichment import batch_line, get_enrichment_engine, parse_batch_ids, resolve_batch
 
 logger = logging.getLogger("app")
 
@@ -132,6 +154,15 @@ def register_routes(app):
                 records:
                   type: integer
                   example: 1000
+                catalog_version:
+                  type: integer
+                  example: 1
+                loaded_at:
+                  type: string
+                  example: "2025-01-01T12:00:00+00:00"
+                load_duration_ms:
+                  type: number
+                  example: 12.5
           500:
             description: Problema com os dados
             schema:
@@ -146,13 +177,15 @@ def register_routes(app):
         """
         try:
             try:
-                df = load_books_df()
-                record_count = len(df)
+                snapshot = current_snapshot()
                 logger.info("API: OK, Data: Connected")
                 return jsonify({
                     "api_status": "ok",
                     "data_status": "connected",
-                    "records": record_count
+                    "records": len(snapshot),
+                    "catalog_version": snapshot.version,
+                    "loaded_at": snapshot.loaded_at.isoformat(),
+                    "load_duration_ms": round(snapshot.load_seconds * 1000, 2),
                 }), 200
             except FileNotFoundError:
                 logger.info("API: OK, Data: Missing")
@@ -169,9 +202,53 @@ def register_routes(app):
                 "records": 0
             }), 500
 
+    @app.route("/api/v1/metrics", methods=["GET"])
+    def metrics():
+        """
+        Métricas da API no formato texto do Prometheus
+        ---
+        tags:
+          - Health
+        produces:
+          - text/plain
+        responses:
+          200:
+            description: >
+              Latência, tamanho de resposta e contagem de status por rota;
+              tempo por fase (load, auth, query, serialize); estado do catálogo
+        """
+        return Response(render_metrics(current_app), mimetype="text/plain; version=0.0.4")
+
     # ----- Books -----
+    def _books_by_ids(snapshot):
+        """Multi-get de /books?ids=: resolve todos os ids em uma consulta ao índice de ids."""
+        ids = list(dict.fromkeys(
+            key.strip() for raw in request.args.getlist("ids") for key in raw.split(",") if key.strip()
+        ))
+        max_ids = current_app.config.get("BOOKS_MAX_IDS", 1000)
+        if not ids:
+            raise InvalidParameter("Parâmetro 'ids' vazio")
+        if len(ids) > max_ids:
+            raise InvalidParameter(f"Máximo de {max_ids} ids por requisição")
+        fields = parse_fields(request.args, snapshot.df.columns)
+        with span("query"):
+            index = book_ids(snapshot)
+            rows = index.resolve(ids)
+            found = rows >= 0
+            part = snapshot.df.iloc[rows[found]]
+            if fields:
+                part = part[list(fields)]
+        with span("serialize"):
+            books = [
+                {"id": index.id_of(row), **record}
+                for row, record in zip(rows[found].tolist(), part.to_dict(orient="records"))
+            ]
+            not_found = [key for key, ok in zip(ids, found.tolist()) if not ok]
+            return jsonify({"books": books, "not_found": not_found}), 200
+
     @app.route("/api/v1/books", methods=["GET"])
     @token_required
+    @conditional_on_catalog
     def list_books():
         """
         Lista todos os livros
@@ -180,6 +257,32 @@ def register_routes(app):
           - Books
         security:
           - Bearer: []
+        parameters:
+          - name: limit
+            in: query
+            type: integer
+            required: false
+            description: Quantidade máxima de livros por página
+            example: 50
+          - name: cursor
+            in: query
+            type: string
+            required: false
+            description: Cursor da próxima página (header X-Next-Cursor da resposta anterior)
+          - name: fields
+            in: query
+            type: string
+            required: false
+            description: Campos a retornar, separados por vírgula
+            example: title,price
+          - name: ids
+            in: query
+            type: string
+            required: false
+            description: >
+              Busca vários livros por id (slug ou id numérico antigo), separados por vírgula.
+              Retorna {"books": [...], "not_found": [...]} na ordem pedida.
+            example: a-light-in-the-attic_1000,soumission_998
         responses:
           200:
             description: Lista de livros retornada com sucesso
@@ -198,14 +301,29 @@ def register_routes(app):
                     type: integer
                   detail_url:
                     type: string
+          304:
+            description: Conteúdo inalterado (If-None-Match corresponde ao ETag)
+          400:
+            description: Parâmetros de paginação inválidos
           401:
             description: Token ausente ou inválido
+          410:
+            description: Cursor de uma versão anterior do catálogo cujo livro foi removido (recomece a paginação)
           500:
             description: Erro ao carregar dados
         """
         try:
-            df = load_books_df()
-            return jsonify(df.to_dict(orient="records")), 200
+            snapshot = current_snapshot()
+            if "ids" in request.args:
+                return _books_by_ids(snapshot)
+            page = parse_page_args(request.args, snapshot.df.columns)
+            if page.is_default:
+                return send_prepared(catalog_body(snapshot, "books"))
+            return send_rows(snapshot, np.arange(len(snapshot)), page)
+        except InvalidParameter as e:
+            return jsonify({"error": str(e)}), 400
+        except CursorExpired as e:
+            return jsonify({"error": str(e)}), 410
         except FileNotFoundError as e:
             return jsonify({"error": str(e)}), 500
         except Exception:
@@ -214,71 +332,257 @@ def register_routes(app):
 
     @app.route("/api/v1/books/search", methods=["GET"])
     @token_required
+    @conditional_on_catalog(version=fulltext_version)
     def search_books():
         """
-        Busca livros por título e/ou categoria
+        Busca livros por título e/ou categoria, ou busca textual ranqueada (q)
         ---
         tags:
           - Books
         security:
           - Bearer: []
         parameters:
+          - name: q
+            in: query
+            type: string
+            required: false
+            description: >
+              Busca textual em título + descrição (BM25, ignora maiúsculas e acentos).
+              Não combina com title/category nem com cursor
+            example: mystery detective
           - name: title
             in: query
             type: string
             required: false
-            description: Buscar por título (case insensitive)
+            description: Buscar por título (substring, ignora maiúsculas e acentos)
             example: Python
           - name: category
             in: query
             type: string
             required: false
-            description: Buscar por categoria (case insensitive)
+            description: Buscar por categoria (substring, ignora maiúsculas e acentos)
             example: Fiction
+          - name: limit
+            in: query
+            type: integer
+            required: false
+            description: Quantidade máxima de livros por página (com q, de resultados; padrão 20)
+            example: 50
+          - name: cursor
+            in: query
+            type: string
+            required: false
+            description: Cursor da próxima página (header X-Next-Cursor da resposta anterior)
+          - name: fields
+            in: query
+            type: string
+            required: false
+            description: Campos a retornar, separados por vírgula
+            example: title,price
         responses:
           200:
-            description: Livros encontrados
+            description: >
+              Livros encontrados. Com q: {"query", "total", "results": [{"id", "score",
+              "highlight": {"title", "product_description"}, ...campos do livro}]}, em
+              ordem de score; os destaques são HTML escapado com os termos entre <em>
             schema:
               type: array
               items:
                 type: object
+          304:
+            description: Conteúdo inalterado (If-None-Match / If-Modified-Since)
           400:
             description: Parâmetros inválidos
           401:
             description: Token ausente ou inválido
+          410:
+            description: Cursor de uma versão anterior do catálogo cujo livro foi removido (recomece a paginação)
           500:
             description: Erro ao buscar dados
         """
         try:
-            df = load_books_df()
+            snapshot = current_snapshot()
+            query = request.args.get("q", "").strip()
             title = request.args.get("title", "").strip()
             category = request.args.get("category", "").strip()
 
+            if query:
+                if title or category or "cursor" in request.args:
+                    raise InvalidParameter("Parâmetro 'q' não pode ser combinado com title, category ou cursor")
+                max_results = current_app.config.get("FULLTEXT_MAX_RESULTS", 100)
+                try:
+                    limit = int(request.args.get("limit", min(20, max_results)))
+                except ValueError:
+                    raise InvalidParameter("Parâmetro 'limit' deve ser inteiro")
+                if not 1 <= limit <= max_results:
+                    raise InvalidParameter(f"Parâmetro 'limit' deve estar entre 1 e {max_results}")
+                fields = parse_fields(request.args, snapshot.df.columns)
+                logger.info("Busca textual")
+                with span("query"):
+                    index = get_fulltext_index(current_app)
+                    index.sync(snapshot)
+                    hits = index.search(query, limit)
+                with span("serialize"):
+                    return jsonify(search_payload(snapshot, hits, query, fields, index.store)), 200
+
             if not title and not category:
-                return jsonify({"error": "Informe ao menos um parâmetro: title ou category"}), 400
+                return jsonify({"error": "Informe ao menos um parâmetro: q, title ou category"}), 400
 
             if title and category:
                 logger.info("Filtrando por title e category")
-                df = df[
-                    df["title"].str.contains(title, case=False, na=False) &
-                    df["category"].str.contains(category, case=False, na=False)
-                ]
             elif title:
                 logger.info("Filtrando por title")
-                df = df[df["title"].str.contains(title, case=False, na=False)]
             elif category:
                 logger.info("Filtrando por category")
-                df = df[df["category"].str.contains(category, case=False, na=False)]
 
-            return jsonify(df.to_dict(orient="records")), 200
+            page = parse_page_args(request.args, snapshot.df.columns)
+            with span("query"):
+                rows = search_rows(snapshot, title=title, category=category)
+            return send_rows(snapshot, rows, page)
+        except InvalidParameter as e:
+            return jsonify({"error": str(e)}), 400
+        except CursorExpired as e:
+            return jsonify({"error": str(e)}), 410
         except FileNotFoundError as e:
             return jsonify({"error": str(e)}), 500
         except Exception:
             logger.exception("Erro na busca de livros")
             return jsonify({"error": "Falha ao buscar livros"}), 500
 
+    @app.route("/api/v1/books/query", methods=["GET"])
+    @token_required
+    @conditional_on_catalog
+    def query_books():
+        """
+        Consulta multi-campo com filtros combinados, ordenação e facetas
+        ---
+        tags:
+          - Books
+        security:
+          - Bearer: []
+        parameters:
+          - name: category
+            in: query
+            type: string
+            required: false
+            description: Uma ou mais categorias exatas, separadas por vírgula (ignora maiúsculas/acentos)
+            example: Fiction,Poetry
+          - name: availability
+            in: query
+            type: string
+            required: false
+            description: Disponibilidade exata (uma ou mais, separadas por vírgula)
+          - name: rating
+            in: query
+            type: string
+            required: false
+            description: Um ou mais ratings exatos, separados por vírgula
+          - name: rating_min
+            in: query
+            type: number
+            required: false
+            example: 4
+          - name: rating_max
+            in: query
+            type: number
+            required: false
+          - name: price_min
+            in: query
+            type: number
+            required: false
+          - name: price_max
+            in: query
+            type: number
+            required: false
+            example: 30
+          - name: sort
+            in: query
+            type: string
+            required: false
+            description: Campos de ordenação (price, rating, title, category, availability); prefixo - para decrescente
+            example: price,-rating
+          - name: facets
+            in: query
+            type: string
+            required: false
+            description: Contagens por valor sobre o resultado filtrado (category, rating, availability)
+            example: category,rating
+          - name: limit
+            in: query
+            type: integer
+            required: false
+          - name: offset
+            in: query
+            type: integer
+            required: false
+          - name: fields
+            in: query
+            type: string
+            required: false
+            description: Campos a retornar, separados por vírgula
+          - name: explain
+            in: query
+            type: boolean
+            required: false
+            description: Inclui o plano (ordem dos filtros e cardinalidade estimada)
+        responses:
+          200:
+            description: Resultado da consulta
+            schema:
+              type: object
+              properties:
+                total:
+                  type: integer
+                offset:
+                  type: integer
+                limit:
+                  type: integer
+                results:
+                  type: array
+                  items:
+                    type: object
+                facets:
+                  type: object
+          304:
+            description: Conteúdo inalterado (If-None-Match / If-Modified-Since)
+          400:
+            description: Parâmetros inválidos
+          401:
+            description: Token ausente ou inválido
+          500:
+            description: Erro ao consultar livros
+        """
+        try:
+            snapshot = current_snapshot()
+            fields = parse_fields(request.args, snapshot.df.columns)
+            with span("query"):
+                result = run_query(snapshot, request.args)
+            with span("serialize"):
+                part = snapshot.df.iloc[result.rows]
+                if fields:
+                    part = part[list(fields)]
+                body = {
+                    "total": result.total,
+                    "offset": result.offset,
+                    "limit": result.limit,
+                    "results": part.to_dict(orient="records"),
+                }
+                if result.facets is not None:
+                    body["facets"] = result.facets
+                if request.args.get("explain", "").lower() in ("1", "true", "yes"):
+                    body["plan"] = result.plan
+                return jsonify(body), 200
+        except InvalidParameter as e:
+            return jsonify({"error": str(e)}), 400
+        except FileNotFoundError as e:
+            return jsonify({"error": str(e)}), 500
+        except Exception:
+            logger.exception("Erro na consulta de livros")
+            return jsonify({"error": "Falha ao consultar livros"}), 500
+
     @app.route("/api/v1/categories", methods=["GET"])
     @token_required
+    @conditional_on_catalog
     def list_categories():
         """
         Lista todas as categorias disponíveis
@@ -294,24 +598,25 @@ def register_routes(app):
               type: array
               items:
                 type: string
+          304:
+            description: Conteúdo inalterado (If-None-Match corresponde ao ETag)
           401:
             description: Token ausente ou inválido
           500:
             description: Erro ao carregar dados
         """
         try:
-            df = load_books_df()
-            categories = sorted(df["category"].dropna().unique().tolist())
-            return jsonify(categories), 200
+            return send_prepared(catalog_body(current_snapshot(), "categories"))
         except FileNotFoundError as e:
             return jsonify({"error": str(e)}), 500
         except Exception:
             logger.exception("Erro ao listar categorias")
             return jsonify({"error": "Falha ao listar categorias"}), 500
 
-    @app.route("/api/v1/books/<int:book_id>", methods=["GET"])
+    @app.route("/api/v1/books/<book_id>", methods=["GET"])
     @token_required
-    def get_book(book_id: int):
+    @conditional_on_catalog
+    def get_book(book_id: str):
         """
         Obtém detalhes de um livro específico pelo ID
         ---
@@ -322,15 +627,17 @@ def register_routes(app):
         parameters:
           - name: book_id
             in: path
-            type: integer
+            type: string
             required: true
-            description: ID do livro (índice no CSV)
-            example: 0
+            description: Id estável do livro (slug do detail_url) ou o id numérico antigo (posição no CSV)
+            example: a-light-in-the-attic_1000
         responses:
           200:
             description: Detalhes do livro
             schema:
               type: object
+          304:
+            description: Conteúdo inalterado (If-None-Match / If-Modified-Since)
           404:
             description: Livro não encontrado
           401:
@@ -339,22 +646,28 @@ def register_routes(app):
             description: Erro ao buscar livro
         """
         try:
-            df = load_books_df()
-            if book_id < 0 or book_id >= len(df):
-                logger.exception("Livro não encontrado")
-                return jsonify({"error": "Livro não encontrado"}), 404
-            return jsonify(df.iloc[book_id].to_dict()), 200
+            snapshot = current_snapshot()
+            with span("query"):
+                index = book_ids(snapshot)
+                row = index.row_of(book_id)
+                if row < 0:
+                    logger.info(f"Livro não encontrado: {book_id}")
+                    return jsonify({"error": "Livro não encontrado"}), 404
+                book = {"id": index.id_of(row), **snapshot.df.iloc[row].to_dict()}
+            with span("serialize"):
+                return jsonify(book), 200
         except FileNotFoundError as e:
             return jsonify({"error": str(e)}), 500
         except Exception:
             logger.exception("Erro ao buscar livro por ID")
             return jsonify({"error": "Falha ao buscar livro"}), 500
 
-    @app.route("/api/v1/scrape-book/<int:book_id>", methods=["GET"])
+    @app.route("/api/v1/books/<book_id>/similar", methods=["GET"])
     @token_required
-    def get_book_sc(book_id: int):
+    @conditional_on_catalog
+    def similar_books(book_id: str):
         """
-        Enriquece dados do livro com scraping (descrição e reviews)
+        Livros semelhantes (título, categoria, preço e rating), do mais ao menos semelhante
         ---
         tags:
           - Books
@@ -363,10 +676,91 @@ def register_routes(app):
         parameters:
           - name: book_id
             in: path
+            type: string
+            required: true
+            description: Id estável do livro (slug do detail_url) ou o id numérico antigo
+            example: a-light-in-the-attic_1000
+          - name: limit
+            in: query
             type: integer
+            required: false
+            description: Quantidade de livros (padrão 10, máximo SIMILAR_TOP_K)
+          - name: fields
+            in: query
+            type: string
+            required: false
+            description: Colunas a retornar, separadas por vírgula
+        responses:
+          200:
+            description: '{"id", "similar": [{"id", "score", ...campos do livro}]}; score é o cosseno entre os vetores'
+          304:
+            description: Conteúdo inalterado (If-None-Match / If-Modified-Since)
+          400:
+            description: Parâmetros inválidos
+          404:
+            description: Livro não encontrado
+          401:
+            description: Token ausente ou inválido
+          500:
+            description: Erro ao buscar livros semelhantes
+        """
+        try:
+            snapshot = current_snapshot()
+            max_k = current_app.config.get("SIMILAR_TOP_K", 20)
+            try:
+                limit = int(request.args.get("limit", min(10, max_k)))
+            except ValueError:
+                raise InvalidParameter("Parâmetro 'limit' deve ser inteiro")
+            if not 1 <= limit <= max_k:
+                raise InvalidParameter(f"Parâmetro 'limit' deve estar entre 1 e {max_k}")
+            fields = parse_fields(request.args, snapshot.df.columns)
+            with span("query"):
+                index = book_ids(snapshot)
+                row = index.row_of(book_id)
+                if row < 0:
+                    logger.info(f"Livro não encontrado: {book_id}")
+                    return jsonify({"error": "Livro não encontrado"}), 404
+                similar = similarity_index(
+                    snapshot,
+                    k=max_k,
+                    max_terms=current_app.config.get("SIMILAR_MAX_TERMS", 1024),
+                    precompute_max_rows=current_app.config.get("SIMILAR_PRECOMPUTE_MAX_ROWS", 20000),
+                )
+                rows, scores = similar.similar(row, limit)
+                part = snapshot.df.iloc[rows]
+                if fields:
+                    part = part[list(fields)]
+            with span("serialize"):
+                books = [
+                    {"id": index.id_of(neighbor), "score": round(score, 6), **record}
+                    for neighbor, score, record in zip(rows.tolist(), scores.tolist(), part.to_dict(orient="records"))
+                ]
+                return jsonify({"id": index.id_of(row), "similar": books}), 200
+        except InvalidParameter as e:
+            return jsonify({"error": str(e)}), 400
+        except FileNotFoundError as e:
+            return jsonify({"error": str(e)}), 500
+        except Exception:
+            logger.exception("Erro ao buscar livros semelhantes")
+            return jsonify({"error": "Falha ao buscar livros semelhantes"}), 500
+
+    @app.route("/api/v1/scrape-book/<book_id>", methods=["GET"])
+    @token_required
+    def get_book_sc(book_id: str):
+        """
+        Enriquece dados do livro com scraping (descrição e reviews)
+        ---
+        tags:
+          - Books
+        security:
+          - Bearer: []
+        parameters:
+          - name: book_id
+            in: path
+            type: string
             required: true
-            description: ID do livro para enriquecer dados
-            example: 0
+            description: Id estável do livro (slug do detail_url) ou o id numérico antigo
+            example: a-light-in-the-attic_1000
         responses:
           200:
             description: Livro com dados enriquecidos
@@ -380,14 +774,16 @@ def register_routes(app):
             description: Erro ao fazer scraping
         """
         try:
-            df = load_books_df()
-            if book_id < 0 or book_id >= len(df):
+            snapshot = current_snapshot()
+            index = book_ids(snapshot)
+            row = index.row_of(book_id)
+            if row < 0:
                 return jsonify({"error": "Livro não encontrado"}), 404
-            book = df.iloc[book_id].to_dict()
+            book = {"id": index.id_of(row), **snapshot.df.iloc[row].to_dict()}
             detail_url = book.get("detail_url")
             if not detail_url:
                 return jsonify({"error": "URL de detalhes ausente"}), 500
-            scraped = scrape_book_details(detail_url)
+            scraped = get_enrichment_engine(current_app).get(detail_url)
             book.update(scraped)
             return jsonify(book), 200
         except FileNotFoundError as e:
@@ -396,9 +792,76 @@ def register_routes(app):
             logger.exception("Erro ao buscar livro por ID")
             return jsonify({"error": "Falha ao buscar livro"}), 500
 
+    @app.route("/api/v1/scrape-books", methods=["POST"])
+    @token_required
+    def scrape_books_batch():
+        """
+        Enriquece vários livros em paralelo (resultado em NDJSON, na ordem de conclusão)
+        ---
+        tags:
+          - Books
+        security:
+          - Bearer: []
+        consumes:
+          - application/json
+        produces:
+          - application/x-ndjson
+        parameters:
+          - in: body
+            name: body
+            required: true
+            schema:
+              type: object
+              required:
+                - ids
+              properties:
+                ids:
+                  type: array
+                  items:
+                    type: string
+                  description: Ids estáveis (slug) ou numéricos antigos
+                  example: ["a-light-in-the-attic_1000", "tipping-the-velvet_999"]
+        responses:
+          200:
+            description: Uma linha JSON por livro ({"id", "status", "book"} ou {"id", "status", "error"})
+          400:
+            description: Lista de ids ausente ou inválida
+          401:
+            description: Token ausente ou inválido
+          500:
+            description: Erro ao carregar dados
+        """
+        try:
+            data = request.get_json(silent=True) or {}
+            ids = parse_batch_ids(data, current_app.config.get("ENRICHMENT_BATCH_MAX_IDS", 500))
+            books, failed = resolve_batch(current_snapshot(), ids)
+
+            engine = get_enrichment_engine(current_app)
+            json_dumps = current_app.json.dumps
+
+            def dumps(obj):
+                return json_dumps(obj, separators=(",", ":"))
+
+            def generate():
+                for item in failed:
+                    yield dumps(item) + "\n"
+                results = engine.get_many((book_id, book["detail_url"]) for book_id, book in books.items())
+                for book_id, scraped, error in results:
+                    yield dumps(batch_line(book_id, books[book_id], scraped, error)) + "\n"
+
+            return Response(generate(), mimetype="application/x-ndjson")
+        except InvalidParameter as e:
+            return jsonify({"error": str(e)}), 400
+        except FileNotFoundError as e:
+            return jsonify({"error": str(e)}), 500
+        except Exception:
+            logger.exception("Erro no enriquecimento em lote")
+            return jsonify({"error": "Falha ao enriquecer livros"}), 500
+
     # ----- Stats -----
     @app.route("/api/v1/stats/overview", methods=["GET"])
     @token_required
+    @conditional_on_catalog
     def stats_overview():
         """
         Estatísticas gerais dos livros
@@ -422,23 +885,22 @@ def register_routes(app):
                 rating_distribution:
                   type: object
                   example: {"1": 50, "2": 100, "3": 200, "4": 350, "5": 300}
+                price_percentiles:
+                  type: object
+                  description: Percentis aproximados de preço (erro relativo de 1%)
+                  example: {"p25": 22.1, "p50": 35.9, "p75": 47.5, "p90": 54.2}
+          304:
+            description: Conteúdo inalterado (If-None-Match / If-Modified-Since)
           401:
             description: Token ausente ou inválido
           500:
             description: Erro ao calcular estatísticas
         """
         try:
-            df = load_books_df()
-            total_books = len(df)
-            average_price = round(df["price"].mean(skipna=True), 2)
-            rating_distribution = (
-                df["rating"].value_counts(dropna=True).sort_index().astype(int).to_dict()
-            )
-            return jsonify({
-                "total_books": total_books,
-                "average_price": average_price,
-                "rating_distribution": rating_distribution
-            }), 200
+            snapshot = current_snapshot()
+            with span("query"):
+                catalog_aggregates(snapshot)
+            return send_prepared(catalog_body(snapshot, "stats_overview"))
         except FileNotFoundError as e:
             return jsonify({"error": str(e)}), 500
         except Exception:
@@ -447,6 +909,7 @@ def register_routes(app):
 
     @app.route("/api/v1/stats/categories", methods=["GET"])
     @token_required
+    @conditional_on_catalog
     def stats_by_category():
         """
         Estatísticas agrupadas por categoria
@@ -473,22 +936,18 @@ def register_routes(app):
                     type: number
                   max_price:
                     type: number
+          304:
+            description: Conteúdo inalterado (If-None-Match / If-Modified-Since)
           401:
             description: Token ausente ou inválido
           500:
             description: Erro ao calcular estatísticas
         """
         try:
-            df = load_books_df()
-            stats = (
-                df.groupby("category", dropna=True)["price"]
-                  .agg(total_books="count", avg_price="mean", min_price="min", max_price="max")
-                  .reset_index()
-            )
-            stats["avg_price"] = stats["avg_price"].round(2)
-            stats["min_price"] = stats["min_price"].round(2)
-            stats["max_price"] = stats["max_price"].round(2)
-            return jsonify(stats.to_dict(orient="records")), 200
+            snapshot = current_snapshot()
+            with span("query"):
+                catalog_aggregates(snapshot)
+            return send_prepared(catalog_body(snapshot, "stats_categories"))
         except FileNotFoundError as e:
             return jsonify({"error": str(e)}), 500
         except Exception:
@@ -497,6 +956,7 @@ def register_routes(app):
 
     @app.route("/api/v1/books/top-rated", methods=["GET"])
     @token_required
+    @conditional_on_catalog
     def top_rated_books():
         """
         Lista livros com melhor avaliação
@@ -505,6 +965,24 @@ def register_routes(app):
           - Books
         security:
           - Bearer: []
+        parameters:
+          - name: limit
+            in: query
+            type: integer
+            required: false
+            description: Quantidade máxima de livros por página
+            example: 50
+          - name: cursor
+            in: query
+            type: string
+            required: false
+            description: Cursor da próxima página (header X-Next-Cursor da resposta anterior)
+          - name: fields
+            in: query
+            type: string
+            required: false
+            description: Campos a retornar, separados por vírgula
+            example: title,price
         responses:
           200:
             description: Livros com melhor rating
@@ -512,16 +990,29 @@ def register_routes(app):
               type: array
               items:
                 type: object
+          304:
+            description: Conteúdo inalterado (If-None-Match corresponde ao ETag)
+          400:
+            description: Parâmetros de paginação inválidos
           401:
             description: Token ausente ou inválido
+          410:
+            description: Cursor de uma versão anterior do catálogo cujo livro foi removido (recomece a paginação)
           500:
             description: Erro ao buscar livros
         """
         try:
-            df = load_books_df()
-            max_rating = df["rating"].max()
-            top_books = df[df["rating"] == max_rating]
-            return jsonify(top_books.to_dict(orient="records")), 200
+            snapshot = current_snapshot()
+            page = parse_page_args(request.args, snapshot.df.columns)
+            if page.is_default:
+                return send_prepared(catalog_body(snapshot, "top_rated"))
+            with span("query"):
+                rows = top_rated_rows(snapshot)
+            return send_rows(snapshot, rows, page)
+        except InvalidParameter as e:
+            return jsonify({"error": str(e)}), 400
+        except CursorExpired as e:
+            return jsonify({"error": str(e)}), 410
         except FileNotFoundError as e:
             return jsonify({"error": str(e)}), 500
         except Exception:
@@ -530,6 +1021,7 @@ def register_routes(app):
 
     @app.route("/api/v1/books/price-range", methods=["GET"])
     @token_required
+    @conditional_on_catalog
     def books_by_price_range():
         """
         Filtra livros por faixa de preço
@@ -551,6 +1043,35 @@ def register_routes(app):
             required: true
             description: Preço máximo
             example: 50.00
+          - name: category
+            in: query
+            type: string
+            required: false
+            description: Categoria exata (ignora maiúsculas e acentos)
+            example: Poetry
+          - name: rating
+            in: query
+            type: integer
+            required: false
+            description: Rating exato (1-5)
+            example: 5
+          - name: limit
+            in: query
+            type: integer
+            required: false
+            description: Quantidade máxima de livros por página
+            example: 50
+          - name: cursor
+            in: query
+            type: string
+            required: false
+            description: Cursor da próxima página (header X-Next-Cursor da resposta anterior)
+          - name: fields
+            in: query
+            type: string
+            required: false
+            description: Campos a retornar, separados por vírgula
+            example: title,price
         responses:
           200:
             description: Livros na faixa de preço especificada
@@ -558,27 +1079,374 @@ def register_routes(app):
               type: array
               items:
                 type: object
+          304:
+            description: Conteúdo inalterado (If-None-Match / If-Modified-Since)
           400:
-            description: Parâmetros obrigatórios ausentes
+            description: Parâmetros obrigatórios ausentes ou inválidos
           401:
             description: Token ausente ou inválido
+          410:
+            description: Cursor de uma versão anterior do catálogo cujo livro foi removido (recomece a paginação)
           500:
             description: Erro ao filtrar livros
         """
         try:
-            df = load_books_df()
+            snapshot = current_snapshot()
             min_price = request.args.get("min", type=float)
             max_price = request.args.get("max", type=float)
             if min_price is None or max_price is None:
                 return jsonify({"error": "Parâmetros 'min' e 'max' são obrigatórios"}), 400
-            filtered = df[(df["price"] >= min_price) & (df["price"] <= max_price)]
-            return jsonify(filtered.to_dict(orient="records")), 200
+            category = request.args.get("category", "").strip()
+            rating = request.args.get("rating", type=int)
+            if rating is None and request.args.get("rating"):
+                return jsonify({"error": "Parâmetro 'rating' deve ser inteiro"}), 400
+            page = parse_page_args(request.args, snapshot.df.columns)
+            with span("query"):
+                rows = price_index(snapshot).query(min_price, max_price, category=category, rating=rating)
+            return send_rows(snapshot, rows, page)
+        except InvalidParameter as e:
+            return jsonify({"error": str(e)}), 400
+        except CursorExpired as e:
+            return jsonify({"error": str(e)}), 410
         except FileNotFoundError as e:
             return jsonify({"error": str(e)}), 500
         except Exception:
             logger.exception("Erro ao filtrar livros por faixa de preço")
             return jsonify({"error": "Falha ao filtrar livros"}), 500
 
+    # ----- Export -----
+    @app.route("/api/v1/export", methods=["GET"])
+    @token_required
+    @conditional_on_catalog(vary=("Accept",))
+    def export_books():
+        """
+        Exporta o catálogo em NDJSON, Arrow IPC (stream) ou Parquet
+        ---
+        tags:
+          - Export
+        security:
+          - Bearer: []
+        produces:
+          - application/x-ndjson
+          - application/vnd.apache.arrow.stream
+          - application/vnd.apache.parquet
+        parameters:
+          - name: format
+            in: query
+            type: string
+            enum: [ndjson, arrow, parquet]
+            required: false
+            description: Formato de saída (alternativa ao header Accept; padrão ndjson)
+          - name: title
+            in: query
+            type: string
+            required: false
+            description: Filtro por título (como em /books/search)
+          - name: category
+            in: query
+            type: string
+            required: false
+            description: Filtro por categoria (como em /books/search)
+          - name: min
+            in: query
+            type: number
+            required: false
+            description: Preço mínimo
+          - name: max
+            in: query
+            type: number
+            required: false
+            description: Preço máximo
+          - name: rating
+            in: query
+            type: integer
+            required: false
+            description: Rating exato
+          - name: fields
+            in: query
+            type: string
+            required: false
+            description: Campos a exportar, separados por vírgula
+        responses:
+          200:
+            description: Arquivo exportado
+          304:
+            description: Conteúdo inalterado (If-None-Match / If-Modified-Since)
+          400:
+            description: Parâmetros inválidos
+          401:
+            description: Token ausente ou inválido
+          406:
+            description: Formato não suportado
+          500:
+            description: Erro ao exportar dados
+        """
+        try:
+            fmt = negotiate_format(request.args.get("format"), request.accept_mimetypes)
+            if fmt is None:
+                return jsonify({"error": "Formato não suportado. Use: ndjson, arrow ou parquet"}), 406
+            snapshot = current_snapshot()
+            fields = parse_fields(request.args, snapshot.df.columns)
+            with span("query"):
+                rows = select_rows(snapshot, request.args)
+            return export_response(snapshot, rows, fmt, fields=fields)
+        except InvalidParameter as e:
+            return jsonify({"error": str(e)}), 400
+        except ExportUnavailable as e:
+            return jsonify({"error": str(e)}), 406
+        except FileNotFoundError as e:
+            return jsonify({"error": str(e)}), 500
+        except Exception:
+            logger.exception("Erro ao exportar livros")
+            return jsonify({"error": "Falha ao exportar livros"}), 500
+
+    # ----- ML -----
+    @app.route("/api/v1/ml/features", methods=["GET"])
+    @token_required
+    @conditional_on_catalog
+    def ml_features():
+        """
+        Matriz de features numéricas do catálogo (uma linha por livro, na ordem do catálogo)
+        ---
+        tags:
+          - ML
+        security:
+          - Bearer: []
+        produces:
+          - application/x-npy
+          - application/x-npz
+          - application/vnd.apache.arrow.stream
+        parameters:
+          - name: format
+            in: query
+            type: string
+            enum: [npy, npz, arrow]
+            required: false
+            description: npy (denso, float32), npz (esparso COO, scipy.sparse.load_npz) ou arrow (IPC stream)
+          - name: encoding
+            in: query
+            type: string
+            enum: [onehot, ordinal]
+            required: false
+            description: Codificação da categoria (padrão onehot)
+        responses:
+          200:
+            description: Matriz de features; o schema (colunas, offsets e parâmetros) vem no header X-Feature-Schema
+          304:
+            description: Conteúdo inalterado (If-None-Match / If-Modified-Since)
+          400:
+            description: Parâmetros inválidos
+          401:
+            description: Token ausente ou inválido
+          406:
+            description: Formato indisponível (ex.: pyarrow ausente)
+          500:
+            description: Erro ao gerar as features
+        """
+        try:
+            fmt, encoding = parse_feature_args(request.args)
+            snapshot = current_snapshot()
+            with span("query"):
+                body, features = feature_body(
+                    snapshot, fmt, encoding, current_app.config.get("ML_HASH_FEATURES", 32)
+                )
+            resp = send_prepared(body)
+            resp.headers["X-Feature-Schema"] = json.dumps(features.schema, separators=(",", ":"))
+            resp.headers["Content-Disposition"] = f"attachment; filename=features.{FEATURE_FORMATS[fmt][1]}"
+            return resp
+        except InvalidParameter as e:
+            return jsonify({"error": str(e)}), 400
+        except ExportUnavailable as e:
+            return jsonify({"error": str(e)}), 406
+        except FileNotFoundError as e:
+            return jsonify({"error": str(e)}), 500
+        except Exception:
+            logger.exception("Erro ao gerar features de ML")
+            return jsonify({"error": "Falha ao gerar features"}), 500
+
+    @app.route("/api/v1/ml/predict", methods=["POST"])
+    @token_required
+    def ml_predict():
+        """
+        Predições do modelo configurado (ML_MODEL_PATH), em micro-lotes com as requisições simultâneas
+        ---
+        tags:
+          - ML
+        security:
+          - Bearer: []
+        consumes:
+          - application/json
+        parameters:
+          - in: body
+            name: body
+            required: true
+            schema:
+              type: object
+              properties:
+                ids:
+                  type: array
+                  items:
+                    type: string
+                  description: Ids de livros; as features são as de /api/v1/ml/features
+                  example: ["a-light-in-the-attic_1000", "tipping-the-velvet_999"]
+                instances:
+                  type: array
+                  items:
+                    type: array
+                    items:
+                      type: number
+                  description: Vetores de features prontos (alternativa a ids)
+        responses:
+          200:
+            description: Predições na ordem pedida ({"model", "predictions", "batch_rows"} e, com ids, "not_found")
+          400:
+            description: Corpo inválido ou vetores com número de features diferente do modelo
+          401:
+            description: Token ausente ou inválido
+          409:
+            description: Features do modelo não casam com as do catálogo atual (treinar de novo)
+          500:
+            description: Modelo indisponível ou erro ao avaliar
+          503:
+            description: Predição não concluída em ML_PREDICT_TIMEOUT_SECONDS
+        """
+        try:
+            data = request.get_json(silent=True)
+            kind, payload = parse_predict_request(data, current_app.config.get("ML_PREDICT_MAX_ROWS", 1000))
+            batcher = get_batcher(current_app)
+            not_found = None
+            with span("query"):
+                if kind == "ids":
+                    snapshot = current_snapshot()
+                    artifact = batcher.store.current()
+                    index = book_ids(snapshot)
+                    rows = index.resolve(payload)
+                    found = rows >= 0
+                    not_found = [key for key, ok in zip(payload, found.tolist()) if not ok]
+                    rows = rows[found]
+                    features = catalog_features(
+                        artifact, feature_set(snapshot, artifact.encoding, artifact.hash_features), rows
+                    )
+                else:
+                    features = payload
+                result = batcher.predict(features) if len(features) else None
+            with span("serialize"):
+                values = result.values.tolist() if result is not None else []
+                if kind == "ids":
+                    predictions = [
+                        {"id": index.id_of(row), "prediction": value} for row, value in zip(rows.tolist(), values)
+                    ]
+                else:
+                    predictions = values
+                body = {
+                    "model": result.artifact.hash if result is not None else artifact.hash,
+                    "predictions": predictions,
+                    "batch_rows": result.batch_rows if result is not None else 0,
+                }
+                if not_found is not None:
+                    body["not_found"] = not_found
+                return jsonify(body), 200
+        except InvalidParameter as e:
+            return jsonify({"error": str(e)}), 400
+        except FeatureMismatch as e:
+            return jsonify({"error": str(e)}), 409
+        except PredictionTimeout as e:
+            return jsonify({"error": str(e)}), 503
+        except FileNotFoundError as e:
+            return jsonify({"error": str(e)}), 500
+        except Exception:
+            logger.exception("Erro ao gerar predições")
+            return jsonify({"error": "Falha ao gerar predições"}), 500
+
+    # ----- Profiling -----
+    def _profile_store_or_error():
+        """(store, None) ou (None, resposta de erro) conforme config e usuário."""
+        store = get_profile_store(current_app)
+        if store is None:
+            return None, (jsonify({"error": "Profiling desativado (PROFILING_ENABLED)"}), 404)
+        if not is_profiling_admin(current_app, getattr(request, "user", None)):
+            return None, (jsonify({"error": "Acesso restrito a administradores"}), 403)
+        return store, None
+
+    @app.route("/api/v1/profiles", methods=["GET"])
+    @token_required
+    def list_profiles():
+        """
+        Lista os perfis guardados (os mais lentos primeiro)
+        ---
+        tags:
+          - Profiling
+        security:
+          - Bearer: []
+        responses:
+          200:
+            description: Resumo dos perfis (id, rota, duração, número de pilhas)
+          401:
+            description: Token ausente ou inválido
+          403:
+            description: Usuário não está em PROFILING_ADMINS
+          404:
+            description: Profiling desativado
+        """
+        store, error = _profile_store_or_error()
+        if error:
+            return error
+        return jsonify({"profiles": [p.summary() for p in store.list()]}), 200
+
+    @app.route("/api/v1/profiles/<profile_id>", methods=["GET"])
+    @token_required
+    def download_profile(profile_id):
+        """
+        Baixa um perfil em speedscope (JSON) ou pstats
+        ---
+        tags:
+          - Profiling
+        security:
+          - Bearer: []
+        produces:
+          - application/json
+          - application/octet-stream
+        parameters:
+          - name: profile_id
+            in: path
+            type: string
+            required: true
+          - name: format
+            in: query
+            type: string
+            enum: [speedscope, pstats]
+            required: false
+            description: Formato do arquivo (padrão speedscope)
+        responses:
+          200:
+            description: Arquivo do perfil
+          400:
+            description: Formato inválido
+          401:
+            description: Token ausente ou inválido
+          403:
+            description: Usuário não está em PROFILING_ADMINS
+          404:
+            description: Profiling desativado ou perfil não encontrado
+        """
+        store, error = _profile_store_or_error()
+        if error:
+            return error
+        profile = store.get(profile_id)
+        if profile is None:
+            return jsonify({"error": "Perfil não encontrado"}), 404
+        fmt = request.args.get("format", "speedscope")
+        if fmt == "speedscope":
+            response = jsonify(profile.to_speedscope())
+            filename = f"profile-{profile.id}.speedscope.json"
+        elif fmt == "pstats":
+            response = Response(profile.to_pstats(), mimetype="application/octet-stream")
+            filename = f"profile-{profile.id}.prof"
+        else:
+            return jsonify({"error": "Formato inválido. Use: speedscope ou pstats"}), 400
+        response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
 
 # Executar como módulo: python -m src.main
 if __name__ == "__main__":
@@ -0,0 +1,246 @@
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import request
+
+# Buckets de latência (s) e de tamanho de resposta (bytes)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = tuple(256 * 4 ** i for i in range(10))  # 256 B .. 64 MiB
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Requisição em andamento na thread (inclusive durante o streaming do corpo)
+_current = contextvars.ContextVar("metrics_request", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount=1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labels, k)} {_number(v)}" for k, v in items]
+        return lines
+
+
+class Histogram:
+    """Histograma com buckets fixos (cumulativos só na exportação)."""
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(c), s)) for k, (c, s) in self._series.items())
+        for key, (counts, total) in items:
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                running += count
+                le = 'le="+Inf"' if bound == "+Inf" else f'le="{_number(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {running}")
+        return lines
+
+
+class RequestMetrics:
+    """Estado de uma requisição: rota, status, bytes e tempo por fase."""
+    __slots__ = ("started", "route", "method", "status", "size", "phases")
+
+    def __init__(self, method: str):
+        self.started = time.perf_counter()
+        self.route = UNMATCHED_ROUTE
+        self.method = method
+        self.status = "500"
+        self.size = 0
+        self.phases = {}
+
+
+class MetricsRegistry:
+    """Métricas HTTP do processo (por rota, método e status)."""
+
+    def __init__(self):
+        self.requests = Counter(
+            "http_requests_total", "Requisições atendidas", ("route", "method", "status")
+        )
+        self.duration = Histogram(
+            "http_request_duration_seconds", "Latência das requisições (até o fim do corpo)",
+            ("route", "method"), LATENCY_BUCKETS,
+        )
+        self.response_size = Histogram(
+            "http_response_size_bytes", "Tamanho do corpo das respostas", ("route", "method"), SIZE_BUCKETS,
+        )
+        self.phases = Histogram(
+            "http_request_phase_seconds", "Tempo por fase da requisição (load, auth, query, serialize)",
+            ("route", "phase"), LATENCY_BUCKETS,
+        )
+
+    def record(self, req: RequestMetrics) -> None:
+        elapsed = time.perf_counter() - req.started
+        self.requests.inc((req.route, req.method, req.status))
+        self.duration.observe((req.route, req.method), elapsed)
+        self.response_size.observe((req.route, req.method), req.size)
+        for phase, seconds in req.phases.items():
+            self.phases.observe((req.route, phase), seconds)
+
+    def render(self) -> list:
+        lines = []
+        for metric in (self.requests, self.duration, self.response_size, self.phases):
+            lines += metric.render()
+        return lines
+
+
+@contextmanager
+def tracking(req: RequestMetrics):
+    """Torna `req` a requisição atual durante o bloco (para `span` fora do middleware WSGI)."""
+    token = _current.set(req)
+    try:
+        yield req
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(phase: str):
+    """Soma o tempo do bloco na fase `phase` da requisição atual (no-op fora de requisição)."""
+    req = _current.get()
+    if req is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        req.phases[phase] = req.phases.get(phase, 0.0) + time.perf_counter() - started
+
+
+class _MeteredBody:
+    """Repassa o corpo contando bytes; registra as métricas ao fim do corpo ou no `close()`."""
+
+    def __init__(self, body, req: RequestMetrics, registry: MetricsRegistry):
+        self.body = body
+        self.req = req
+        self.registry = registry
+        self._recorded = False
+
+    def _record(self) -> None:
+        if not self._recorded:
+            self._recorded = True
+            self.registry.record(self.req)
+
+    def __iter__(self):
+        iterator = iter(self.body)
+        while True:
+            # Geradores de streaming rodam aqui, fora do contexto do Flask
+            _current.set(self.req)
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                self._record()
+                return
+            finally:
+                _current.set(None)
+            self.req.size += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        try:
+            close = getattr(self.body, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._record()
+
+
+class MetricsMiddleware:
+    """Middleware WSGI que mede cada requisição do início ao fim do corpo."""
+
+    def __init__(self, wsgi_app, registry: MetricsRegistry):
+        self.wsgi_app = wsgi_app
+        self.registry = registry
+
+    def __call__(self, environ, start_response):
+        req = RequestMetrics(environ.get("REQUEST_METHOD", "GET"))
+        environ["metrics.request"] = req
+
+        def _start_response(status, headers, exc_info=None):
+            req.status = status.split(" ", 1)[0]
+            return start_response(status, headers, exc_info)
+
+        _current.set(req)
+        try:
+            body = self.wsgi_app(environ, _start_response)
+        except BaseException:
+            self.registry.record(req)
+            raise
+        finally:
+            _current.set(None)
+        return _MeteredBody(body, req, self.registry)
+
+
+def _set_route() -> None:
+    req = request.environ.get("metrics.request")
+    if req is not None and request.url_rule is not None:
+        req.route = request.url_rule.rule
+
+
+def init_metrics(app) -> MetricsRegistry:
+    """Instala o middleware de métricas no app e guarda o registro em `app.extensions`."""
+    registry = MetricsRegistry()
+    app.extensions["metrics"] = registry
+    app.wsgi_app = MetricsMiddleware(app.wsgi_app, registry)
+    app.before_request(_set_route)
+    return registry
+
+
+def render_metrics(app) -> str:
+    """Exposição no formato texto do Prometheus (métricas HTTP + estado do catálogo)."""
+    lines = app.extensions["metrics"].render()
+    store = app.extensions.get("catalog")
+    snapshot = store.peek() if store is not None else None
+    if snapshot is not None:
+        for name, help, value in (
+            ("catalog_records", "Livros no snapshot atual", len(snapshot)),
+            ("catalog_version", "Versão do snapshot atual", snapshot.version),
+            ("catalog_load_seconds", "Tempo de carga do snapshot atual", round(snapshot.load_seconds, 6)),
+        ):
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {_number(value)}"]
+    return "\n".join(lines) + "\n"
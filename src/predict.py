@@ -0,0 +1,433 @@
+"""
+Predições em lote (/api/v1/ml/predict).
+
+O artefato do modelo (`ML_MODEL_PATH`) é carregado uma vez por worker e
+guardado pelo hash do conteúdo; o arquivo só é relido quando mtime/tamanho
+mudam. Formatos aceitos:
+
+    .npz                    modelo linear NumPy: `coef` (n_features ou
+                            n_features x n_saídas), `intercept` e, opcionais,
+                            `link` ("identity" ou "sigmoid"), `encoding`,
+                            `hash_features` (parâmetros de /ml/features),
+                            `columns` (nomes das colunas do treino) e
+                            `categories` (valores da codificação ordinal)
+    .pkl/.pickle/.joblib    estimador compatível com scikit-learn (`predict`),
+                            via pickle: use apenas artefatos confiáveis; as
+                            colunas vêm de `feature_names_in_`, se houver
+
+Com `columns`, as features dos livros (`ids`) são alinhadas às do treino: o
+número e a ordem das colunas one-hot mudam com as categorias do catálogo.
+
+Requisições simultâneas entram numa fila e são agrupadas em micro-lotes (até
+`ML_BATCH_MAX_SIZE` linhas, esperando no máximo `ML_BATCH_MAX_WAIT_MS` pelo
+lote encher), avaliados com uma única chamada vetorizada ao modelo.
+
+    python -m src.predict dummy [--csv data/dados-books.csv] [--output models/model.npz]
+"""
+import io
+import os
+import sys
+import time
+import queue
+import pickle
+import hashlib
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .features import FeatureMismatch, FeatureSet, build_features
+from .responses import InvalidParameter
+
+logger = logging.getLogger("app")
+
+PICKLE_SUFFIXES = (".pkl", ".pickle", ".joblib")
+LINKS = ("identity", "sigmoid")
+
+
+class PredictionTimeout(RuntimeError):
+    """O lote da requisição não foi avaliado dentro do prazo."""
+
+
+class LinearModel:
+    """Modelo linear (ou logístico, com link sigmoid) sobre a matriz de features."""
+
+    def __init__(self, coef: np.ndarray, intercept, link: str = "identity"):
+        if link not in LINKS:
+            raise ValueError(f"link inválido: {link}")
+        self.coef = np.asarray(coef, dtype=np.float32)
+        self.intercept = np.asarray(intercept, dtype=np.float32)
+        self.link = link
+        self.n_features_in_ = self.coef.shape[0]
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        y = X @ self.coef + self.intercept
+        if self.link == "sigmoid":
+            y = 1.0 / (1.0 + np.exp(-y))
+        return y
+
+
+@dataclass(frozen=True)
+class ModelArtifact:
+    """Modelo carregado + metadados (o hash identifica o conteúdo do arquivo)."""
+    hash: str
+    path: str
+    model: object
+    n_features: int
+    encoding: str
+    hash_features: int
+    # Layout das features do treino (None: modelo sem metadados de colunas)
+    columns: tuple = None
+    categories: tuple = None
+
+
+def _strings(values) -> tuple:
+    return tuple(str(v) for v in np.asarray(values).ravel())
+
+
+def load_artifact(data: bytes, path: str, digest: str, hash_features: int = 32) -> ModelArtifact:
+    encoding = "onehot"
+    columns = categories = None
+    if path.endswith(".npz"):
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            model = LinearModel(
+                arrays["coef"],
+                arrays["intercept"] if "intercept" in arrays else 0.0,
+                str(arrays["link"]) if "link" in arrays else "identity",
+            )
+            if "encoding" in arrays:
+                encoding = str(arrays["encoding"])
+            if "hash_features" in arrays:
+                hash_features = int(arrays["hash_features"])
+            if "columns" in arrays:
+                columns = _strings(arrays["columns"])
+            if "categories" in arrays:
+                categories = _strings(arrays["categories"])
+    elif path.endswith(PICKLE_SUFFIXES):
+        model = pickle.loads(data)
+        if not callable(getattr(model, "predict", None)):
+            raise ValueError(f"{path}: o objeto não tem método predict")
+        if getattr(model, "feature_names_in_", None) is not None:
+            columns = _strings(model.feature_names_in_)
+    else:
+        raise ValueError(f"Formato de modelo não suportado: {path} (use .npz ou {', '.join(PICKLE_SUFFIXES)})")
+    n_features = getattr(model, "n_features_in_", None)
+    if columns is not None and n_features is not None and len(columns) != n_features:
+        raise ValueError(f"{path}: {len(columns)} colunas para um modelo de {n_features} features")
+    return ModelArtifact(
+        hash=digest,
+        path=path,
+        model=model,
+        n_features=int(n_features) if n_features is not None else -1,
+        encoding=encoding,
+        hash_features=hash_features,
+        columns=columns,
+        categories=categories,
+    )
+
+
+def catalog_features(artifact: ModelArtifact, features: FeatureSet, rows: np.ndarray) -> np.ndarray:
+    """
+    Features das linhas `rows` do catálogo no layout do modelo. Levanta
+    FeatureMismatch quando modelo e catálogo não podem ser casados (erro do
+    servidor, não da requisição).
+    """
+    if artifact.columns is not None:
+        return features.take_columns(rows, artifact.columns, artifact.categories)
+    if artifact.n_features >= 0 and features.shape[1] != artifact.n_features:
+        raise FeatureMismatch(
+            f"O modelo espera {artifact.n_features} features e o catálogo atual gera {features.shape[1]}; "
+            "treine o modelo de novo ou grave 'columns' no artefato"
+        )
+    return features.take(rows)
+
+
+class ModelStore:
+    """
+    Artefato atual do modelo. Cada chamada de `current()` custa um `stat`;
+    o arquivo é relido só quando muda, e o conteúdo já visto (mesmo hash)
+    reaproveita o modelo carregado.
+    """
+
+    def __init__(self, path: str, hash_features: int = 32, maxsize: int = 4):
+        self.path = path
+        self.hash_features = hash_features
+        self.maxsize = maxsize
+        self._by_hash = OrderedDict()
+        self._signature = None
+        self._artifact = None
+        self._lock = threading.Lock()
+
+    def current(self) -> ModelArtifact:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Modelo não encontrado: {self.path}") from None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if signature == self._signature:
+                return self._artifact
+            with open(self.path, "rb") as f:
+                data = f.read()
+            digest = hashlib.blake2b(data, digest_size=8).hexdigest()
+            artifact = self._by_hash.get(digest)
+            if artifact is None:
+                artifact = load_artifact(data, self.path, digest, self.hash_features)
+                logger.info(f"Modelo carregado: {self.path} ({digest}, {artifact.n_features} features)")
+            self._by_hash[digest] = artifact
+            self._by_hash.move_to_end(digest)
+            while len(self._by_hash) > self.maxsize:
+                self._by_hash.popitem(last=False)
+            self._signature, self._artifact = signature, artifact
+            return artifact
+
+
+@dataclass(frozen=True)
+class Prediction:
+    """Resultado de uma requisição: saídas do modelo para as suas linhas."""
+    values: np.ndarray
+    artifact: ModelArtifact
+    batch_rows: int
+
+
+class _Pending:
+    __slots__ = ("features", "future")
+
+    def __init__(self, features: np.ndarray):
+        self.features = features
+        self.future = Future()
+
+
+class MicroBatcher:
+    """
+    Agrupa as requisições simultâneas em micro-lotes avaliados por uma thread
+    dedicada. Um lote fecha ao atingir `max_batch` linhas ou `max_wait`
+    segundos após a primeira requisição; uma requisição maior que `max_batch`
+    forma um lote sozinha (nunca é dividida). Uma falha ao avaliar um lote
+    vira exceção nas requisições dele; a thread segue com os próximos lotes.
+    """
+
+    def __init__(self, store: ModelStore, max_batch: int = 256, max_wait: float = 0.002,
+                 timeout: float = 30.0):
+        self.store = store
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.batches = 0
+        self.rows = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            # Recria a thread se ela tiver morrido: a fila nunca fica sem consumidor
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ml-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, features: np.ndarray) -> Future:
+        """Enfileira uma matriz (linhas x features); o Future resolve para um Prediction."""
+        features = np.asarray(features, dtype=np.float32)
+        if features.ndim != 2:
+            raise InvalidParameter("As features devem ser uma matriz (linhas x features)")
+        self._ensure_thread()
+        item = _Pending(features)
+        self._queue.put(item)
+        return item.future
+
+    def predict(self, features: np.ndarray) -> Prediction:
+        future = self.submit(features)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Se o lote ainda não começou, a requisição sai da fila
+            future.cancel()
+            raise PredictionTimeout(f"Predição não concluída em {self.timeout:g}s") from None
+
+    def _collect(self, first: _Pending):
+        """(lote, próxima requisição que não coube no lote ou None)."""
+        batch, rows = [first], len(first.features)
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if rows + len(item.features) > self.max_batch:
+                return batch, item
+            batch.append(item)
+            rows += len(item.features)
+        return batch, None
+
+    def _run(self) -> None:
+        carry = None
+        while True:
+            first = carry if carry is not None else self._queue.get()
+            batch, carry = [first], None
+            try:
+                batch, carry = self._collect(first)
+                self._score(batch)
+            except Exception as e:
+                logger.exception("Falha no micro-lote de predições")
+                self._fail(batch, e)
+
+    @staticmethod
+    def _fail(batch, error: BaseException) -> None:
+        for item in batch:
+            if not item.future.done():
+                item.future.set_exception(error)
+
+    def _score(self, batch) -> None:
+        """Avalia o lote; qualquer falha vira exceção nas requisições ainda pendentes."""
+        # Requisições canceladas (timeout) saem do lote; as demais passam a "em execução"
+        batch = [item for item in batch if item.future.set_running_or_notify_cancel()]
+        try:
+            self._evaluate(batch)
+        except Exception as e:
+            logger.exception("Falha ao avaliar o modelo")
+            self._fail(batch, e)
+
+    def _evaluate(self, batch) -> None:
+        try:
+            artifact = self.store.current()
+        except Exception as e:
+            # Modelo ausente/inválido: erro das requisições, não da thread
+            self._fail(batch, e)
+            return
+        valid = []
+        for item in batch:
+            width = item.features.shape[1] if item.features.ndim == 2 else -1
+            if artifact.n_features >= 0 and width != artifact.n_features:
+                item.future.set_exception(InvalidParameter(
+                    f"O modelo espera {artifact.n_features} features por linha (recebido {width})"
+                ))
+            else:
+                valid.append(item)
+        if not valid:
+            return
+        X = valid[0].features if len(valid) == 1 else np.vstack([item.features for item in valid])
+        y = np.asarray(artifact.model.predict(X))
+        if y.ndim == 0 or len(y) != len(X):
+            raise ValueError(f"O modelo retornou saída de formato {y.shape} para {len(X)} linhas")
+        self.batches += 1
+        self.rows += len(X)
+        start = 0
+        for item in valid:
+            end = start + len(item.features)
+            item.future.set_result(Prediction(values=y[start:end], artifact=artifact, batch_rows=len(X)))
+            start = end
+
+
+def parse_predict_request(data, max_rows: int):
+    """
+    Valida o corpo de /ml/predict: `{"ids": [...]}` (livros do catálogo,
+    com as features de /ml/features) ou `{"instances": [[...], ...]}`
+    (vetores de features prontos). Retorna ("ids", lista) ou ("instances", matriz).
+    """
+    if not isinstance(data, dict) or ("ids" in data) == ("instances" in data):
+        raise InvalidParameter("Informe 'ids' (lista de ids) ou 'instances' (lista de vetores de features)")
+    if "ids" in data:
+        ids = data["ids"]
+        valid = isinstance(ids, list) and ids and all(
+            (isinstance(i, int) and not isinstance(i, bool)) or (isinstance(i, str) and i) for i in ids
+        )
+        if not valid:
+            raise InvalidParameter("Informe 'ids' como lista de ids (slug ou inteiro)")
+        if len(ids) > max_rows:
+            raise InvalidParameter(f"Máximo de {max_rows} linhas por requisição")
+        return "ids", ids
+    instances = data["instances"]
+    if not isinstance(instances, list) or not instances:
+        raise InvalidParameter("Informe 'instances' como lista de vetores de features")
+    if len(instances) > max_rows:
+        raise InvalidParameter(f"Máximo de {max_rows} linhas por requisição")
+    try:
+        matrix = np.asarray(instances, dtype=np.float32)
+    except (TypeError, ValueError):
+        raise InvalidParameter("'instances' deve conter vetores numéricos de mesmo tamanho") from None
+    if matrix.ndim != 2 or not np.isfinite(matrix).all():
+        raise InvalidParameter("'instances' deve conter vetores numéricos de mesmo tamanho")
+    return "instances", matrix
+
+
+_BATCHER_LOCK = threading.Lock()
+
+
+def get_batcher(app) -> MicroBatcher:
+    """Retorna (criando se preciso) o MicroBatcher associado ao app Flask."""
+    batcher = app.extensions.get("ml_batcher")
+    if batcher is None:
+        with _BATCHER_LOCK:
+            batcher = app.extensions.get("ml_batcher")
+            if batcher is None:
+                store = ModelStore(app.config.get("ML_MODEL_PATH", "./models/model.npz"),
+                                   hash_features=app.config.get("ML_HASH_FEATURES", 32))
+                batcher = MicroBatcher(
+                    store,
+                    max_batch=app.config.get("ML_BATCH_MAX_SIZE", 256),
+                    max_wait=app.config.get("ML_BATCH_MAX_WAIT_MS", 2) / 1000,
+                    timeout=app.config.get("ML_PREDICT_TIMEOUT_SECONDS", 30.0),
+                )
+                app.extensions["ml_batcher"] = batcher
+    return batcher
+
+
+def train_dummy(df: pd.DataFrame, hash_features: int = 32, alpha: float = 1.0) -> dict:
+    """
+    Modelo linear de exemplo: regressão ridge do rating sobre as features de
+    /ml/features (sem as colunas do próprio rating). Retorna os arrays do .npz.
+    """
+    features = build_features(df, "onehot", hash_features)
+    X = features.dense().astype(np.float64)
+    y = df["rating"].to_numpy(dtype=float, na_value=np.nan)
+    leak = [g for g in features.schema["features"] if g["name"] in ("rating", "rating_missing")]
+    for group in leak:
+        X[:, group["offset"]:group["offset"] + group["size"]] = 0.0
+    known = ~np.isnan(y)
+    X, y = X[known], y[known]
+    intercept = float(y.mean()) if len(y) else 0.0
+    gram = X.T @ X + alpha * np.eye(X.shape[1])
+    coef = np.linalg.solve(gram, X.T @ (y - intercept))
+    return {
+        "coef": coef.astype(np.float32),
+        "intercept": np.array(intercept, dtype=np.float32),
+        "link": np.array("identity"),
+        "encoding": np.array("onehot"),
+        "hash_features": np.array(hash_features),
+        "columns": np.array(features.columns),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.predict", description="Ferramentas de modelos de ML")
+    commands = parser.add_subparsers(dest="command", required=True)
+    dummy_cmd = commands.add_parser("dummy", help="Treina um modelo linear de exemplo (rating) e grava o .npz")
+    dummy_cmd.add_argument("--csv", default=None, help="CSV do catálogo (padrão: BOOKS_CSV_PATH)")
+    dummy_cmd.add_argument("--output", default=None, help="Arquivo de saída (padrão: ML_MODEL_PATH)")
+    args = parser.parse_args(argv)
+
+    from .config import Config
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    output = args.output or Config.ML_MODEL_PATH
+    started = time.perf_counter()
+    arrays = train_dummy(pd.read_csv(args.csv or Config.BOOKS_CSV_PATH), Config.ML_HASH_FEATURES)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "wb") as f:
+        np.savez(f, **arrays)
+    logger.info(
+        f"Modelo gravado em {output}: {arrays['coef'].shape[0]} features, "
+        f"{time.perf_counter() - started:.2f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
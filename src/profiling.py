@@ -0,0 +1,338 @@
+"""
+Profiling sob demanda de requisições (opt-in).
+
+Ativado por `PROFILING_ENABLED`. Com o modo ativo, uma requisição é perfilada
+quando traz o header `PROFILING_HEADER` com um token JWT de um usuário de
+`PROFILING_ADMINS`, ou quando cai na amostragem aleatória
+(`PROFILING_SAMPLE_RATE`, fração de todas as requisições).
+
+O profiler é por amostragem de pilha: uma thread auxiliar lê a pilha da
+thread da requisição a cada `PROFILING_INTERVAL` segundos (sem instrumentar
+chamadas). Os `PROFILING_MAX_PROFILES` perfis mais lentos ficam em memória e
+podem ser baixados como pstats ou speedscope.
+"""
+import sys
+import time
+import uuid
+import heapq
+import marshal
+import random
+import datetime
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from .utilidades import authenticate
+
+
+class StackSampler:
+    """Amostra periodicamente a pilha de uma thread; cada pilha acumula o tempo observado."""
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                last = now
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples[tuple(stack)] += now - last
+            last = now
+
+
+class Recording:
+    """Perfil em andamento: soma as amostras de uma ou mais threads da requisição."""
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.samples = Counter()
+        self._lock = threading.Lock()
+
+    def sample(self) -> StackSampler:
+        """Começa a amostrar a thread atual (encerrar com `collect`)."""
+        return StackSampler(threading.get_ident(), self.interval).start()
+
+    def collect(self, sampler: StackSampler) -> None:
+        sampler.stop()
+        with self._lock:
+            self.samples.update(sampler.samples)
+
+    @contextmanager
+    def sampling(self):
+        """Amostra a thread atual durante o bloco."""
+        sampler = self.sample()
+        try:
+            yield
+        finally:
+            self.collect(sampler)
+
+
+class Profile:
+    """Perfil de uma requisição: pilhas amostradas (raiz → folha) e tempo de cada uma."""
+
+    def __init__(self, method: str, path: str, route: str, status: str, duration: float, samples: Counter):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.route = route
+        self.status = status
+        self.duration = duration
+        self.samples = samples
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": len(self.samples),
+            "created_at": self.created_at.isoformat(),
+        }
+
+    def to_pstats(self) -> bytes:
+        """
+        Dados no formato do `pstats` (marshal). As contagens de chamadas são
+        contagens de amostras; os tempos vêm das amostras.
+        """
+        stats = {}
+
+        def entry(key):
+            if key not in stats:
+                stats[key] = [0, 0, 0.0, 0.0, {}]
+            return stats[key]
+
+        for stack, seconds in self.samples.items():
+            leaf = entry(stack[-1])
+            leaf[2] += seconds
+            seen = set()
+            for depth, key in enumerate(stack):
+                item = entry(key)
+                if key not in seen:
+                    seen.add(key)
+                    item[0] += 1
+                    item[1] += 1
+                    item[3] += seconds
+                if depth:
+                    caller = stack[depth - 1]
+                    cc, nc, tt, ct = item[4].get(caller, (0, 0, 0.0, 0.0))
+                    self_time = seconds if depth == len(stack) - 1 else 0.0
+                    item[4][caller] = (cc + 1, nc + 1, tt + self_time, ct + seconds)
+        return marshal.dumps({key: tuple(value) for key, value in stats.items()})
+
+    def to_speedscope(self) -> dict:
+        """Perfil no formato de arquivo do speedscope (tipo "sampled", em milissegundos)."""
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, seconds in self.samples.items():
+            ids = []
+            for key in stack:
+                if key not in index:
+                    index[key] = len(frames)
+                    frames.append({"name": key[2], "file": key[0], "line": key[1]})
+                ids.append(index[key])
+            samples.append(ids)
+            weights.append(round(seconds * 1000, 6))
+        name = f"{self.method} {self.path}"
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "books-api",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 6),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+
+class ProfileStore:
+    """Guarda os N perfis mais lentos (o mais rápido sai quando chega um mais lento)."""
+
+    def __init__(self, max_profiles: int = 20):
+        self.max_profiles = max_profiles
+        self._heap = []
+        self._by_id = {}
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile) -> None:
+        with self._lock:
+            self._counter += 1
+            item = (profile.duration, self._counter, profile)
+            if len(self._heap) < self.max_profiles:
+                heapq.heappush(self._heap, item)
+            elif profile.duration > self._heap[0][0]:
+                evicted = heapq.heapreplace(self._heap, item)[2]
+                self._by_id.pop(evicted.id, None)
+            else:
+                return
+            self._by_id[profile.id] = profile
+
+    def get(self, profile_id: str):
+        return self._by_id.get(profile_id)
+
+    def list(self) -> list:
+        with self._lock:
+            profiles = [item[2] for item in self._heap]
+        return sorted(profiles, key=lambda p: p.duration, reverse=True)
+
+
+class _ProfiledBody:
+    """Mantém o sampler ativo até o fim do corpo (inclusive em streaming)."""
+
+    def __init__(self, body, finish):
+        self.body = body
+        self._finish = finish
+        self._finished = False
+
+    def _done(self) -> None:
+        if not self._finished:
+            self._finished = True
+            self._finish()
+
+    def __iter__(self):
+        try:
+            yield from self.body
+        finally:
+            self._done()
+
+    def close(self) -> None:
+        try:
+            close = getattr(self.body, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._done()
+
+
+class ProfilingMiddleware:
+    """Middleware WSGI que perfila as requisições selecionadas."""
+
+    def __init__(self, app, wsgi_app, store: ProfileStore, header: str, admins,
+                 sample_rate: float = 0.0, interval: float = 0.001):
+        self.app = app
+        self.wsgi_app = wsgi_app
+        self.store = store
+        self.environ_key = "HTTP_" + header.upper().replace("-", "_")
+        self.admins = frozenset(admins)
+        self.sample_rate = sample_rate
+        self.interval = interval
+
+    def _is_admin(self, environ) -> bool:
+        with self.app.app_context():
+            payload, error = authenticate(environ.get("HTTP_AUTHORIZATION", ""))
+        return error is None and payload.get("username") in self.admins
+
+    def _selected(self, environ) -> bool:
+        # O header só vale para tokens de administradores; os demais o ignoram
+        if environ.get(self.environ_key) and self._is_admin(environ):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def begin(self, environ):
+        """Recording para a requisição, ou None se ela não for perfilada."""
+        if not self._selected(environ):
+            return None
+        return Recording(self.interval)
+
+    def finish(self, environ, recording: Recording, status: str, route: str = "") -> None:
+        self.store.add(Profile(
+            method=environ.get("REQUEST_METHOD", "GET"),
+            path=environ.get("PATH_INFO", ""),
+            route=route,
+            status=status,
+            duration=time.perf_counter() - recording.started,
+            samples=recording.samples,
+        ))
+
+    def __call__(self, environ, start_response):
+        recording = self.begin(environ)
+        if recording is None:
+            return self.wsgi_app(environ, start_response)
+        status = ["500"]
+
+        def _start_response(code, headers, exc_info=None):
+            status[0] = code.split(" ", 1)[0]
+            return start_response(code, headers, exc_info)
+
+        sampler = recording.sample()
+
+        def finish():
+            recording.collect(sampler)
+            # Rota preenchida pelo middleware de métricas (before_request)
+            metrics = environ.get("metrics.request")
+            self.finish(environ, recording, status[0], metrics.route if metrics is not None else "")
+
+        try:
+            body = self.wsgi_app(environ, _start_response)
+        except BaseException:
+            finish()
+            raise
+        return _ProfiledBody(body, finish)
+
+
+def parse_admins(value: str) -> tuple:
+    return tuple(name.strip() for name in value.split(",") if name.strip())
+
+
+def get_profiler(app):
+    """ProfilingMiddleware do app, ou None se o profiling estiver desativado."""
+    return app.extensions.get("profiler")
+
+
+def get_profile_store(app):
+    """ProfileStore do app, ou None se o profiling estiver desativado."""
+    return app.extensions.get("profiles")
+
+
+def is_profiling_admin(app, username) -> bool:
+    return username in parse_admins(app.config.get("PROFILING_ADMINS", ""))
+
+
+def init_profiling(app):
+    """Instala o middleware se `PROFILING_ENABLED`; retorna o ProfileStore (ou None)."""
+    if not app.config.get("PROFILING_ENABLED"):
+        return None
+    store = ProfileStore(app.config.get("PROFILING_MAX_PROFILES", 20))
+    app.extensions["profiles"] = store
+    app.wsgi_app = app.extensions["profiler"] = ProfilingMiddleware(
+        app,
+        app.wsgi_app,
+        store,
+        header=app.config.get("PROFILING_HEADER", "X-Profile"),
+        admins=parse_admins(app.config.get("PROFILING_ADMINS", "")),
+        sample_rate=app.config.get("PROFILING_SAMPLE_RATE", 0.0),
+        interval=app.config.get("PROFILING_INTERVAL", 0.001),
+    )
+    return store
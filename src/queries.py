@@ -0,0 +1,314 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .catalog import CatalogSnapshot
+from .indexes import price_index
+from .responses import InvalidParameter
+from .search import intersect, normalize, search_rows
+
+# Campos aceitos em /books/query
+SORT_FIELDS = ("price", "rating", "title", "category", "availability")
+FACET_FIELDS = ("category", "rating", "availability")
+
+
+def _float_arg(args, name: str):
+    value = args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise InvalidParameter(f"Parâmetro '{name}' deve ser numérico")
+
+
+def _int_arg(args, name: str):
+    value = args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidParameter(f"Parâmetro '{name}' deve ser inteiro")
+
+
+def select_rows(snapshot: CatalogSnapshot, args) -> np.ndarray:
+    """
+    Seleciona linhas com os mesmos parâmetros de /books/search e /books/price-range:
+      - title, category: substring (ignora maiúsculas e acentos)
+      - min, max, rating: faixa de preço e rating exato via índice de preço
+    Sem filtros, retorna todas as linhas. O resultado fica em ordem de linha.
+    """
+    title = args.get("title", "").strip()
+    category = args.get("category", "").strip()
+    min_price = _float_arg(args, "min")
+    max_price = _float_arg(args, "max")
+    rating = _int_arg(args, "rating")
+
+    results = []
+    if title or category:
+        results.append(search_rows(snapshot, title=title, category=category))
+    if min_price is not None or max_price is not None or rating is not None:
+        low = -np.inf if min_price is None else min_price
+        high = np.inf if max_price is None else max_price
+        results.append(price_index(snapshot).query(low, high, rating=rating))
+    if not results:
+        return np.arange(len(snapshot), dtype=np.int64)
+    return intersect(results)
+
+
+# ----- Consulta multi-campo (/books/query) -----
+def _encode_keys(values, normalizer):
+    """
+    Códigos por linha (-1 = nulo) na ordem das chaves normalizadas, as chaves e
+    o valor original de cada chave (primeira ocorrência). Só os valores
+    distintos passam pelo `normalizer`.
+    """
+    raw_codes, raw_uniques = pd.factorize(values, use_na_sentinel=True)
+    key_codes, keys = pd.factorize(pd.Series([normalizer(v) for v in raw_uniques], dtype=object), sort=True)
+    labels = [None] * len(keys)
+    for raw, code in zip(raw_uniques, key_codes):
+        if labels[code] is None:
+            labels[code] = raw
+    codes = np.append(key_codes, -1).astype(np.int64)[raw_codes]
+    return codes, list(keys), labels
+
+
+class EncodedColumn:
+    """
+    Coluna discreta codificada por snapshot:
+      - `codes`: código por linha (-1 = nulo), na ordem das chaves (serve de rank)
+      - `postings`: código -> posições ordenadas das linhas
+      - `labels`: valor exibido de cada código (primeira ocorrência)
+    """
+
+    def __init__(self, values, normalizer):
+        self.codes, keys, self.labels = _encode_keys(values, normalizer)
+        self.lookup = {key: code for code, key in enumerate(keys)}
+        order = np.argsort(self.codes, kind="stable")
+        bounds = np.searchsorted(self.codes[order], np.arange(len(keys) + 1))
+        self.postings = [order[bounds[i]:bounds[i + 1]] for i in range(len(keys))]
+
+    def codes_for(self, keys) -> np.ndarray:
+        return np.array(sorted({self.lookup[k] for k in keys if k in self.lookup}), dtype=np.int64)
+
+
+class QueryIndex:
+    """Colunas do snapshot preparadas para filtros, ordenação e facetas vetorizados."""
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        df = snapshot.df
+        self.size = len(df)
+        self.price = df["price"].to_numpy(dtype=float, na_value=np.nan)
+        self.prices = price_index(snapshot).all
+        self.columns = {
+            "rating": EncodedColumn(df["rating"], int),
+            "category": EncodedColumn(df["category"], normalize),
+            "availability": EncodedColumn(df["availability"], normalize),
+        }
+        self._titles = df["title"]
+        self._title_rank = None
+
+    @property
+    def title_rank(self) -> np.ndarray:
+        """Posição de cada título na ordem alfabética normalizada (calculada no primeiro uso)."""
+        if self._title_rank is None:
+            self._title_rank = _encode_keys(self._titles, normalize)[0]
+        return self._title_rank
+
+
+def query_index(snapshot: CatalogSnapshot) -> QueryIndex:
+    return snapshot.derive("query_index", QueryIndex)
+
+
+@dataclass(frozen=True)
+class Predicate:
+    """Filtro com estimativa de cardinalidade (O(1)/O(log n), calculada pelo índice)."""
+    field: str
+    estimate: int
+    rows: object   # () -> posições ordenadas que satisfazem o filtro
+    mask: object   # (rows) -> máscara booleana sobre `rows`
+
+
+def _code_predicate(index: QueryIndex, field: str, codes: np.ndarray) -> Predicate:
+    column = index.columns[field]
+    postings = [column.postings[c] for c in codes]
+
+    def rows():
+        if len(postings) == 1:
+            return postings[0]
+        return np.sort(np.concatenate(postings)) if postings else np.empty(0, dtype=np.int64)
+
+    return Predicate(
+        field=field,
+        estimate=sum(len(p) for p in postings),
+        rows=rows,
+        mask=lambda r: np.isin(column.codes[r], codes),
+    )
+
+
+def _price_predicate(index: QueryIndex, low: float, high: float) -> Predicate:
+    start, stop = index.prices.bounds(low, high)
+    return Predicate(
+        field="price",
+        estimate=int(stop - start),
+        rows=lambda: np.sort(index.prices.rows[start:stop]),
+        mask=lambda r: (index.price[r] >= low) & (index.price[r] <= high),
+    )
+
+
+def _list_arg(args, name: str) -> list:
+    """Valores de `name` (parâmetro repetido e/ou separado por vírgula)."""
+    values = []
+    for raw in args.getlist(name):
+        values += [v.strip() for v in raw.split(",") if v.strip()]
+    return values
+
+
+def parse_predicates(index: QueryIndex, args) -> list:
+    """
+    Filtros de /books/query:
+      - category, availability: um ou mais valores exatos (ignora caixa/acentos)
+      - rating: um ou mais valores; rating_min / rating_max: faixa
+      - price_min / price_max: faixa de preço (inclusiva)
+    """
+    predicates = []
+    for field in ("category", "availability"):
+        values = _list_arg(args, field)
+        if values:
+            codes = index.columns[field].codes_for(normalize(v) for v in values)
+            predicates.append(_code_predicate(index, field, codes))
+
+    ratings = _list_arg(args, "rating")
+    rating_min = _float_arg(args, "rating_min")
+    rating_max = _float_arg(args, "rating_max")
+    if ratings or rating_min is not None or rating_max is not None:
+        column = index.columns["rating"]
+        try:
+            wanted = {int(r) for r in ratings} if ratings else set(column.lookup)
+        except ValueError:
+            raise InvalidParameter("Parâmetro 'rating' deve ser inteiro")
+        low = -np.inf if rating_min is None else rating_min
+        high = np.inf if rating_max is None else rating_max
+        predicates.append(_code_predicate(index, "rating", column.codes_for(r for r in wanted if low <= r <= high)))
+
+    price_min = _float_arg(args, "price_min")
+    price_max = _float_arg(args, "price_max")
+    if price_min is not None or price_max is not None:
+        low = -np.inf if price_min is None else price_min
+        high = np.inf if price_max is None else price_max
+        if low > high:
+            raise InvalidParameter("'price_min' não pode ser maior que 'price_max'")
+        predicates.append(_price_predicate(index, low, high))
+    return predicates
+
+
+def plan(predicates: list) -> list:
+    """Ordem de execução: filtro mais seletivo primeiro."""
+    return sorted(predicates, key=lambda p: p.estimate)
+
+
+def execute(index: QueryIndex, predicates: list) -> np.ndarray:
+    """
+    Materializa o filtro mais seletivo (postings ou fatia do índice de preço)
+    e aplica os demais como máscaras sobre os candidatos.
+    """
+    if not predicates:
+        return np.arange(index.size, dtype=np.int64)
+    first, *rest = plan(predicates)
+    rows = first.rows()
+    for predicate in rest:
+        if not len(rows):
+            break
+        rows = rows[predicate.mask(rows)]
+    return rows
+
+
+def parse_sort(args) -> list:
+    """`sort=price,-rating`: lista de (campo, decrescente)."""
+    keys = []
+    for item in _list_arg(args, "sort"):
+        field = item.lstrip("-+")
+        if field not in SORT_FIELDS:
+            raise InvalidParameter(f"Campo de ordenação inválido: {field}. Use: {', '.join(SORT_FIELDS)}")
+        keys.append((field, item.startswith("-")))
+    return keys
+
+
+def sort_rows(index: QueryIndex, rows: np.ndarray, keys: list) -> np.ndarray:
+    """Ordena `rows` pelas chaves (nulos por último); empates mantêm a ordem do catálogo."""
+    if not keys or not len(rows):
+        return rows
+    columns = []
+    for field, descending in keys:
+        if field == "price":
+            values = index.price[rows]
+        elif field == "title":
+            values = index.title_rank[rows].astype(float)
+        else:
+            codes = index.columns[field].codes[rows]
+            values = np.where(codes < 0, np.nan, codes.astype(float))
+        if descending:
+            values = -values
+        columns.append(np.where(np.isnan(values), np.inf, values))
+    # lexsort usa a última chave como primária
+    return rows[np.lexsort(columns[::-1])]
+
+
+def parse_facets(args) -> list:
+    facets = _list_arg(args, "facets")
+    unknown = [f for f in facets if f not in FACET_FIELDS]
+    if unknown:
+        raise InvalidParameter(f"Facetas inválidas: {', '.join(unknown)}. Use: {', '.join(FACET_FIELDS)}")
+    return list(dict.fromkeys(facets))
+
+
+def facet_counts(index: QueryIndex, rows: np.ndarray, fields: list) -> dict:
+    """Contagem por valor (sobre as linhas filtradas), da maior para a menor."""
+    facets = {}
+    for field in fields:
+        column = index.columns[field]
+        codes = column.codes[rows]
+        counts = np.bincount(codes[codes >= 0], minlength=len(column.labels))
+        order = np.argsort(-counts, kind="stable")
+        facets[field] = [
+            {"value": column.labels[code], "count": int(counts[code])}
+            for code in order if counts[code]
+        ]
+    return facets
+
+
+@dataclass(frozen=True)
+class QueryResult:
+    total: int
+    rows: np.ndarray       # posições da página pedida, já ordenadas
+    offset: int
+    limit: int
+    facets: dict
+    plan: list             # [{"field", "estimate"}] na ordem de execução
+
+
+def run_query(snapshot: CatalogSnapshot, args) -> QueryResult:
+    """Filtra (pelo plano), ordena, calcula facetas e pagina (`limit`/`offset`)."""
+    limit = _int_arg(args, "limit")
+    offset = _int_arg(args, "offset") or 0
+    if limit is not None and limit < 1:
+        raise InvalidParameter("Parâmetro 'limit' deve ser maior que zero")
+    if offset < 0:
+        raise InvalidParameter("Parâmetro 'offset' não pode ser negativo")
+    index = query_index(snapshot)
+    predicates = parse_predicates(index, args)
+    keys = parse_sort(args)
+    facets = parse_facets(args)
+
+    rows = sort_rows(index, execute(index, predicates), keys)
+    stop = None if limit is None else offset + limit
+    return QueryResult(
+        total=len(rows),
+        rows=rows[offset:stop],
+        offset=offset,
+        limit=limit,
+        facets=facet_counts(index, rows, facets) if facets else None,
+        plan=[{"field": p.field, "estimate": p.estimate} for p in plan(predicates)],
+    )
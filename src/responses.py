@@ -0,0 +1,321 @@
+import json
+import base64
+import hashlib
+import datetime
+import threading
+from functools import wraps
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+import pandas as pd
+from flask import Response, current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+from .catalog import CatalogSnapshot
+from .indexes import book_ids, top_rated_rows
+from .aggregates import catalog_aggregates
+from .compression import ETAG_SUFFIXES, compress, negotiate_encoding, parse_encodings
+from .metrics import span
+from .utilidades import current_snapshot
+
+
+class CatalogJSONProvider(DefaultJSONProvider):
+    """JSON do app com suporte a escalares NumPy e `pd.NA` (colunas Int8/category)."""
+
+    @staticmethod
+    def default(o):
+        if o is pd.NA:
+            return None
+        if isinstance(o, np.integer):
+            return int(o)
+        if isinstance(o, np.floating):
+            return float(o)
+        if isinstance(o, np.bool_):
+            return bool(o)
+        return DefaultJSONProvider.default(o)
+
+
+@dataclass(frozen=True)
+class PreparedBody:
+    """
+    Corpo de resposta já serializado, com ETag forte calculado sobre os bytes.
+    As versões comprimidas são geradas sob demanda, uma vez por encoding.
+    """
+    body: bytes
+    etag: str
+    mimetype: str = "application/json"
+    last_modified: datetime.datetime = None
+    _encoded: dict = field(default_factory=dict, init=False, compare=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, compare=False, repr=False)
+
+    def encoded(self, encoding: str) -> bytes:
+        try:
+            return self._encoded[encoding]
+        except KeyError:
+            pass
+        with self._lock:
+            if encoding not in self._encoded:
+                with span("serialize"):
+                    self._encoded[encoding] = compress(self.body, encoding)
+            return self._encoded[encoding]
+
+
+def encode_json(obj) -> bytes:
+    """Serializa exatamente como o `jsonify` do app (modo compacto)."""
+    text = current_app.json.dumps(obj, separators=(",", ":"))
+    return f"{text}\n".encode("utf-8")
+
+
+def prepare_body(body: bytes, mimetype: str = "application/json", last_modified=None) -> PreparedBody:
+    etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+    return PreparedBody(body=body, etag=etag, mimetype=mimetype, last_modified=last_modified)
+
+
+def prepare_json(obj) -> PreparedBody:
+    return prepare_body(encode_json(obj))
+
+
+def not_modified(etag: str, last_modified=None) -> bool:
+    """Pré-condições do GET condicional: If-None-Match tem prioridade sobre If-Modified-Since."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def _negotiate(prepared: PreparedBody):
+    """(encoding ou None, se a resposta varia com Accept-Encoding)."""
+    config = current_app.config
+    if len(prepared.body) < config.get("COMPRESSION_MIN_BYTES", 1024):
+        return None, False
+    offered = parse_encodings(config.get("COMPRESSION_ENCODINGS", ""))
+    if not offered:
+        return None, False
+    return negotiate_encoding(request.accept_encodings, offered), True
+
+
+def send_prepared(prepared: PreparedBody) -> Response:
+    """
+    Envia o corpo pronto, comprimido conforme o Accept-Encoding, ou 304 quando
+    o cliente já possui a mesma representação.
+    """
+    encoding, varies = _negotiate(prepared)
+    etag = prepared.etag + ETAG_SUFFIXES[encoding] if encoding else prepared.etag
+    if not_modified(etag, prepared.last_modified):
+        resp = Response(status=304)
+    else:
+        resp = Response(prepared.encoded(encoding) if encoding else prepared.body, mimetype=prepared.mimetype)
+        if encoding:
+            resp.headers["Content-Encoding"] = encoding
+    resp.set_etag(etag)
+    if prepared.last_modified is not None:
+        resp.last_modified = prepared.last_modified
+    if varies:
+        resp.vary.add("Accept-Encoding")
+    return resp
+
+
+def conditional_on_catalog(f=None, *, vary=(), version=None):
+    """
+    ETag/Last-Modified da versão do catálogo nas rotas de leitura. Se o
+    cliente já tem a versão atual, responde 304 sem executar a rota.
+    `vary`: headers que também mudam a representação (ex.: Accept).
+    `version`: função chamada a cada requisição para dados que mudam além do
+    catálogo; retorna None ou (token, last_modified), que entram no ETag e no
+    Last-Modified.
+    Respostas que já definem ETag (corpos preparados) mantêm o próprio.
+    """
+    if f is None:
+        return lambda func: conditional_on_catalog(func, vary=vary, version=version)
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        snapshot = current_snapshot()
+        etag = snapshot.etag
+        last_modified = snapshot.last_modified
+        if vary:
+            values = "\n".join(request.headers.get(name, "") for name in vary)
+            etag += "-" + hashlib.blake2b(values.encode("utf-8"), digest_size=4).hexdigest()
+        extra = version() if version is not None else None
+        if extra is not None:
+            token, modified = extra
+            etag += "-" + token
+            if modified is not None:
+                last_modified = max(last_modified, modified)
+        if not_modified(etag, last_modified):
+            resp = Response(status=304)
+        else:
+            resp = current_app.make_response(f(*args, **kwargs))
+            if resp.status_code not in (200, 304):
+                return resp
+        if "ETag" not in resp.headers:
+            resp.set_etag(etag)
+        if resp.last_modified is None:
+            resp.last_modified = last_modified
+        for name in vary:
+            resp.vary.add(name)
+        return resp
+    return decorated
+
+
+# ----- Corpos dos endpoints de catálogo completo -----
+def _all_books(snapshot: CatalogSnapshot):
+    return snapshot.df.to_dict(orient="records")
+
+
+def _top_rated(snapshot: CatalogSnapshot):
+    return snapshot.df.iloc[top_rated_rows(snapshot)].to_dict(orient="records")
+
+
+def _categories(snapshot: CatalogSnapshot):
+    return sorted(snapshot.df["category"].dropna().unique().tolist())
+
+
+CATALOG_BODIES = {
+    "books": _all_books,
+    "top_rated": _top_rated,
+    "categories": _categories,
+    "stats_overview": lambda snapshot: catalog_aggregates(snapshot).overview(),
+    "stats_categories": lambda snapshot: catalog_aggregates(snapshot).categories(),
+}
+
+
+def catalog_body(snapshot: CatalogSnapshot, name: str) -> PreparedBody:
+    """Corpo serializado de `name`, gerado uma única vez por snapshot."""
+    build = CATALOG_BODIES[name]
+
+    def prepare(snap):
+        with span("serialize"):
+            return replace(prepare_json(build(snap)), last_modified=snap.last_modified)
+    return snapshot.derive(("body", name), prepare)
+
+
+# ----- Paginação, projeção e streaming -----
+class InvalidParameter(ValueError):
+    """Parâmetro de consulta inválido (vira HTTP 400)."""
+
+
+class CursorExpired(RuntimeError):
+    """Cursor de outra versão do catálogo cujo livro não existe mais (vira HTTP 410)."""
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """
+    Último livro enviado: versão do catálogo (ETag do snapshot), linha e id
+    estável. Na mesma versão vale a linha; depois de uma recarga, o id.
+    """
+    version: str
+    row: int
+    book_id: str = None
+
+
+@dataclass(frozen=True)
+class PageRequest:
+    limit: int = None
+    after: Cursor = None
+    fields: tuple = None
+
+    @property
+    def is_default(self) -> bool:
+        return self.limit is None and self.after is None and self.fields is None
+
+
+def encode_cursor(snapshot: CatalogSnapshot, row: int) -> str:
+    index = book_ids(snapshot)
+    book_id = index.id_of(row)
+    # Slug repetido aponta para outra linha: o cursor só vale nesta versão
+    if book_id is not None and index.row_of(book_id, legacy=False) != row:
+        book_id = None
+    payload = {"v": snapshot.etag, "row": int(row), "id": book_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        book_id = raw.get("id")
+        if book_id is not None and not isinstance(book_id, str):
+            raise ValueError(book_id)
+        return Cursor(version=str(raw["v"]), row=int(raw["row"]), book_id=book_id)
+    except Exception:
+        raise InvalidParameter("Cursor inválido")
+
+
+def cursor_row(snapshot: CatalogSnapshot, cursor: Cursor) -> int:
+    """Linha, no snapshot atual, do último livro enviado com o cursor."""
+    if cursor.version == snapshot.etag:
+        return cursor.row
+    row = book_ids(snapshot).row_of(cursor.book_id, legacy=False) if cursor.book_id is not None else -1
+    if row < 0:
+        raise CursorExpired("Cursor expirado: o catálogo mudou; recomece a paginação")
+    return row
+
+
+def parse_page_args(args, columns) -> PageRequest:
+    """Lê `limit`, `cursor` e `fields` da query string."""
+    limit = args.get("limit")
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise InvalidParameter("Parâmetro 'limit' deve ser inteiro")
+        if limit < 1:
+            raise InvalidParameter("Parâmetro 'limit' deve ser maior que zero")
+    cursor = args.get("cursor")
+    after = decode_cursor(cursor) if cursor else None
+    return PageRequest(limit=limit, after=after, fields=parse_fields(args, columns))
+
+
+def parse_fields(args, columns):
+    """Lê a projeção `fields` (tupla de colunas) ou None quando ausente."""
+    fields = args.get("fields")
+    if fields is None:
+        return None
+    fields = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    if not fields:
+        raise InvalidParameter("Parâmetro 'fields' vazio")
+    unknown = [f for f in fields if f not in columns]
+    if unknown:
+        raise InvalidParameter(f"Campos inválidos em 'fields': {', '.join(unknown)}")
+    return fields
+
+
+def _stream_records(df, rows, fields, dumps, chunk_size=1000):
+    """Gera o array JSON em blocos, sem montar a lista inteira em memória."""
+    yield b"["
+    sep = b""
+    for start in range(0, len(rows), chunk_size):
+        with span("serialize"):
+            part = df.iloc[rows[start:start + chunk_size]]
+            if fields:
+                part = part[list(fields)]
+            body = ",".join(dumps(rec, separators=(",", ":")) for rec in part.to_dict(orient="records"))
+        yield sep + body.encode("utf-8")
+        sep = b","
+    yield b"]\n"
+
+
+def send_rows(snapshot: CatalogSnapshot, rows: np.ndarray, page: PageRequest = PageRequest()) -> Response:
+    """
+    Envia as linhas `rows` (posições ordenadas) como array JSON em streaming.
+    Com `limit`, devolve uma página e o cursor da próxima em `X-Next-Cursor`.
+    Levanta CursorExpired se o cursor não puder ser posicionado neste snapshot.
+    """
+    total = len(rows)
+    if page.after is not None:
+        rows = rows[np.searchsorted(rows, cursor_row(snapshot, page.after), side="right"):]
+    next_cursor = None
+    if page.limit is not None and len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor(snapshot, rows[-1])
+    resp = Response(
+        _stream_records(snapshot.df, rows, page.fields, current_app.json.dumps),
+        mimetype="application/json",
+    )
+    resp.headers["X-Total-Count"] = str(total)
+    if next_cursor:
+        resp.headers["X-Next-Cursor"] = next_cursor
+    return resp
@@ -0,0 +1,108 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from .catalog import CatalogSnapshot
+
+TOKEN_RE = re.compile(r"\w+")
+NGRAM = 3
+
+
+def normalize(text) -> str:
+    """Minúsculas + remoção de acentos ("Café" -> "cafe")."""
+    if not isinstance(text, str):
+        return ""
+    folded = text.casefold()
+    if folded.isascii():
+        return folded
+    folded = unicodedata.normalize("NFKD", folded)
+    return "".join(ch for ch in folded if not unicodedata.combining(ch))
+
+
+def _ngrams(text: str) -> set:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+def intersect(postings: list) -> np.ndarray:
+    """Interseção de listas ordenadas, começando pela menor."""
+    postings = sorted(postings, key=len)
+    result = postings[0]
+    for other in postings[1:]:
+        if not len(result):
+            break
+        # Busca binária dos elementos da lista menor na maior: O(k log n)
+        pos = np.searchsorted(other, result)
+        pos[pos == len(other)] = 0
+        result = result[other[pos] == result] if len(other) else other
+    return result
+
+
+class FieldIndex:
+    """
+    Índices de uma coluna de texto:
+      - tokens: palavra normalizada -> linhas que contêm a palavra inteira
+      - ngrams: trigrama -> linhas que contêm o trigrama
+    As listas de postings são arrays ordenados de posições de linha.
+    """
+
+    def __init__(self, values):
+        self.present = np.array([isinstance(v, str) for v in values], dtype=bool)
+        self.texts = [normalize(v) for v in values]
+        tokens = defaultdict(list)
+        grams = defaultdict(list)
+        for row, text in enumerate(self.texts):
+            for tok in set(TOKEN_RE.findall(text)):
+                tokens[tok].append(row)
+            for gram in _ngrams(text):
+                grams[gram].append(row)
+        self.tokens = {k: np.asarray(v, dtype=np.int64) for k, v in tokens.items()}
+        self.ngrams = {k: np.asarray(v, dtype=np.int64) for k, v in grams.items()}
+        self._series = None
+
+    def _candidates(self, query: str):
+        """Postings que toda linha compatível precisa conter (ou None se não houver)."""
+        postings = []
+        # Palavras delimitadas dos dois lados dentro da consulta são palavras inteiras no texto
+        for m in TOKEN_RE.finditer(query):
+            if m.start() > 0 and m.end() < len(query):
+                postings.append(self.tokens.get(m.group(), np.empty(0, dtype=np.int64)))
+        for gram in _ngrams(query):
+            postings.append(self.ngrams.get(gram, np.empty(0, dtype=np.int64)))
+        return intersect(postings) if postings else None
+
+    def match(self, query: str) -> np.ndarray:
+        """Linhas cujo texto contém `query` (substring, sem diferenciar caixa/acentos)."""
+        q = normalize(query)
+        if not q:
+            return np.flatnonzero(self.present)
+        candidates = self._candidates(q)
+        if candidates is None:
+            # Consultas curtas (< 3 caracteres) não têm trigramas: varredura vetorizada
+            if self._series is None:
+                self._series = pd.Series(self.texts, dtype=object)
+            hits = self._series.str.contains(q, regex=False).to_numpy(dtype=bool)
+            return np.flatnonzero(hits & self.present)
+        if len(q) == NGRAM:
+            return candidates
+        texts = self.texts
+        return np.fromiter((r for r in candidates if q in texts[r]), dtype=np.int64)
+
+
+def field_index(snapshot: CatalogSnapshot, column: str) -> FieldIndex:
+    """Índice da coluna, construído uma única vez por snapshot."""
+    return snapshot.derive(("search", column), lambda snap: FieldIndex(snap.df[column].tolist()))
+
+
+def search_rows(snapshot: CatalogSnapshot, title: str = "", category: str = "") -> np.ndarray:
+    """Posições (ordenadas) das linhas que casam com todos os filtros informados."""
+    results = []
+    if title:
+        results.append(field_index(snapshot, "title").match(title))
+    if category:
+        results.append(field_index(snapshot, "category").match(category))
+    if not results:
+        return np.arange(len(snapshot), dtype=np.int64)
+    return intersect(results)
@@ -0,0 +1,318 @@
+"""
+Livros semelhantes (/api/v1/books/<id>/similar).
+
+Cada livro vira um vetor de norma 1 com blocos ponderados (`WEIGHTS`):
+
+    title     TF-IDF das palavras do título; só as palavras presentes em
+              dois ou mais títulos (até `SIMILAR_MAX_TERMS`, as mais
+              frequentes) ganham coluna, as demais contam apenas na norma
+    category  one-hot da categoria
+    price     z-score do preço, limitado a ±3 desvios
+    rating    rating normalizado para [0, 1]
+
+A similaridade é o cosseno (produto interno dos vetores). Os `SIMILAR_TOP_K`
+vizinhos de cada livro ficam numa tabela calculada com produtos de matrizes
+por blocos de linhas: na construção do índice para catálogos de até
+`SIMILAR_PRECOMPUTE_MAX_ROWS` linhas, ou na primeira consulta de cada livro
+(e memoizados) nos maiores. Consultar é ler uma linha da tabela.
+
+Quando o catálogo recarrega, o índice é atualizado a partir do snapshot
+anterior: só as linhas novas ou alteradas são comparadas com o catálogo
+inteiro; as demais só com elas. Os parâmetros dos vetores (vocabulário,
+idf, média e desvio do preço, faixa do rating) ficam congelados nas
+atualizações, e o índice é refeito do zero quando as mudanças acumuladas
+passam de `MAX_DELTA_FRACTION` do catálogo.
+"""
+import logging
+import threading
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+import pandas as pd
+
+from .aggregates import MAX_DELTA_FRACTION
+from .catalog import CatalogSnapshot
+from .features import expand_rows
+from .search import TOKEN_RE, normalize
+
+logger = logging.getLogger("app")
+
+WEIGHTS = {"title": 1.0, "category": 0.5, "price": 0.25, "rating": 0.25}
+CONTENT_COLUMNS = ["title", "category", "price", "rating"]
+# Memória máxima de cada bloco de similaridades (linhas do bloco x candidatos)
+BLOCK_BYTES = 64 * 1024 * 1024
+# Marca, na tabela de vizinhos, as linhas ainda não calculadas (modo sob demanda)
+PENDING = -2
+
+
+@dataclass(frozen=True)
+class VectorSpace:
+    """Parâmetros que transformam linhas do catálogo em vetores."""
+    terms: tuple
+    idf: np.ndarray
+    oov_idf: float
+    categories: tuple
+    price_mean: float
+    price_std: float
+    rating_min: float
+    rating_span: float
+    _terms: pd.Index = field(init=False, repr=False, compare=False)
+    _categories: pd.Index = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_terms", pd.Index(self.terms, dtype=object))
+        object.__setattr__(self, "_categories", pd.Index(self.categories, dtype=object))
+
+    @property
+    def width(self) -> int:
+        return len(self.terms) + len(self.categories) + 2
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame, max_terms: int, terms=None) -> "VectorSpace":
+        _, codes, _, words = terms if terms is not None else _title_terms(df)
+        doc_freq = pd.Series(np.bincount(codes, minlength=len(words)), index=words)
+        # Palavras de um título só não aproximam livros: ficam fora do vocabulário
+        shared = doc_freq[doc_freq >= 2].sort_index().sort_values(ascending=False, kind="stable")[:max_terms]
+        n = len(df)
+        price = df["price"].to_numpy(dtype=float, na_value=np.nan)
+        rating = df["rating"].to_numpy(dtype=float, na_value=np.nan)
+        has_price, has_rating = not np.isnan(price).all(), not np.isnan(rating).all()
+        std = float(np.nanstd(price)) if has_price else 0.0
+        low = float(np.nanmin(rating)) if has_rating else 0.0
+        high = float(np.nanmax(rating)) if has_rating else 1.0
+        return cls(
+            terms=tuple(shared.index),
+            idf=np.log((1 + n) / (1 + shared.to_numpy(dtype=float))) + 1.0,
+            oov_idf=float(np.log((1 + n) / 2) + 1.0),
+            categories=tuple(sorted(df["category"].dropna().astype(str).unique())),
+            price_mean=float(np.nanmean(price)) if has_price else 0.0,
+            price_std=std if std > 0 else 1.0,
+            rating_min=low,
+            rating_span=high - low if high > low else 1.0,
+        )
+
+    def extended(self, df: pd.DataFrame) -> "VectorSpace":
+        """Mesmo espaço com as categorias novas de `df` acrescentadas ao fim."""
+        new = sorted(set(df["category"].dropna().astype(str)) - set(self.categories))
+        return replace(self, categories=self.categories + tuple(new)) if new else self
+
+    def transform(self, df: pd.DataFrame, terms=None) -> np.ndarray:
+        n = len(df)
+        vectors = np.zeros((n, self.width), dtype=np.float32)
+        if not n:
+            return vectors
+        # Parte do título sem coluna (palavras fora do vocabulário): só entra na norma
+        hidden = np.zeros(n)
+        rows, codes, counts, words = terms if terms is not None else _title_terms(df)
+        if len(rows):
+            terms = self._terms.get_indexer(words)[codes]
+            known = terms >= 0
+            # -1 (fora do vocabulário) cai no último item: o idf de uma palavra rara
+            tfidf = (1.0 + np.log(counts)) * np.append(self.idf, self.oov_idf)[terms]
+            norms = np.sqrt(np.bincount(rows, weights=tfidf ** 2, minlength=n))
+            weights = WEIGHTS["title"] * tfidf / norms[rows]
+            vectors[rows[known], terms[known]] = weights[known]
+            hidden = np.bincount(rows[~known], weights=weights[~known] ** 2, minlength=n)
+
+        codes = self._categories.get_indexer(df["category"].astype(object).where(df["category"].notna(), None))
+        present = np.flatnonzero(codes >= 0)
+        vectors[present, len(self.terms) + codes[present]] = WEIGHTS["category"]
+
+        price = df["price"].to_numpy(dtype=float, na_value=np.nan)
+        rating = df["rating"].to_numpy(dtype=float, na_value=np.nan)
+        z = np.clip((price - self.price_mean) / self.price_std, -3.0, 3.0) / 3.0
+        vectors[:, -2] = WEIGHTS["price"] * np.nan_to_num(z)
+        vectors[:, -1] = WEIGHTS["rating"] * np.nan_to_num((rating - self.rating_min) / self.rating_span)
+
+        lengths = np.sqrt(np.einsum("ij,ij->i", vectors, vectors) + hidden)
+        lengths[lengths == 0] = 1.0
+        vectors /= lengths[:, None]
+        return vectors
+
+
+def _title_terms(df: pd.DataFrame):
+    """
+    Palavras de cada título: (linhas, códigos, contagens, palavras), um item por
+    par (linha, palavra). Normalização e tokenização rodam uma vez por título distinto.
+    """
+    title_codes, titles = pd.factorize(df["title"].astype(object).where(df["title"].notna(), ""))
+    tokens = pd.Series(titles, dtype=object).map(normalize).str.findall(TOKEN_RE.pattern).explode().dropna()
+    codes, words = pd.factorize(tokens)
+    distinct = max(len(words), 1)
+    keys, counts = np.unique(tokens.index.to_numpy(dtype=np.int64) * distinct + codes, return_counts=True)
+    rows, codes, counts = expand_rows(keys // distinct, keys % distinct, counts, title_codes, len(titles))
+    return rows, codes, counts, pd.Index(words, dtype=object)
+
+
+def _row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """Hash do conteúdo usado nos vetores, por linha (detecta linhas alteradas)."""
+    return pd.util.hash_pandas_object(df[CONTENT_COLUMNS].astype(object), index=False).to_numpy()
+
+
+def top_k(vectors: np.ndarray, rows: np.ndarray, k: int, candidates: np.ndarray = None):
+    """
+    (vizinhos, scores) das linhas `rows` entre os `candidates` (padrão: todas),
+    sem a própria linha, ordenados do mais semelhante. Cada bloco de linhas é
+    um único produto de matrizes; vizinhos faltantes ficam com -1 / -inf.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    if candidates is None:
+        candidates = np.arange(len(vectors))
+    neighbors = np.full((len(rows), k), -1, dtype=np.int64)
+    scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+    if not len(rows) or not len(candidates) or not k:
+        return neighbors, scores
+    pool = vectors[candidates]
+    take = min(k, len(candidates))
+    block = max(1, BLOCK_BYTES // (4 * len(candidates)))
+    for start in range(0, len(rows), block):
+        part = rows[start:start + block]
+        sims = vectors[part] @ pool.T
+        # A própria linha nunca é vizinha
+        own = np.searchsorted(candidates, part)
+        hit = own < len(candidates)
+        hit[hit] = candidates[own[hit]] == part[hit]
+        sims[np.flatnonzero(hit), own[hit]] = -np.inf
+        best = np.argpartition(-sims, take - 1, axis=1)[:, :take] if take < len(candidates) else \
+            np.broadcast_to(np.arange(len(candidates)), (len(part), len(candidates)))
+        best_scores = np.take_along_axis(sims, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        found = np.isfinite(best_scores)
+        neighbors[start:start + len(part), :take] = np.where(found, candidates[best], -1)
+        scores[start:start + len(part), :take] = best_scores
+    return neighbors, scores
+
+
+class SimilarityIndex:
+    """Vetores + tabela de vizinhos (top-k) de um snapshot."""
+
+    def __init__(self, space: VectorSpace, vectors: np.ndarray, keys: pd.Index, hashes: np.ndarray,
+                 neighbors: np.ndarray, scores: np.ndarray, drift: float = 0.0):
+        self.space = space
+        self.vectors = vectors
+        self.keys = keys
+        self.hashes = hashes
+        self.neighbors = neighbors
+        self.scores = scores
+        self.drift = drift
+        self._lock = threading.Lock()
+
+    @property
+    def k(self) -> int:
+        return self.neighbors.shape[1]
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, k: int, max_terms: int, precompute_max_rows: int) -> "SimilarityIndex":
+        terms = _title_terms(df)
+        space = VectorSpace.fit(df, max_terms, terms)
+        vectors = space.transform(df, terms)
+        n = len(df)
+        if n <= precompute_max_rows:
+            neighbors, scores = top_k(vectors, np.arange(n), k)
+        else:
+            neighbors = np.full((n, k), PENDING, dtype=np.int64)
+            scores = np.full((n, k), -np.inf, dtype=np.float32)
+        return cls(space, vectors, pd.Index(df["detail_url"], dtype=object), _row_hashes(df), neighbors, scores)
+
+    def updated(self, df: pd.DataFrame):
+        """
+        Índice do catálogo `df` a partir deste (snapshot anterior), ou None se
+        a atualização não compensa (chaves repetidas ou mudanças demais).
+        """
+        keys = pd.Index(df["detail_url"], dtype=object)
+        if keys.has_duplicates or self.keys.has_duplicates:
+            return None
+        n = len(df)
+        hashes = _row_hashes(df)
+        old_rows = self.keys.get_indexer(keys)
+        same = old_rows >= 0
+        same[same] = self.hashes[old_rows[same]] == hashes[same]
+        kept = np.flatnonzero(same)
+        changed = np.flatnonzero(~same)
+        removed = len(self.keys) - len(kept)
+        drift = self.drift + (len(changed) + removed) / max(n, 1)
+        if drift > MAX_DELTA_FRACTION:
+            return None
+
+        space = self.space.extended(df.iloc[changed])
+        vectors = np.zeros((n, space.width), dtype=np.float32)
+        # Termos e categorias antigas mantêm a coluna; preço e rating são sempre
+        # as duas últimas (as categorias novas entram antes deles, zeradas)
+        previous = self.vectors[old_rows[kept]]
+        head = self.vectors.shape[1] - 2
+        vectors[kept, :head] = previous[:, :head]
+        vectors[kept, -2:] = previous[:, -2:]
+        vectors[changed] = space.transform(df.iloc[changed])
+
+        # Vizinhos antigos, renumerados para as linhas novas (removidos/alterados viram -1)
+        k = self.k
+        renumber = np.full(len(self.keys), -1, dtype=np.int64)
+        renumber[old_rows[kept]] = kept
+        old_neighbors = self.neighbors[old_rows[kept]]
+        pending = (old_neighbors == PENDING).all(axis=1)
+        valid = old_neighbors >= 0
+        mapped = np.where(valid, renumber[np.where(valid, old_neighbors, 0)], -1)
+        mapped_scores = np.where(mapped >= 0, self.scores[old_rows[kept]], -np.inf).astype(np.float32)
+        # Quem perdeu um vizinho pode ter outro fora da tabela: recalcula do zero
+        lost = ((mapped >= 0).sum(axis=1) < valid.sum(axis=1)) & ~pending
+
+        neighbors = np.full((n, k), PENDING, dtype=np.int64)
+        scores = np.full((n, k), -np.inf, dtype=np.float32)
+        merge = ~pending & ~lost
+        rows = kept[merge]
+        if len(rows) and len(changed):
+            extra, extra_scores = top_k(vectors, rows, min(k, len(changed)), candidates=changed)
+            joined = np.concatenate([mapped[merge], extra], axis=1)
+            joined_scores = np.concatenate([mapped_scores[merge], extra_scores], axis=1)
+            order = np.argsort(-joined_scores, axis=1, kind="stable")[:, :k]
+            neighbors[rows] = np.take_along_axis(joined, order, axis=1)
+            scores[rows] = np.take_along_axis(joined_scores, order, axis=1)
+        elif len(rows):
+            order = np.argsort(-mapped_scores[merge], axis=1, kind="stable")
+            neighbors[rows] = np.take_along_axis(mapped[merge], order, axis=1)
+            scores[rows] = np.take_along_axis(mapped_scores[merge], order, axis=1)
+        neighbors[rows] = np.where(np.isfinite(scores[rows]), neighbors[rows], -1)
+
+        # Linhas novas/alteradas e as que perderam vizinhos: busca completa
+        # (no modo sob demanda, as novas ficam para a primeira consulta)
+        eager = not (self.neighbors == PENDING).all(axis=1).any()
+        recompute = np.concatenate([changed if eager else np.empty(0, dtype=np.int64), kept[lost]])
+        if len(recompute):
+            neighbors[recompute], scores[recompute] = top_k(vectors, recompute, k)
+        logger.info(
+            f"Índice de similares atualizado por delta: {len(changed)} linhas novas/alteradas, "
+            f"{removed} removidas, {len(recompute)} recalculadas"
+        )
+        return SimilarityIndex(space, vectors, keys, hashes, neighbors, scores, drift)
+
+    def similar(self, row: int, limit: int):
+        """(linhas, scores) dos `limit` livros mais semelhantes a `row`."""
+        if self.neighbors[row, 0] == PENDING:
+            neighbors, scores = top_k(self.vectors, np.array([row]), self.k)
+            with self._lock:
+                self.neighbors[row], self.scores[row] = neighbors[0], scores[0]
+        neighbors, scores = self.neighbors[row, :limit], self.scores[row, :limit]
+        found = neighbors >= 0
+        return neighbors[found], scores[found]
+
+
+def _build(snapshot: CatalogSnapshot, k: int, max_terms: int, precompute_max_rows: int) -> SimilarityIndex:
+    key = ("similarity", k, max_terms, precompute_max_rows)
+    previous = snapshot.previous
+    base = previous.peek_derived(key) if previous is not None else None
+    if base is not None:
+        index = base.updated(snapshot.df)
+        if index is not None:
+            return index
+    return SimilarityIndex.build(snapshot.df, k, max_terms, precompute_max_rows)
+
+
+def similarity_index(snapshot: CatalogSnapshot, k: int = 20, max_terms: int = 1024,
+                     precompute_max_rows: int = 20000) -> SimilarityIndex:
+    """Índice de similares do snapshot (por delta do snapshot anterior quando possível)."""
+    return snapshot.derive(
+        ("similarity", k, max_terms, precompute_max_rows),
+        lambda snap: _build(snap, k, max_terms, precompute_max_rows),
+    )
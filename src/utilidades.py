@@ -1,13 +1,20 @@
 import os
+import time
+import hashlib
 import datetime
 import logging
+import threading
+from collections import OrderedDict
 from functools import wraps
 
 import jwt
 import requests
 import pandas as pd
 from bs4 import BeautifulSoup
-from flask import jsonify, request, current_app
+from flask import g, jsonify, request, current_app
+
+from .catalog import CatalogSnapshot, get_catalog_store
+from .metrics import span
 
 logger = logging.getLogger("app")
 
@@ -17,72 +24,203 @@ JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_EXP_DELTA_SECONDS = int(os.getenv("JWT_EXP_DELTA_SECONDS", "3600"))
 
 def create_token(username: str) -> str:
+    config = current_app.config
     payload = {
         "username": username,
-        "exp": datetime.datetime.utcnow() + datetime.timedelta(seconds=JWT_EXP_DELTA_SECONDS),
+        "exp": datetime.datetime.utcnow() + datetime.timedelta(
+            seconds=config.get("JWT_EXP_DELTA_SECONDS", JWT_EXP_DELTA_SECONDS)
+        ),
     }
-    token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    token = jwt.encode(payload, config.get("JWT_SECRET", JWT_SECRET), algorithm=config.get("JWT_ALGORITHM", JWT_ALGORITHM))
     return token
 
+
+class VerifiedTokenCache:
+    """
+    Tokens já verificados (chave: digest do token) com o `exp` de cada um.
+
+    - Entradas expiram no `exp` do próprio token (relógio de parede, como o JWT).
+    - Limitado a `maxsize` entradas (LRU).
+    - Trocar o segredo/algoritmo invalida o cache inteiro.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._key = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+
+    def _check_key(self, key) -> None:
+        # Chamado com o lock adquirido
+        if key != self._key:
+            self._data.clear()
+            self._key = key
+
+    def get(self, digest: bytes, key):
+        """Payload do token se já verificado com a mesma chave e ainda válido."""
+        with self._lock:
+            self._check_key(key)
+            item = self._data.get(digest)
+            if item is None:
+                return None
+            exp, payload = item
+            if exp is not None and exp <= time.time():
+                del self._data[digest]
+                return None
+            self._data.move_to_end(digest)
+            return payload
+
+    def set(self, digest: bytes, key, payload: dict) -> None:
+        exp = payload.get("exp")
+        with self._lock:
+            self._check_key(key)
+            self._data[digest] = (float(exp) if exp is not None else None, payload)
+            self._data.move_to_end(digest)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_TOKEN_CACHE_LOCK = threading.Lock()
+
+
+def get_token_cache(app) -> VerifiedTokenCache:
+    """Retorna (criando se preciso) o cache de tokens verificados do app Flask."""
+    cache = app.extensions.get("jwt_cache")
+    if cache is None:
+        with _TOKEN_CACHE_LOCK:
+            cache = app.extensions.get("jwt_cache")
+            if cache is None:
+                cache = VerifiedTokenCache(app.config.get("JWT_CACHE_SIZE", 10000))
+                app.extensions["jwt_cache"] = cache
+    return cache
+
+
+def verify_token(token: str) -> dict:
+    """
+    Valida o token e retorna o payload. Tokens repetidos são atendidos pelo
+    cache de verificados; os demais passam pelo `jwt.decode` completo.
+    Levanta as exceções do PyJWT (ExpiredSignatureError, InvalidTokenError).
+    """
+    config = current_app.config
+    secret = config.get("JWT_SECRET", JWT_SECRET)
+    algorithm = config.get("JWT_ALGORITHM", JWT_ALGORITHM)
+    if not config.get("JWT_CACHE_SIZE", 10000):
+        return jwt.decode(token, secret, algorithms=[algorithm])
+    cache = get_token_cache(current_app)
+    key = (secret, algorithm)
+    digest = cache.digest(token)
+    payload = cache.get(digest, key)
+    if payload is None:
+        payload = jwt.decode(token, secret, algorithms=[algorithm])
+        cache.set(digest, key, payload)
+    return payload
+
+
+def authenticate(auth_header: str):
+    """(payload, None) se o header `Authorization` for válido; senão (None, mensagem de erro)."""
+    if not auth_header.startswith("Bearer "):
+        return None, "Token ausente"
+    token = auth_header.split(" ", 1)[1]
+    try:
+        return verify_token(token), None
+    except jwt.ExpiredSignatureError:
+        return None, "Token expirado"
+    except jwt.InvalidTokenError:
+        return None, "Token inválido"
+
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        auth = request.headers.get("Authorization", "")
-        if not auth.startswith("Bearer "):
-            return jsonify({"error": "Token ausente"}), 401
-        token = auth.split(" ", 1)[1]
-        try:
-            payload = jwt.decode(token, os.getenv("JWT_SECRET", JWT_SECRET), algorithms=[JWT_ALGORITHM])
-            request.user = payload.get("username")
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token expirado"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Token inválido"}), 401
+        with span("auth"):
+            payload, error = authenticate(request.headers.get("Authorization", ""))
+        if error:
+            return jsonify({"error": error}), 401
+        request.user = payload.get("username")
         return f(*args, **kwargs)
     return decorated
 
-def scrape_book_details(detail_url: str) -> dict:
+UNAVAILABLE_DETAILS = {
+    "product_description": "Unavailable",
+    "number_of_reviews": "Unavailable",
+}
+
+def parse_book_details(html: str) -> dict:
+    """
+    Extrai da página de detalhes:
+      - product_description
+      - number_of_reviews
+    """
+    result = dict(UNAVAILABLE_DETAILS)
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Descrição do produto
+    desc_tag = soup.find("div", id="product_description")
+    if desc_tag:
+        result["product_description"] = desc_tag.find_next("p").get_text(strip=True)
+    else:
+        result["product_description"] = "No description available"
+
+    # Número de reviews
+    tbl = soup.find("table", class_="table table-striped")
+    if tbl:
+        for row in tbl.find_all("tr"):
+            header = row.find("th").get_text(strip=True)
+            if header.lower() == "number of reviews":
+                result["number_of_reviews"] = row.find("td").get_text(strip=True)
+                break
+    return result
+
+def fetch_book_details(detail_url: str, session=None, timeout: float = 10) -> dict:
+    """
+    Baixa e interpreta a página de detalhes. Lança exceção em caso de falha
+    (use `scrape_book_details` para a versão tolerante a erros).
+    """
+    resp = (session or requests).get(detail_url, timeout=timeout)
+    resp.raise_for_status()
+    return parse_book_details(resp.text)
+
+def scrape_book_details(detail_url: str, session=None, timeout: float = 10) -> dict:
     """
     Faz scraping da página de detalhes para:
       - product_description
       - number_of_reviews
+    Em caso de falha retorna os campos como "Unavailable".
     """
-    result = {
-        "product_description": "Unavailable",
-        "number_of_reviews": "Unavailable",
-    }
     try:
-        resp = requests.get(detail_url, timeout=10)
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
-
-        # Descrição do produto
-        desc_tag = soup.find("div", id="product_description")
-        if desc_tag:
-            result["product_description"] = desc_tag.find_next("p").get_text(strip=True)
-        else:
-            result["product_description"] = "No description available"
-
-        # Número de reviews
-        tbl = soup.find("table", class_="table table-striped")
-        if tbl:
-            for row in tbl.find_all("tr"):
-                header = row.find("th").get_text(strip=True)
-                if header.lower() == "number of reviews":
-                    result["number_of_reviews"] = row.find("td").get_text(strip=True)
-                    break
+        return fetch_book_details(detail_url, session=session, timeout=timeout)
     except Exception as e:
         logger.warning(f"Falha ao fazer scraping de {detail_url}: {e}")
-    return result
+        return dict(UNAVAILABLE_DETAILS)
+
+def current_snapshot() -> CatalogSnapshot:
+    """
+    Snapshot atual do catálogo do app (current_app.config["BOOKS_CSV_PATH"]).
+    O CSV é lido uma única vez por processo e recarregado em background quando muda.
+    Dentro de uma requisição, todas as chamadas veem o mesmo snapshot.
+    """
+    snapshot = g.get("catalog_snapshot")
+    if snapshot is None:
+        with span("load"):
+            snapshot = g.catalog_snapshot = get_catalog_store(current_app).snapshot()
+    return snapshot
 
 def load_books_df() -> pd.DataFrame:
     """
-    Lê o CSV do caminho configurado no app (current_app.config["BOOKS_CSV_PATH"]).
+    Retorna o DataFrame do snapshot atual (somente leitura; não alterar in-place).
     """
-    csv_path = current_app.config.get("BOOKS_CSV_PATH", "./data/dados-books.csv")
-    if not os.path.exists(csv_path):
-        raise FileNotFoundError(f"Arquivo CSV não encontrado em: {csv_path}")
-    return pd.read_csv(csv_path)
+    return current_snapshot().df
 
 # Alias opcional para compatibilidade com chamadas antigas
 def read_books_csv(*_args, **_kwargs):
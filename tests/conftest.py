@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Config lê o ambiente na importação: nada de store/aquecimento nos arquivos do projeto
+os.environ["ENRICHMENT_STORE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="books-api-tests-"), "enrichment.sqlite3")
+os.environ["ENRICHMENT_WARMUP_ON_START"] = "false"
+os.environ["FULLTEXT_WARMUP_ON_START"] = "false"
+
+from src import create_app  # noqa: E402
+from src.config import Config  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    return create_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(client):
+    response = client.post(
+        "/api/v1/auth/login", json={"username": Config.TEST_USERNAME, "password": Config.TEST_PASSWORD}
+    )
+    return {"Authorization": f"Bearer {response.get_json()['token']}"}
+
+
+@pytest.fixture
+def catalog_csv(app, tmp_path):
+    """Catálogo próprio do teste (os 60 primeiros livros do CSV do projeto), editável."""
+    path = tmp_path / "books.csv"
+    pd.read_csv(Config.BOOKS_CSV_PATH).head(60).to_csv(path, index=False)
+    app.config["BOOKS_CSV_PATH"] = str(path)
+    app.config["BOOKS_CATALOG_PATH"] = str(tmp_path / "books.catalog")
+    return path
+
+
+@pytest.fixture
+def edit_catalog(app, catalog_csv):
+    """Aplica `edit(df) -> df` ao CSV do teste e recarrega o catálogo."""
+    from src.catalog import get_catalog_store
+
+    def edit(change):
+        change(pd.read_csv(catalog_csv)).to_csv(catalog_csv, index=False)
+        get_catalog_store(app).refresh()
+
+    return edit
+
+
+@pytest.fixture
+def site(tmp_path):
+    from site_server import serve_copy
+
+    server = serve_copy(str(tmp_path))
+    yield server
+    server.stop()
@@ -0,0 +1,100 @@
+"""
+Servidor HTTP local com a cópia gravada do site (tests/fixtures/site).
+
+Responde com ETag (hash do arquivo) e 304 para If-None-Match igual, registra
+as requisições e permite injetar falhas (`fail`: caminho -> status) e
+atrasos (`delay`: caminho -> segundos) por caminho.
+"""
+import os
+import time
+import shutil
+import hashlib
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SITE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "site")
+
+
+class SiteServer:
+    def __init__(self, root: str):
+        self.root = root
+        self.fail = {}
+        self.delay = {}
+        self.requests = []
+        self.hits = Counter()
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                with server._lock:
+                    server.requests.append((path, self.headers.get("If-None-Match")))
+                    server.hits[path] += 1
+                time.sleep(server.delay.get(path, 0))
+                if path in server.fail:
+                    self._send(server.fail[path], b"")
+                    return
+                file = os.path.join(server.root, path.lstrip("/"))
+                if path.endswith("/"):
+                    file = os.path.join(file, "index.html")
+                if not os.path.isfile(file):
+                    self._send(404, b"not found")
+                    return
+                with open(file, "rb") as fh:
+                    body = fh.read()
+                etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self._send(304, b"", etag)
+                else:
+                    self._send(200, body, etag)
+
+            def _send(self, status, body, etag=None):
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/"
+
+    def start(self) -> "SiteServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def reset_log(self) -> None:
+        with self._lock:
+            self.requests.clear()
+            self.hits.clear()
+
+    def edit(self, path: str, old: str, new: str) -> None:
+        """Altera uma página servida (simula uma mudança no site)."""
+        file = os.path.join(self.root, path.lstrip("/"))
+        with open(file, encoding="utf-8") as fh:
+            text = fh.read()
+        assert old in text
+        with open(file, "w", encoding="utf-8") as fh:
+            fh.write(text.replace(old, new))
+
+
+def serve_copy(directory: str) -> SiteServer:
+    """Serve uma cópia do site gravado (os testes podem editá-la)."""
+    root = os.path.join(directory, "site")
+    shutil.copytree(SITE, root)
+    return SiteServer(root).start()
@@ -0,0 +1,118 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import aggregates
+from src.aggregates import CatalogAggregates, catalog_aggregates
+from src.catalog import CatalogSnapshot, FileSignature
+
+N = 200
+
+
+def make_snapshot(df, version=1, previous=None):
+    snapshot = CatalogSnapshot(
+        df=df,
+        version=version,
+        signature=FileSignature(path="<test>", mtime_ns=version, size=len(df)),
+        loaded_at=datetime.datetime.now(datetime.timezone.utc),
+        load_seconds=0.0,
+    )
+    snapshot.previous = previous
+    return snapshot
+
+
+def catalog(n=N, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "title": [f"Book {i}" for i in range(n)],
+        "price": rng.uniform(10, 60, n).round(2),
+        "rating": rng.integers(1, 6, n),
+        "category": pd.Categorical(rng.choice(["Poetry", "Fiction", "Travel"], n)),
+        "detail_url": [f"https://books.example/catalogue/book-{i}_{i}/index.html" for i in range(n)],
+    })
+
+
+def edit_prices(df):
+    df = df.copy()
+    df.loc[[3, 7], "price"] += 1
+    return df
+
+
+def raise_cheapest(df):
+    # O menor preço deixa de existir: min global e da categoria precisam ser recalculados
+    df = df.copy()
+    df.loc[df["price"].idxmin(), "price"] = 59.99
+    return df
+
+
+def move_category(df):
+    df = df.copy()
+    df["category"] = df["category"].astype(object)
+    df.loc[5, "category"] = "Mystery"
+    df.loc[6, "category"] = None
+    return df
+
+
+def append_books(df):
+    extra = catalog(5, seed=1)
+    extra["detail_url"] = extra["detail_url"].str.replace("book-", "new-")
+    return pd.concat([df, extra], ignore_index=True)
+
+
+def drop_last(df):
+    return df.iloc[:-3]
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Conta as reconstruções completas (caminho sem delta)."""
+    calls = []
+    from_frame = CatalogAggregates.from_frame.__func__
+
+    def counting(cls, df):
+        calls.append(len(df))
+        return from_frame(cls, df)
+
+    monkeypatch.setattr(CatalogAggregates, "from_frame", classmethod(counting))
+    return calls
+
+
+@pytest.mark.parametrize("change", [edit_prices, raise_cheapest, move_category, append_books, drop_last])
+def test_delta_matches_full_rebuild(change, builds):
+    first = make_snapshot(catalog())
+    catalog_aggregates(first)
+    second = make_snapshot(change(first.df), version=2, previous=first)
+
+    result = catalog_aggregates(second)
+
+    assert builds == [N]  # só a carga inicial foi completa
+    expected = CatalogAggregates.from_frame(second.df)
+    assert result.overview() == expected.overview()
+    assert result.categories() == expected.categories()
+
+
+def test_shifted_rows_are_rebuilt(builds):
+    first = make_snapshot(catalog())
+    catalog_aggregates(first)
+    shuffled = first.df.sample(frac=1, random_state=0).reset_index(drop=True)
+    second = make_snapshot(shuffled, version=2, previous=first)
+
+    result = catalog_aggregates(second)
+
+    assert builds == [N, N]
+    assert result.overview() == CatalogAggregates.from_frame(first.df).overview()
+
+
+def test_large_change_is_rebuilt(builds):
+    first = make_snapshot(catalog())
+    catalog_aggregates(first)
+    df = first.df.copy()
+    changed = int(N * aggregates.MAX_DELTA_FRACTION)
+    df.loc[: changed, "price"] += 1
+    second = make_snapshot(df, version=2, previous=first)
+
+    catalog_aggregates(second)
+
+    assert builds == [N, N]
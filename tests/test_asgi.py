@@ -0,0 +1,90 @@
+import asyncio
+import threading
+
+import httpx
+
+from src import create_app
+from src import asgi
+from src.asgi import AsyncBooksApp
+from src.config import Config
+from src.metrics import render_metrics
+from src.profiling import get_profile_store
+
+BOOK = "catalogue/tipping-the-velvet_999/index.html"
+ROUTE = "/api/v1/scrape-book/<book_id>"
+
+
+def make_app(site, tmp_path):
+    app = create_app()
+    csv = tmp_path / "books.csv"
+    csv.write_text(
+        "title,price,rating,availability,category,image,detail_url\n"
+        f"Tipping the Velvet,53.74,1,In stock,Historical Fiction,,{site.url}{BOOK}\n",
+        encoding="utf-8",
+    )
+    app.config["BOOKS_CSV_PATH"] = str(csv)
+    app.config["BOOKS_CATALOG_PATH"] = str(tmp_path / "books.catalog")
+    return AsyncBooksApp(app, threads=4)
+
+
+def get_all(asgi_app, *requests):
+    """Faz as requisições (caminho, headers) em sequência, num único event loop."""
+    async def run():
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            try:
+                return [await client.get(path, headers=headers) for path, headers in requests]
+            finally:
+                await asgi_app.enrichment.client.aclose()
+
+    return asyncio.run(run())
+
+
+def test_async_routes_are_metered_off_the_event_loop(site, tmp_path, auth_headers, monkeypatch):
+    asgi_app = make_app(site, tmp_path)
+    threads = []
+    authenticate = asgi.authenticate
+
+    def recording_authenticate(header):
+        threads.append(threading.current_thread().name)
+        return authenticate(header)
+
+    monkeypatch.setattr(asgi, "authenticate", recording_authenticate)
+
+    ok, missing = get_all(
+        asgi_app,
+        ("/api/v1/scrape-book/tipping-the-velvet_999", auth_headers),
+        ("/api/v1/scrape-book/nao-existe_1", auth_headers),
+    )
+
+    assert ok.status_code == 200
+    assert ok.json()["product_description"].startswith("Erotic and absorbing")
+    assert missing.status_code == 404
+    # Decodificação do JWT no pool, não na thread do event loop
+    assert threads and all(name.startswith("asgi") for name in threads)
+    text = render_metrics(asgi_app.flask_app)
+    assert f'http_requests_total{{route="{ROUTE}",method="GET",status="200"}} 1' in text
+    assert f'http_requests_total{{route="{ROUTE}",method="GET",status="404"}} 1' in text
+    assert f'http_request_phase_seconds_count{{route="{ROUTE}",phase="auth"}} 2' in text
+    assert f'http_request_phase_seconds_count{{route="{ROUTE}",phase="query"}} 2' in text
+
+
+def test_async_routes_are_profiled_on_demand(site, tmp_path, auth_headers, monkeypatch):
+    monkeypatch.setattr(Config, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(Config, "PROFILING_ADMINS", Config.TEST_USERNAME)
+    asgi_app = make_app(site, tmp_path)
+
+    _, response = get_all(
+        asgi_app,
+        ("/api/v1/scrape-book/tipping-the-velvet_999", auth_headers),
+        ("/api/v1/scrape-book/tipping-the-velvet_999", {**auth_headers, Config.PROFILING_HEADER: "1"}),
+    )
+
+    assert response.status_code == 200
+    profiles = get_profile_store(asgi_app.flask_app).list()
+    assert len(profiles) == 1
+    summary = profiles[0].summary()
+    assert (summary["route"], summary["status"], summary["path"]) == (
+        ROUTE, "200", "/api/v1/scrape-book/tipping-the-velvet_999"
+    )
+
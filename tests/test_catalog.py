@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from src.catalog import CatalogStore
+
+
+@pytest.fixture
+def csv(tmp_path):
+    path = tmp_path / "books.csv"
+    pd.DataFrame({"title": ["A", "B"], "price": [10.0, 20.0]}).to_csv(path, index=False)
+    return path
+
+
+def test_snapshot_is_loaded_once(csv):
+    store = CatalogStore(str(csv), check_interval=60)
+
+    first = store.snapshot()
+
+    assert store.snapshot() is first
+    assert first.version == 1
+    assert first.df["title"].tolist() == ["A", "B"]
+
+
+def test_refresh_keeps_one_previous_snapshot(csv):
+    store = CatalogStore(str(csv), check_interval=60)
+    first = store.snapshot()
+
+    pd.DataFrame({"title": ["A", "B", "C"], "price": [10.0, 20.0, 30.0]}).to_csv(csv, index=False)
+    second = store.refresh()
+    third = store.refresh()
+
+    assert (second.version, len(second)) == (2, 3)
+    assert second.etag != first.etag
+    assert third.previous is second
+    assert second.previous is None  # só um nível de histórico
+
+
+def test_derive_builds_once_per_snapshot(csv):
+    store = CatalogStore(str(csv), check_interval=60)
+    snapshot = store.snapshot()
+    calls = []
+
+    def build(snap):
+        calls.append(snap.version)
+        return snap.df["price"].sum()
+
+    assert snapshot.derive("total", build) == 30.0
+    assert snapshot.derive("total", build) == 30.0
+    assert snapshot.peek_derived("total") == 30.0
+    assert store.refresh().peek_derived("total") is None
+    assert calls == [1]
+
+
+def test_missing_file_raises(tmp_path):
+    store = CatalogStore(str(tmp_path / "nao-existe.csv"))
+
+    with pytest.raises(FileNotFoundError):
+        store.snapshot()
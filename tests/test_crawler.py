@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+
+import pytest
+import requests
+
+from src.crawler import Checkpoint, Crawler, clean
+
+CATALOGUE_PAGES = ["/catalogue/page-1.html", "/catalogue/page-2.html"]
+
+
+class Interrupted(Exception):
+    pass
+
+
+class InterruptedSession(requests.Session):
+    """Sessão que "cai" ao pedir `stop_at` (simula o processo interrompido)."""
+
+    def __init__(self, stop_at: str):
+        super().__init__()
+        self.stop_at = stop_at
+
+    def get(self, url, **kwargs):
+        if url.endswith(self.stop_at):
+            raise Interrupted(url)
+        return super().get(url, **kwargs)
+
+
+def test_checkpoint_saves_in_batches(tmp_path):
+    path = str(tmp_path / "crawl.checkpoint.json")
+    checkpoint = Checkpoint(path, save_every=3, save_interval=3600)
+    checkpoint.record("pages", "p1", {"rows": []})
+    checkpoint.record("pages", "p2", {"rows": []})
+    assert not os.path.exists(path)
+    checkpoint.record("pages", "p3", {"rows": []})
+    assert set(Checkpoint(path).data["pages"]) == {"p1", "p2", "p3"}
+
+    # Registros simultâneos: depois do flush o arquivo tem todas as páginas
+    threads = [
+        threading.Thread(target=lambda i=i: checkpoint.record("categories", f"c{i}", {"books": []}))
+        for i in range(40)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    checkpoint.flush()
+    with open(path, encoding="utf-8") as fh:
+        assert json.load(fh) == checkpoint.data
+
+
+def test_full_crawl(site):
+    df = clean(Crawler(site.url, workers=2).crawl())
+    assert sorted(df["title"]) == ["A Light in the Attic", "Sharp Objects", "Soumission", "Tipping the Velvet"]
+    categories = dict(zip(df["title"], df["category"]))
+    assert categories["Sharp Objects"] == "Poetry"
+    assert categories["Soumission"] == "Fiction"
+    assert df.loc[df["title"] == "A Light in the Attic", "price"].item() == pytest.approx(51.77)
+
+
+def test_interrupted_crawl_resumes_from_checkpoint(site, tmp_path):
+    path = str(tmp_path / "crawl.checkpoint.json")
+    crawler = Crawler(site.url, workers=1, checkpoint=Checkpoint(path), session=InterruptedSession("page-2.html"))
+    with pytest.raises(Interrupted):
+        crawler.crawl()
+
+    checkpoint = Checkpoint(path)
+    done = {url.replace(site.url, "/") for kind in Checkpoint.KINDS for url in checkpoint.data[kind]}
+    assert "/" in done and "/catalogue/page-1.html" in done
+    assert "/catalogue/page-2.html" not in done
+
+    site.reset_log()
+    df = clean(Crawler(site.url, workers=2, checkpoint=checkpoint).crawl())
+    requested = {path for path, _ in site.requests}
+    assert not requested & done
+    assert "/catalogue/page-2.html" in requested
+    assert len(df) == 4
+
+
+def test_incremental_crawl_revalidates_and_skips_unchanged(site, tmp_path):
+    state = str(tmp_path / "crawl.state.json")
+    first = Crawler(site.url, workers=2)
+    first.crawl()
+    first.checkpoint.save_as(state)
+    pages = len(site.requests)
+
+    # Nada mudou: todas as páginas voltam 304
+    site.reset_log()
+    again = Crawler(site.url, workers=2, previous=Checkpoint(state))
+    df = again.crawl()
+    assert len(site.requests) == pages
+    assert all(etag for _, etag in site.requests)
+    assert again.stats["not_modified"] == pages
+    assert again.stats["parsed"] == 0
+    assert again.changed_urls == set()
+    assert len(df) == 4
+
+    # Uma página do catálogo mudou: só ela é interpretada de novo
+    site.edit("catalogue/page-2.html", "£50.10", "£45.00")
+    site.reset_log()
+    changed = Crawler(site.url, workers=2, previous=Checkpoint(state))
+    df = clean(changed.crawl())
+    assert changed.stats["parsed"] == 1
+    assert changed.stats["not_modified"] == pages - 1
+    assert changed.changed_urls == {
+        site.url + "catalogue/soumission_998/index.html",
+        site.url + "catalogue/sharp-objects_997/index.html",
+    }
+    assert df.loc[df["title"] == "Soumission", "price"].item() == pytest.approx(45.0)
@@ -0,0 +1,87 @@
+import threading
+
+from src.enrichment import EnrichmentEngine
+from src.enrichment_store import EnrichmentStore
+from src.utilidades import UNAVAILABLE_DETAILS
+
+BOOK = "catalogue/tipping-the-velvet_999/index.html"
+
+
+def test_concurrent_gets_share_one_fetch(site):
+    engine = EnrichmentEngine(timeout=5)
+    url = site.url + BOOK
+    site.delay["/" + BOOK] = 0.2
+    n = 8
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def call(i):
+        barrier.wait()
+        results[i] = engine.get(url)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert site.hits["/" + BOOK] == 1
+    assert all(r == results[0] for r in results)
+    assert results[0]["product_description"].startswith("Erotic and absorbing")
+    # Cache positivo: a próxima chamada não vai à rede
+    engine.get(url)
+    assert site.hits["/" + BOOK] == 1
+
+
+def test_not_found_is_negatively_cached(site):
+    engine = EnrichmentEngine(timeout=5, negative_ttl=60)
+    url = site.url + "catalogue/nao-existe_1/index.html"
+
+    assert engine.get(url) == UNAVAILABLE_DETAILS
+    assert engine.get(url) == UNAVAILABLE_DETAILS
+    assert site.hits["/catalogue/nao-existe_1/index.html"] == 1
+
+    # TTL negativo vencido: tenta de novo
+    engine = EnrichmentEngine(timeout=5, negative_ttl=0)
+    engine.get(url)
+    engine.get(url)
+    assert site.hits["/catalogue/nao-existe_1/index.html"] == 3
+
+
+def test_stale_entry_served_when_refresh_fails(site, tmp_path):
+    store = EnrichmentStore(str(tmp_path / "enrichment.sqlite3"))
+    url = site.url + BOOK
+    known = {"product_description": "Versão guardada", "number_of_reviews": "3"}
+    store.put(url, known, fetched_at=0.0)
+    site.fail["/" + BOOK] = 500
+    engine = EnrichmentEngine(timeout=5, store=store, max_age=60)
+
+    assert engine.get(url) == known
+    # Espera a atualização em background (que falha)
+    engine.executor.shutdown(wait=True)
+    assert site.hits["/" + BOOK] == 1
+    # A falha mantém a versão guardada no cache e no store
+    assert engine.cache.get(url) == known
+    assert engine.get(url) == known
+    assert store.get(url) == (known, 0.0)
+
+
+def test_concurrent_stale_reads_refresh_once(site, tmp_path):
+    store = EnrichmentStore(str(tmp_path / "enrichment.sqlite3"))
+    url = site.url + BOOK
+    known = {"product_description": "Versão guardada", "number_of_reviews": "3"}
+    store.put(url, known, fetched_at=0.0)
+    site.delay["/" + BOOK] = 0.1
+    # Um worker só: atualizações enfileiradas rodariam depois da primeira terminar
+    engine = EnrichmentEngine(timeout=5, store=store, max_age=60, batch_workers=1)
+
+    # Ocupa o worker: as atualizações ficam na fila antes de qualquer download começar
+    gate = threading.Event()
+    engine.executor.submit(gate.wait)
+    for _ in range(4):
+        engine.refresh(url, known)
+    gate.set()
+    engine.executor.shutdown(wait=True)
+
+    assert site.hits["/" + BOOK] == 1
+    assert engine.cache.get(url)["product_description"].startswith("Erotic and absorbing")
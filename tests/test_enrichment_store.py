@@ -0,0 +1,30 @@
+import sqlite3
+
+from src.enrichment_store import EnrichmentStore
+
+
+def test_seq_follows_write_order(tmp_path):
+    store = EnrichmentStore(str(tmp_path / "enrichment.sqlite3"))
+    store.put_many([("a", {"n": 1}), ("b", {"n": 2})], fetched_at=100.0)
+    store.put("c", {"n": 3}, fetched_at=10.0)
+    store.put("a", {"n": 4}, fetched_at=5.0)
+    changes = store.changes_after(0)
+    assert [url for _, url, _, _ in changes] == ["b", "c", "a"]
+    last = changes[-1][0]
+    assert store.changes_after(last) == []
+    store.put("b", {"n": 5})
+    assert [(url, details) for _, url, details, _ in store.changes_after(last)] == [("b", {"n": 5})]
+
+
+def test_store_without_seq_is_migrated(tmp_path):
+    path = str(tmp_path / "enrichment.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE enrichment (detail_url TEXT PRIMARY KEY, details TEXT NOT NULL, fetched_at REAL NOT NULL)")
+    conn.executemany("INSERT INTO enrichment VALUES (?, ?, ?)", [("a", "{}", 1.0), ("b", "{}", 2.0)])
+    conn.commit()
+    conn.close()
+
+    store = EnrichmentStore(path)
+    assert [url for _, url, _, _ in store.changes_after(0)] == ["a", "b"]
+    store.put("a", {"novo": True})
+    assert [url for _, url, _, _ in store.changes_after(2)] == ["a"]
@@ -0,0 +1,50 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+
+def records(response):
+    return [json.loads(line) for line in response.data.decode("utf-8").splitlines()]
+
+
+def test_full_ndjson_export(client, auth_headers, catalog_csv):
+    response = client.get("/api/v1/export", headers=auth_headers)
+
+    expected = json.loads(pd.read_csv(catalog_csv).to_json(orient="records"))
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert response.headers["X-Total-Count"] == str(len(expected))
+    assert records(response) == expected
+    again = client.get("/api/v1/export", headers={**auth_headers, "If-None-Match": response.headers["ETag"]})
+    assert again.status_code == 304
+
+
+def test_filtered_ndjson_export(client, auth_headers, catalog_csv):
+    df = pd.read_csv(catalog_csv)
+    wanted = df[df["price"].between(20, 40) & df["title"].str.contains("the", case=False, regex=False)]
+
+    response = client.get("/api/v1/export?title=the&min=20&max=40&fields=title,price", headers=auth_headers)
+
+    assert records(response) == wanted[["title", "price"]].to_dict(orient="records")
+    assert response.headers["X-Total-Count"] == str(len(wanted))
+
+
+@pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+def test_columnar_export(client, auth_headers, catalog_csv, fmt):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    response = client.get(f"/api/v1/export?format={fmt}&rating=5", headers=auth_headers)
+
+    assert response.status_code == 200
+    buffer = io.BytesIO(response.data)
+    table = pa.ipc.open_stream(buffer).read_all() if fmt == "arrow" else pq.read_table(buffer)
+    df = pd.read_csv(catalog_csv)
+    assert table.column("title").to_pylist() == df.loc[df["rating"] == 5, "title"].tolist()
+
+
+def test_unknown_format(client, auth_headers, catalog_csv):
+    assert client.get("/api/v1/export?format=xml", headers=auth_headers).status_code == 406
+    assert client.get("/api/v1/export", headers={**auth_headers, "Accept": "text/csv"}).status_code == 406
@@ -0,0 +1,87 @@
+import datetime
+import threading
+
+import pandas as pd
+
+from src.catalog import CatalogSnapshot, FileSignature
+from src.enrichment_store import EnrichmentStore
+from src.fulltext import FullTextIndex, search_payload
+
+
+def make_snapshot(df, version=1):
+    return CatalogSnapshot(
+        df=df,
+        version=version,
+        signature=FileSignature(path="<test>", mtime_ns=version, size=len(df)),
+        loaded_at=datetime.datetime.now(datetime.timezone.utc),
+        load_seconds=0.0,
+    )
+
+
+def catalog(titles):
+    return pd.DataFrame({
+        "title": titles,
+        "category": "Poetry",
+        "price": 10.0,
+        "rating": 3,
+        "detail_url": [f"https://books.example/catalogue/book-{i}_{i}/index.html" for i in range(len(titles))],
+    })
+
+
+def test_search_with_duplicate_detail_urls():
+    df = catalog(["A Light in the Attic", "Light Years", "Night City"])
+    df = pd.concat([df, df.iloc[[0]]], ignore_index=True)
+    snapshot = make_snapshot(df)
+    index = FullTextIndex()
+    index.sync(snapshot)
+
+    body = search_payload(snapshot, index.search("light", 10), "light", ["title"])
+    assert body["total"] == 2
+    # Título mais curto, score maior (normalização de tamanho do BM25)
+    assert [r["id"] for r in body["results"]] == ["book-1_1", "book-0_0"]
+    assert body["results"][1]["highlight"]["title"] == "A <em>Light</em> in the Attic"
+
+
+def test_store_rows_committed_late_with_older_fetched_at_are_indexed(tmp_path):
+    df = catalog(["First Book", "Second Book"])
+    store = EnrichmentStore(str(tmp_path / "enrichment.sqlite3"))
+    store.put(df["detail_url"][0], {"product_description": "A tale about oysters."}, fetched_at=100.0)
+    index = FullTextIndex(store, sync_seconds=0)
+    snapshot = make_snapshot(df)
+    index.sync(snapshot)
+    assert index.search("oysters", 10).total == 1
+
+    # Outro worker mediu fetched_at antes, mas gravou depois
+    store.put(df["detail_url"][1], {"product_description": "More oysters and velvet."}, fetched_at=50.0)
+    index.sync(snapshot)
+    assert index.search("velvet", 10).total == 1
+    assert index.search("oysters", 10).total == 2
+
+
+def test_searches_use_current_index_while_rebuilding(monkeypatch):
+    index = FullTextIndex()
+    index.sync(make_snapshot(catalog(["Old Light", "Old Night"])))
+    release = threading.Event()
+    building = threading.Event()
+    apply_catalog = FullTextIndex._apply_catalog
+
+    def slow_apply(self, *args):
+        if self is not index:
+            building.set()
+            release.wait(5)
+        return apply_catalog(self, *args)
+
+    monkeypatch.setattr(FullTextIndex, "_apply_catalog", slow_apply)
+    # Todos os títulos mudam: reconstrução à parte
+    newer = make_snapshot(catalog(["New Light", "New Night"]), version=2)
+    builder = threading.Thread(target=index.sync, args=(newer,))
+    builder.start()
+    assert building.wait(5)
+
+    index.sync(newer)  # não espera a reconstrução
+    assert index.search("old", 10).total == 2
+    release.set()
+    builder.join(5)
+    assert index.catalog_version == 2
+    assert index.search("old", 10).total == 0
+    assert index.search("new", 10).total == 2
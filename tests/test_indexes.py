@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from src.indexes import BookIdIndex, PriceIndex
+
+COLUMNS = ["title", "price", "rating", "availability", "category", "image", "detail_url"]
+
+
+def url(slug):
+    return f"https://books.toscrape.com/catalogue/{slug}/index.html"
+
+
+def test_resolve_on_empty_catalog():
+    index = BookIdIndex(pd.DataFrame(columns=COLUMNS))
+
+    assert index.resolve(["a-light-in-the-attic_1000", "0"]).tolist() == [-1, -1]
+    assert index.row_of("a-light-in-the-attic_1000") < 0
+
+
+def test_resolve_slugs_and_legacy_ids():
+    df = pd.DataFrame({
+        "title": ["A Light in the Attic", "Tipping the Velvet"],
+        "detail_url": [url("a-light-in-the-attic_1000"), url("tipping-the-velvet_999")],
+    })
+    index = BookIdIndex(df)
+
+    assert index.resolve(["tipping-the-velvet_999", "nao-existe_1", "0", "7"]).tolist() == [1, -1, 0, -1]
+
+
+def test_price_index_matches_pandas_filter():
+    df = pd.DataFrame({
+        "price": [12.5, 30.0, 9.99, 30.0, 55.1, 20.0, None],
+        "rating": [5, 3, 5, 1, None, 5, 2],
+        "category": ["Poetry", "Ficção", "poetry", None, "Poetry", "Fiction", "Poetry"],
+    })
+    index = PriceIndex(df)
+
+    assert index.query(10, 30).tolist() == df.index[df["price"].between(10, 30)].tolist()
+    assert index.query(-np.inf, np.inf, category="POETRY").tolist() == [0, 2, 4]
+    assert index.query(0, 100, category="ficcao").tolist() == [1]
+    assert index.query(10, 60, rating=5).tolist() == [0, 5]
+    assert index.query(0, 60, category="poetry", rating=5).tolist() == [0, 2]
+    assert index.query(31, 50).tolist() == []
+    assert index.query(0, 100, category="nao-existe").tolist() == []
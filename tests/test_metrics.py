@@ -0,0 +1,57 @@
+import re
+
+from src.metrics import Histogram
+
+
+def fetch(client, path, headers=None):
+    # buffered: consome o corpo, como um servidor faria (as métricas fecham no fim do corpo)
+    return client.get(path, headers=headers, buffered=True)
+
+
+def scrape(client):
+    response = fetch(client, "/api/v1/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    return response.data.decode("utf-8")
+
+
+def value(text, series):
+    match = re.search(rf"^{re.escape(series)} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_requests_are_counted_per_route_and_status(client, auth_headers, catalog_csv):
+    first = fetch(client, "/api/v1/books", auth_headers)
+    fetch(client, "/api/v1/books", {**auth_headers, "If-None-Match": first.headers["ETag"]})
+    fetch(client, "/api/v1/books")
+    fetch(client, "/api/v1/books/price-range?min=1&max=100&limit=5", auth_headers)
+    fetch(client, "/nao-existe")
+
+    text = scrape(client)
+
+    route = 'route="/api/v1/books",method="GET"'
+    assert value(text, f'http_requests_total{{{route},status="200"}}') == 1
+    assert value(text, f'http_requests_total{{{route},status="304"}}') == 1
+    assert value(text, f'http_requests_total{{{route},status="401"}}') == 1
+    assert value(text, 'http_requests_total{route="<unmatched>",method="GET",status="404"}') == 1
+    assert value(text, f'http_request_duration_seconds_count{{{route}}}') == 3
+    assert value(text, f'http_response_size_bytes_sum{{{route}}}') >= len(first.data)
+    price = 'route="/api/v1/books/price-range"'
+    for phase in ("auth", "query", "serialize"):
+        assert value(text, f'http_request_phase_seconds_count{{{price},phase="{phase}"}}') == 1
+    assert value(text, "catalog_records") == 60
+    assert value(text, "catalog_version") == 1
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency", "Latência", ("route",), buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(("/x",), seconds)
+
+    text = "\n".join(histogram.render())
+
+    assert value(text, 'latency_bucket{route="/x",le="0.1"}') == 2
+    assert value(text, 'latency_bucket{route="/x",le="1.0"}') == 3
+    assert value(text, 'latency_bucket{route="/x",le="+Inf"}') == 4
+    assert value(text, 'latency_count{route="/x"}') == 4
+    assert value(text, 'latency_sum{route="/x"}') == 3.65
@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+from src.responses import decode_cursor
+
+FIELDS = ["title", "price"]
+
+
+def get_page(client, headers, cursor=None, limit=7):
+    params = {"limit": limit, "fields": ",".join(FIELDS)}
+    if cursor:
+        params["cursor"] = cursor
+    return client.get("/api/v1/books", query_string=params, headers=headers)
+
+
+def walk(client, headers, limit=7):
+    records, cursor = [], None
+    while True:
+        response = get_page(client, headers, cursor, limit)
+        assert response.status_code == 200
+        records += response.get_json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return records, response
+
+
+def test_cursor_walk_with_fields(client, auth_headers, catalog_csv):
+    records, last = walk(client, auth_headers)
+
+    expected = pd.read_csv(catalog_csv)[FIELDS].to_dict(orient="records")
+    assert records == expected
+    assert last.headers["X-Total-Count"] == str(len(expected))
+    assert all(set(record) == set(FIELDS) for record in records)
+
+
+def test_cursor_follows_the_book_across_reloads(client, auth_headers, catalog_csv, edit_catalog):
+    original = pd.read_csv(catalog_csv)
+    first = get_page(client, auth_headers, limit=5)
+    cursor = first.headers["X-Next-Cursor"]
+
+    # Um livro novo no início desloca todas as posições
+    new_book = original.iloc[[0]].assign(
+        title="Inserted Book", detail_url="https://books.example/catalogue/inserted_1/index.html"
+    )
+    edit_catalog(lambda df: pd.concat([new_book, df], ignore_index=True))
+    second = get_page(client, auth_headers, cursor, limit=5)
+
+    assert second.status_code == 200
+    assert [r["title"] for r in second.get_json()] == original["title"].iloc[5:10].tolist()
+
+
+def test_cursor_of_removed_book_expires(client, auth_headers, catalog_csv, edit_catalog):
+    first = get_page(client, auth_headers, limit=5)
+    cursor = first.headers["X-Next-Cursor"]
+    assert decode_cursor(cursor).book_id is not None
+
+    edit_catalog(lambda df: df.drop(index=4))
+    response = get_page(client, auth_headers, cursor, limit=5)
+
+    assert response.status_code == 410
+    assert "error" in response.get_json()
+
+
+@pytest.mark.parametrize("cursor", ["???", "eyJhZnRlciI6M30"])  # o segundo é o formato antigo ({"after": 3})
+def test_invalid_cursor_returns_400(client, auth_headers, catalog_csv, cursor):
+    assert get_page(client, auth_headers, cursor).status_code == 400
@@ -0,0 +1,230 @@
+import os
+import time
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.features import build_features
+from src.predict import MicroBatcher, ModelStore, PredictionTimeout, get_batcher, train_dummy
+
+N_FEATURES = 4
+
+
+def write_model(path, coef, intercept=0.0, mtime_ns=None):
+    with open(path, "wb") as f:
+        np.savez(f, coef=np.asarray(coef, dtype=np.float32), intercept=np.array(intercept, dtype=np.float32))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+class ScalarModel:
+    """Estimador que devolve um escalar (saída fora do formato esperado)."""
+    n_features_in_ = N_FEATURES
+
+    def predict(self, X):
+        return np.float32(1.0)
+
+
+class SlowModel:
+    n_features_in_ = N_FEATURES
+
+    def predict(self, X):
+        time.sleep(0.5)
+        return X.sum(axis=1)
+
+
+def write_pickle(path, model):
+    with open(path, "wb") as f:
+        pickle.dump(model, f)
+
+
+@pytest.fixture
+def model_app(app, tmp_path):
+    path = tmp_path / "model.npz"
+    write_model(path, [1.0, 2.0, 3.0, 4.0], intercept=0.5)
+    app.config["ML_MODEL_PATH"] = str(path)
+    app.config["ML_BATCH_MAX_SIZE"] = 1024
+    # Janela larga: todas as requisições simultâneas do teste cabem num lote
+    app.config["ML_BATCH_MAX_WAIT_MS"] = 500
+    return app
+
+
+def test_concurrent_requests_share_one_batch(model_app, auth_headers):
+    n = 8
+    barrier = threading.Barrier(n)
+    responses = [None] * n
+
+    def call(i):
+        client = model_app.test_client()
+        barrier.wait()
+        responses[i] = client.post("/api/v1/ml/predict", json={"instances": [[i, 0, 0, 0]]}, headers=auth_headers)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    batcher = get_batcher(model_app)
+    assert batcher.batches == 1
+    assert batcher.rows == n
+    for i, response in enumerate(responses):
+        body = response.get_json()
+        assert response.status_code == 200
+        assert body["batch_rows"] == n
+        assert body["predictions"] == [pytest.approx(i + 0.5)]
+
+
+def test_artifact_cache_reused_until_file_changes(tmp_path):
+    path = tmp_path / "model.npz"
+    write_model(path, [1.0, 1.0], mtime_ns=1_000_000_000)
+    store = ModelStore(str(path))
+    first = store.current()
+    assert store.current() is first
+
+    write_model(path, [2.0, 2.0], mtime_ns=2_000_000_000)
+    second = store.current()
+    assert second is not first
+    assert second.hash != first.hash
+    np.testing.assert_allclose(second.model.predict(np.ones((1, 2), dtype=np.float32)), [4.0])
+
+    # Conteúdo já visto (mesmo hash): reaproveita o modelo carregado
+    write_model(path, [1.0, 1.0], mtime_ns=3_000_000_000)
+    assert store.current() is first
+
+
+@pytest.mark.parametrize("payload", [
+    {},
+    {"instances": "x"},
+    {"instances": [[1, 2], [3]]},
+    {"ids": [], "instances": [[1, 2, 3, 4]]},
+    {"instances": [[1, 2]]},
+])
+def test_bad_payload_returns_400(model_app, client, auth_headers, payload):
+    response = client.post("/api/v1/ml/predict", json=payload, headers=auth_headers)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+@pytest.fixture
+def catalog_app(app, catalog_csv, tmp_path):
+    """App com catálogo próprio (editável) e o modelo de exemplo treinado sobre ele."""
+    model = tmp_path / "model.npz"
+    with open(model, "wb") as f:
+        np.savez(f, **train_dummy(pd.read_csv(catalog_csv), app.config["ML_HASH_FEATURES"]))
+    app.config["ML_MODEL_PATH"] = str(model)
+    return app
+
+
+def book_id(row) -> str:
+    return row["detail_url"].rstrip("/").split("/")[-2]
+
+
+def new_category(df):
+    df.loc[df.index[-1], "category"] = "Brand New Category"
+    return df
+
+
+def renamed_category(df):
+    # Mesmo número de categorias, mas a ordem (e as colunas one-hot) muda
+    df["category"] = df["category"].replace({df.loc[df.index[-1], "category"]: "AAA Renamed"})
+    return df
+
+
+@pytest.mark.parametrize("edit", [new_category, renamed_category])
+def test_predict_survives_catalog_category_changes(catalog_app, edit_catalog, client, auth_headers, edit):
+    df = pd.read_csv(catalog_app.config["BOOKS_CSV_PATH"])
+    last = df.iloc[-1]
+    ids = [book_id(row) for _, row in df[df["category"] != last["category"]].head(3).iterrows()]
+    before = client.post("/api/v1/ml/predict", json={"ids": ids}, headers=auth_headers)
+    assert before.status_code == 200
+
+    edit_catalog(edit)
+    after = client.post("/api/v1/ml/predict", json={"ids": ids + [book_id(last)]}, headers=auth_headers)
+
+    assert after.status_code == 200
+    predictions = after.get_json()["predictions"]
+    # Livros das outras categorias mantêm as mesmas features (e predições)
+    assert [p["prediction"] for p in predictions[:3]] == pytest.approx(
+        [p["prediction"] for p in before.get_json()["predictions"]]
+    )
+    assert predictions[3]["id"] == book_id(last)
+
+
+def test_model_without_columns_conflicts_with_changed_catalog(catalog_app, edit_catalog, client, auth_headers):
+    model = catalog_app.config["ML_MODEL_PATH"]
+    with np.load(model) as arrays:
+        legacy = {key: arrays[key] for key in arrays.files if key != "columns"}
+    with open(model, "wb") as f:
+        np.savez(f, **legacy)
+    ids = [book_id(pd.read_csv(catalog_app.config["BOOKS_CSV_PATH"]).iloc[0])]
+    assert client.post("/api/v1/ml/predict", json={"ids": ids}, headers=auth_headers).status_code == 200
+
+    edit_catalog(new_category)
+    response = client.post("/api/v1/ml/predict", json={"ids": ids}, headers=auth_headers)
+
+    assert response.status_code == 409
+    assert "error" in response.get_json()
+
+
+def test_ordinal_codes_follow_training_categories():
+    train = pd.DataFrame({
+        "title": ["A", "B", "C"], "price": [10.0, 20.0, 30.0], "rating": [1, 2, 3],
+        "availability": "In stock", "category": ["Fiction", "Poetry", "Travel"],
+    })
+    trained = build_features(train, "ordinal", 4)
+    current = build_features(train.assign(category=["Art", "Poetry", "Travel"]), "ordinal", 4)
+    categories = next(g for g in trained.schema["features"] if g["name"] == "category")["values"]
+
+    matrix = current.take_columns(np.arange(3), trained.columns, categories)
+
+    column = trained.columns.index("category")
+    # "Art" não existia no treino (ausente = -1); as outras voltam aos códigos do treino
+    assert matrix[:, column].tolist() == [-1.0, 1.0, 2.0]
+
+
+def test_bad_model_output_fails_the_batch_not_the_batcher(model_app, client, auth_headers, tmp_path):
+    model_app.config["ML_BATCH_MAX_WAIT_MS"] = 1
+    path = tmp_path / "model.pkl"
+    write_pickle(path, ScalarModel())
+    model_app.config["ML_MODEL_PATH"] = str(path)
+
+    response = client.post("/api/v1/ml/predict", json={"instances": [[1, 2, 3, 4]]}, headers=auth_headers)
+    assert response.status_code == 500
+
+    # A mesma thread segue atendendo os lotes seguintes
+    batcher = get_batcher(model_app)
+    thread = batcher._thread
+    write_model(path.with_suffix(".npz"), [1.0, 1.0, 1.0, 1.0])
+    batcher.store.path = str(path.with_suffix(".npz"))
+    response = client.post("/api/v1/ml/predict", json={"instances": [[1, 2, 3, 4]]}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.get_json()["predictions"] == [pytest.approx(10.0)]
+    assert batcher._thread is thread and thread.is_alive()
+
+
+def test_slow_prediction_times_out(tmp_path):
+    path = tmp_path / "model.pkl"
+    write_pickle(path, SlowModel())
+    batcher = MicroBatcher(ModelStore(str(path)), max_wait=0.001, timeout=0.1)
+
+    with pytest.raises(PredictionTimeout):
+        batcher.predict(np.ones((1, N_FEATURES), dtype=np.float32))
+
+
+def test_dead_batcher_thread_is_replaced(tmp_path):
+    path = tmp_path / "model.npz"
+    write_model(path, [1.0, 1.0])
+    batcher = MicroBatcher(ModelStore(str(path)), max_wait=0.001, timeout=5)
+    dead = threading.Thread(target=lambda: None)
+    dead.start()
+    dead.join()
+    batcher._thread = dead
+
+    result = batcher.predict(np.ones((1, 2), dtype=np.float32))
+
+    np.testing.assert_allclose(result.values, [2.0])
+    assert batcher._thread is not dead
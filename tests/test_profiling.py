@@ -0,0 +1,57 @@
+import marshal
+
+import pytest
+
+from src import create_app
+from src.config import Config
+from src.profiling import get_profile_store
+
+
+@pytest.fixture
+def app(request, monkeypatch):
+    """App com profiling ligado (ou desligado, via parametrize indireto)."""
+    monkeypatch.setattr(Config, "PROFILING_ENABLED", getattr(request, "param", True))
+    monkeypatch.setattr(Config, "PROFILING_ADMINS", Config.TEST_USERNAME)
+    return create_app()
+
+
+def fetch(client, path, headers):
+    # buffered: consome o corpo (o perfil é fechado no fim do corpo)
+    return client.get(path, headers=headers, buffered=True)
+
+
+def test_only_flagged_requests_are_profiled(app, client, auth_headers, catalog_csv):
+    fetch(client, "/api/v1/books?limit=5", auth_headers)
+    response = fetch(client, "/api/v1/books?limit=5", {**auth_headers, Config.PROFILING_HEADER: "1"})
+    fetch(client, "/api/v1/books?limit=5", {Config.PROFILING_HEADER: "1"})  # sem token: 401, sem perfil
+
+    assert response.status_code == 200
+    profiles = get_profile_store(app).list()
+    assert len(profiles) == 1
+    summary = profiles[0].summary()
+    assert (summary["route"], summary["status"], summary["path"]) == ("/api/v1/books", "200", "/api/v1/books")
+
+
+def test_profiles_are_listed_and_downloaded(client, auth_headers, catalog_csv):
+    fetch(client, "/api/v1/stats/overview", {**auth_headers, Config.PROFILING_HEADER: "1"})
+
+    listed = client.get("/api/v1/profiles", headers=auth_headers).get_json()["profiles"]
+    profile_id = listed[0]["id"]
+    speedscope = client.get(f"/api/v1/profiles/{profile_id}", headers=auth_headers)
+    pstats = client.get(f"/api/v1/profiles/{profile_id}?format=pstats", headers=auth_headers)
+
+    assert len(listed) == 1
+    assert speedscope.status_code == 200
+    assert "profiles" in speedscope.get_json()
+    assert isinstance(marshal.loads(pstats.data), dict)
+    assert client.get(f"/api/v1/profiles/{profile_id}?format=svg", headers=auth_headers).status_code == 400
+    assert client.get("/api/v1/profiles/nao-existe", headers=auth_headers).status_code == 404
+
+
+@pytest.mark.parametrize("app", [False], indirect=True)
+def test_disabled_profiling(app, client, auth_headers, catalog_csv):
+    response = fetch(client, "/api/v1/books?limit=5", {**auth_headers, Config.PROFILING_HEADER: "1"})
+
+    assert response.status_code == 200
+    assert get_profile_store(app) is None
+    assert client.get("/api/v1/profiles", headers=auth_headers).status_code == 404
@@ -0,0 +1,81 @@
+import datetime
+
+import pandas as pd
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from src.catalog import CatalogSnapshot, FileSignature
+from src.config import Config
+from src.queries import run_query, select_rows
+from src.responses import InvalidParameter
+
+
+@pytest.fixture(scope="module")
+def books():
+    df = pd.read_csv(Config.BOOKS_CSV_PATH)
+    return CatalogSnapshot(
+        df=df,
+        version=1,
+        signature=FileSignature(path="<test>", mtime_ns=1, size=len(df)),
+        loaded_at=datetime.datetime.now(datetime.timezone.utc),
+        load_seconds=0.0,
+    )
+
+
+def query(snapshot, **args):
+    return run_query(snapshot, MultiDict(args))
+
+
+def test_filters_and_sort_match_pandas(books):
+    df = books.df
+    wanted = df[
+        df["category"].str.lower().isin(["fiction", "poetry"])
+        & (df["rating"] >= 3)
+        & (df["price"] <= 30)
+    ]
+    expected = wanted.sort_values(["price", "rating"], ascending=[True, False], kind="stable")
+
+    result = query(books, category="FICTION,poetry", rating_min="3", price_max="30", sort="price,-rating")
+
+    assert result.total == len(expected)
+    assert result.rows.tolist() == expected.index.tolist()
+    # Plano: filtro mais seletivo primeiro
+    estimates = [p["estimate"] for p in result.plan]
+    assert sorted(p["field"] for p in result.plan) == ["category", "price", "rating"]
+    assert estimates == sorted(estimates)
+
+
+def test_page_and_facets(books):
+    df = books.df
+    cheap = df[df["price"] < 20]
+
+    result = query(books, price_max="19.99", facets="category,rating", limit="10", offset="5")
+
+    assert result.total == len(cheap)
+    assert result.rows.tolist() == cheap.index[5:15].tolist()
+    counts = cheap["rating"].value_counts()
+    assert {f["value"]: f["count"] for f in result.facets["rating"]} == counts.to_dict()
+    assert sum(f["count"] for f in result.facets["category"]) == len(cheap)
+
+
+@pytest.mark.parametrize("args", [
+    {"sort": "pages"}, {"facets": "title"}, {"limit": "0"}, {"offset": "-1"},
+    {"rating": "alto"}, {"price_min": "30", "price_max": "10"}, {"price_min": "barato"},
+])
+def test_invalid_arguments(books, args):
+    with pytest.raises(InvalidParameter):
+        query(books, **args)
+
+
+def test_select_rows_combines_search_and_price(books):
+    df = books.df
+    expected = df.index[
+        df["title"].str.contains("the", case=False, regex=False)
+        & df["price"].between(20, 40)
+        & (df["rating"] == 5)
+    ]
+
+    rows = select_rows(books, MultiDict({"title": "the", "min": "20", "max": "40", "rating": "5"}))
+
+    assert rows.tolist() == expected.tolist()
+    assert len(select_rows(books, MultiDict())) == len(df)
@@ -0,0 +1,69 @@
+import gzip
+import json
+
+import pandas as pd
+import pytest
+
+ROUTES = ["/api/v1/books", "/api/v1/books/top-rated", "/api/v1/categories",
+          "/api/v1/stats/overview", "/api/v1/stats/categories"]
+
+
+def get(client, headers, path, **extra):
+    return client.get(path, headers={**headers, **extra})
+
+
+@pytest.mark.parametrize("path", ROUTES)
+def test_prepared_body_round_trip(client, auth_headers, catalog_csv, path):
+    first = get(client, auth_headers, path)
+    etag = first.headers["ETag"]
+
+    again = get(client, auth_headers, path, **{"If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+
+
+def test_books_body_matches_catalog(client, auth_headers, catalog_csv):
+    response = get(client, auth_headers, "/api/v1/books")
+
+    expected = pd.read_csv(catalog_csv).to_dict(orient="records")
+    assert response.get_json() == json.loads(pd.DataFrame(expected).to_json(orient="records"))
+
+
+def test_compressed_body_has_its_own_etag(client, auth_headers, catalog_csv):
+    plain = get(client, auth_headers, "/api/v1/books")
+    packed = get(client, auth_headers, "/api/v1/books", **{"Accept-Encoding": "gzip"})
+
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert packed.headers["ETag"] == plain.headers["ETag"][:-1] + '-gz"'
+    assert json.loads(gzip.decompress(packed.data)) == plain.get_json()
+    assert "Accept-Encoding" in packed.headers["Vary"]
+    # O ETag da versão sem compressão não vale para a comprimida
+    stale = get(client, auth_headers, "/api/v1/books",
+                **{"Accept-Encoding": "gzip", "If-None-Match": plain.headers["ETag"]})
+    assert stale.status_code == 200
+    cached = get(client, auth_headers, "/api/v1/books",
+                 **{"Accept-Encoding": "gzip", "If-None-Match": packed.headers["ETag"]})
+    assert cached.status_code == 304
+
+
+def test_catalog_etag_on_filtered_routes(client, auth_headers, catalog_csv):
+    path = "/api/v1/books/price-range?min=10&max=30"
+    first = get(client, auth_headers, path)
+
+    assert get(client, auth_headers, path, **{"If-None-Match": first.headers["ETag"]}).status_code == 304
+    since = get(client, auth_headers, path, **{"If-Modified-Since": first.headers["Last-Modified"]})
+    assert since.status_code == 304
+
+
+def test_reload_changes_etag(client, auth_headers, catalog_csv, edit_catalog):
+    old = get(client, auth_headers, "/api/v1/books").headers["ETag"]
+
+    edit_catalog(lambda df: df.iloc[:-1])
+    response = get(client, auth_headers, "/api/v1/books", **{"If-None-Match": old})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != old
+    assert len(response.get_json()) == 59
@@ -0,0 +1,68 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from src.catalog import CatalogSnapshot, FileSignature
+from src.config import Config
+from src.search import search_rows
+
+
+def make_snapshot(df):
+    return CatalogSnapshot(
+        df=df,
+        version=1,
+        signature=FileSignature(path="<test>", mtime_ns=1, size=len(df)),
+        loaded_at=datetime.datetime.now(datetime.timezone.utc),
+        load_seconds=0.0,
+    )
+
+
+@pytest.fixture(scope="module")
+def books():
+    return make_snapshot(pd.read_csv(Config.BOOKS_CSV_PATH))
+
+
+def contains(df, column, text):
+    """Filtro antigo da rota (antes dos índices)."""
+    return df[column].str.contains(text, case=False, na=False, regex=False)
+
+
+@pytest.mark.parametrize("title", ["the", "THE", "a", "ht", "love", "s of", "(", "1/2", "zzzz", "Vol. 1"])
+def test_title_matches_str_contains(books, title):
+    expected = books.df.index[contains(books.df, "title", title)].tolist()
+
+    assert search_rows(books, title=title).tolist() == expected
+
+
+@pytest.mark.parametrize("title, category", [("the", "fiction"), ("a", "Sequential Art"), ("love", "poe")])
+def test_title_and_category_match_str_contains(books, title, category):
+    df = books.df
+    expected = df.index[contains(df, "title", title) & contains(df, "category", category)].tolist()
+
+    assert search_rows(books, title=title, category=category).tolist() == expected
+
+
+def test_accents_and_case_are_ignored():
+    snapshot = make_snapshot(pd.DataFrame({
+        "title": ["Café com Leite", "CAFE PRETO", "Cafeteria", None, "Açaí"],
+        "category": ["Culinária", "culinaria", "Outros", "Culinária", None],
+    }))
+
+    assert search_rows(snapshot, title="café").tolist() == [0, 1, 2]
+    assert search_rows(snapshot, title="acai").tolist() == [4]
+    assert search_rows(snapshot, category="CULINARIA").tolist() == [0, 1, 3]
+    assert search_rows(snapshot, title="cafe", category="culinária").tolist() == [0, 1]
+
+
+def test_search_route_pages_through_matches(client, auth_headers, catalog_csv):
+    df = pd.read_csv(catalog_csv)
+    expected = df.loc[contains(df, "title", "the"), "title"].tolist()
+
+    response = client.get("/api/v1/books/search?title=The&fields=title", headers=auth_headers)
+    special = client.get("/api/v1/books/search?title=(", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert [r["title"] for r in response.get_json()] == expected
+    assert special.status_code == 200
+    assert client.get("/api/v1/books/search", headers=auth_headers).status_code == 400
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from src.similarity import SimilarityIndex, top_k
+
+WORDS = ["light", "attic", "night", "city", "love", "song", "river", "house", "dark", "star"]
+
+
+def make_catalog(n, categories, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "detail_url": [f"https://books.example/{i}/index.html" for i in range(n)],
+        "title": [" ".join(rng.choice(WORDS, 3)) for _ in range(n)],
+        "category": rng.choice(categories, n),
+        "price": rng.uniform(10, 60, n).round(2),
+        "rating": rng.integers(1, 6, n),
+    })
+
+
+def test_updated_with_new_category_matches_full_transform():
+    df = make_catalog(200, ["Poetry", "Fiction", "Travel"])
+    index = SimilarityIndex.build(df, k=5, max_terms=64, precompute_max_rows=1000)
+
+    # Recarga que troca a categoria de algumas linhas para uma categoria nova
+    new_df = df.copy()
+    new_df.loc[:9, "category"] = "Science"
+    updated = index.updated(new_df)
+    assert updated is not None
+    assert "Science" in updated.space.categories
+
+    expected = updated.space.transform(new_df)
+    np.testing.assert_allclose(updated.vectors, expected, atol=1e-6)
+
+    neighbors, scores = top_k(expected, np.arange(len(new_df)), 5)
+    np.testing.assert_allclose(updated.scores, scores, atol=1e-5)